@@ -1,80 +1,139 @@
+import hmac
+import json
+import logging
 import os
-import uuid
+import shutil
+import tempfile
+import time
 import jwt
-from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from flask import Request, Response, render_template, request, redirect, url_for, flash, jsonify, session
 from werkzeug.utils import secure_filename
 
-from jwt_helpers import get_openid_configuration, get_signing_key_from_jwks
-from config import ALLOWED_EXTENSIONS, JWT_DECODE_OPTIONS, JWT_EXPECTED_ISSUER
-from core import import_datasets
+from jwt_helpers import (
+    get_openid_configuration,
+    get_signing_key_from_jwks,
+    get_verified_claims,
+    remember_verified_claims,
+)
+from config import (
+    ALLOWED_EXTENSIONS,
+    JOB_QUEUE_MAX_SIZE,
+    JWT_DECODE_OPTIONS,
+    JWT_EXPECTED_ISSUER,
+    METRICS_ENABLED,
+    METRICS_TOKEN,
+    PROGRESS_SSE,
+    RESULTS_PAGE_SIZE,
+    SSE_MAX_STREAM_SECONDS,
+    SSE_MIN_INTERVAL,
+    UPLOAD_SPOOL_MAX_SIZE,
+    check_web_settings,
+)
+# core.import_datasets (pandas, numpy, openpyxl) is imported by the first import job, not at startup
+from core import jobs, metrics, result_store
+from core.agencies import split_agency
+from core.input_formats import format_for_filename, sniff_format
 
 
-# XLSX files are ZIP archives; magic bytes are PK (0x50 0x4B 0x03 0x04)
-_XLSX_MAGIC = b'PK\x03\x04'
+logger = logging.getLogger(__name__)
+
+# Links included in status responses; the full list is paged on the results page
+STATUS_LINK_PREVIEW = 10
+
+# Upload form modes: import the inventory, download its payloads only, or submit a payload export
+UPLOAD_MODES = ("import", "export", "replay")
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class SpooledUploadRequest(Request):
+    """Keeps uploaded files in memory up to UPLOAD_SPOOL_MAX_SIZE instead of werkzeug's 500 KB"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE, mode="rb+")
+
+
+def spool_upload(file):
+    """Copy an upload into a buffer the import job owns; it only touches disk above UPLOAD_SPOOL_MAX_SIZE.
+
+    The request closes its own file streams once the response is sent, so the job cannot keep those.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_SIZE, mode="w+b")
+    file.stream.seek(0)
+    shutil.copyfileobj(file.stream, buffer)
+    buffer.seek(0)
+    return buffer
 
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def allowed_file_content(file_stream) -> bool:
-    """Validate file content via magic bytes — prevents extension-only bypass."""
-    header = file_stream.read(4)
-    file_stream.seek(0)
-    return header == _XLSX_MAGIC
+def allowed_file_content(file_stream, filename) -> bool:
+    """Validate file content via magic bytes or a sniffed header — prevents extension-only bypass."""
+    return sniff_format(file_stream) == format_for_filename(filename)
 
 
-def parse_jwt_token(token):
-    try:
-        if token.startswith("Bearer "):
-            token = token[7:]
+def verify_jwt_token(token):
+    """Verify the signature and claims against the issuer's JWKS and return the decoded claims"""
+    unverified_header = jwt.get_unverified_header(token)
+    # Intentional: decode unverified to extract issuer, then verify below with JWKS. # nosemgrep: python.jwt.security.unverified-jwt-decode.unverified-jwt-decode
+    unverified_payload = jwt.decode(token, options={"verify_signature": False})  # nosemgrep: python.jwt.security.unverified-jwt-decode.unverified-jwt-decode
 
-        unverified_header = jwt.get_unverified_header(token)
-        # Intentional: decode unverified to extract issuer, then verify below with JWKS. # nosemgrep: python.jwt.security.unverified-jwt-decode.unverified-jwt-decode
-        unverified_payload = jwt.decode(token, options={"verify_signature": False})  # nosemgrep: python.jwt.security.unverified-jwt-decode.unverified-jwt-decode
+    issuer = unverified_payload.get("iss")
+    if not issuer:
+        raise ValueError("Token does not contain 'iss' claim")
 
-        issuer = unverified_payload.get("iss")
-        if not issuer:
-            raise ValueError("Token does not contain 'iss' claim")
+    if JWT_EXPECTED_ISSUER and issuer.rstrip("/") != JWT_EXPECTED_ISSUER.rstrip("/"):
+        raise ValueError("Unexpected token issuer")
 
-        if JWT_EXPECTED_ISSUER and issuer.rstrip("/") != JWT_EXPECTED_ISSUER.rstrip("/"):
-            raise ValueError("Unexpected token issuer")
+    discovery = get_openid_configuration(issuer)
+    jwks_uri = discovery.get("jwks_uri")
+    if not jwks_uri:
+        raise ValueError("OIDC discovery document does not contain jwks_uri")
 
-        discovery = get_openid_configuration(issuer)
-        jwks_uri = discovery.get("jwks_uri")
-        if not jwks_uri:
-            raise ValueError("OIDC discovery document does not contain jwks_uri")
+    kid = unverified_header.get("kid")
+    if not kid:
+        raise ValueError("Token header does not contain 'kid'")
 
-        kid = unverified_header.get("kid")
-        if not kid:
-            raise ValueError("Token header does not contain 'kid'")
+    signing_key = get_signing_key_from_jwks(jwks_uri, kid, issuer)
 
-        signing_key = get_signing_key_from_jwks(jwks_uri, kid, issuer)
+    decode_kwargs = {
+        "jwt": token,
+        "key": signing_key,
+        "algorithms": ["RS256"],
+        "options": JWT_DECODE_OPTIONS,
+    }
 
-        decode_kwargs = {
-            "jwt": token,
-            "key": signing_key,
-            "algorithms": ["RS256"],
-            "options": JWT_DECODE_OPTIONS,
-        }
+    if JWT_EXPECTED_ISSUER:
+        decode_kwargs["issuer"] = JWT_EXPECTED_ISSUER
 
-        if JWT_EXPECTED_ISSUER:
-            decode_kwargs["issuer"] = JWT_EXPECTED_ISSUER
+    return jwt.decode(**decode_kwargs)
 
-        decoded = jwt.decode(**decode_kwargs)
+
+def parse_jwt_token(token):
+    try:
+        if token.startswith("Bearer "):
+            token = token[7:]
+
+        decoded = get_verified_claims(token)
+        if decoded is not None:
+            metrics.inc("i14y_jwt_verifications_total", result="cached")
+        else:
+            try:
+                with metrics.timed(metrics.STAGE_SECONDS, stage="jwt_verify"):
+                    decoded = verify_jwt_token(token)
+            except Exception:
+                metrics.inc("i14y_jwt_verifications_total", result="rejected")
+                raise
+            metrics.inc("i14y_jwt_verifications_total", result="verified")
+            remember_verified_claims(token, decoded)
 
         agencies = decoded.get("agencies", [])
         if not agencies:
             raise ValueError("Keine Organisationen im Token gefunden")
 
-        first_agency = agencies[0]
-        if "\\" in first_agency:
-            parts = first_agency.split("\\")
-            org_id = parts[0]
-            publisher_name = parts[1] if len(parts) > 1 else org_id
-        else:
-            org_id = first_agency
-            publisher_name = first_agency
+        org_id, publisher_name = split_agency(agencies[0])
 
         return {
             "organization_id": org_id,
@@ -110,45 +169,221 @@ def generate_i14y_links(result):
     return links
 
 
-def delete_uploaded_file(filepath):
+def summarize_import(result, org_info):
+    """Turn the result of import_datasets.main into what the status and result pages display"""
+    success_count = result.get("success_count", 0)
+    updated_count = result.get("updated_count", 0)
+    error_count = result.get("error_count", 0)
+    skipped_count = result.get("skipped_count", 0)
+
+    aborted = result.get("aborted")
+
+    if (error_count > 0 or aborted) and (success_count > 0 or skipped_count > 0):
+        status = "completed_with_errors"
+    elif error_count > 0 or aborted:
+        status = "error"
+    else:
+        status = "completed"
+
+    succeeded = f"{success_count} erfolgreich"
+    if updated_count:
+        succeeded += f" (davon {updated_count} aktualisiert)"
+    message = f"Import abgeschlossen: {succeeded}, {error_count} fehlgeschlagen"
+    if skipped_count:
+        message += f", {skipped_count} unverändert übersprungen"
+    partitions = result.get("partitions", [])
+    if len(partitions) > 1:
+        message += f" ({len(partitions)} Organisationen)"
+    if aborted:
+        message += f". Abgebrochen: Die Datei konnte nach Zeile {aborted['after_row']} nicht weiter gelesen werden"
+    warnings = result.get("warnings", [])
+    if warnings:
+        message += f". Hinweise: {len(warnings)} ungenau geschriebene Codelisten-Werte zugeordnet"
+
+    # Links and errors grow with the upload; they go to the result store and only a preview stays on the job
+    links = generate_i14y_links(result)
+    summary = {
+        "org_info": org_info,
+        "status": status,
+        "success_count": success_count,
+        "updated_count": updated_count,
+        "error_count": error_count,
+        "skipped_count": skipped_count,
+        "i14y_links": links[:STATUS_LINK_PREVIEW],
+        "message": message,
+        "partitions": partitions,
+    }
+    return result_store.save_result(
+        summary,
+        {result_store.LINKS: links, result_store.ERRORS: result.get("errors", []), result_store.WARNINGS: warnings},
+    )
+
+
+def run_import_job(upload, api_token, org_info, on_event=None, update_existing=False, replay=False):
+    """Background job body: import the spooled workbook (or replay a payload export) and always release its buffer afterwards"""
     try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-    except Exception as e:
-        print(f"Warning: Failed to delete temporary file {filepath}: {str(e)}")
+        from core import import_datasets
+
+        # Rows are routed to the token's agencies by their publisher column, replayed payloads by their publisher
+        if replay:
+            result = import_datasets.replay_payloads(
+                upload,
+                api_token=api_token,
+                agencies=org_info["agencies"],
+                on_event=on_event,
+                update_existing=update_existing,
+            )
+        else:
+            result = import_datasets.import_by_publisher(
+                upload,
+                api_token=api_token,
+                agencies=org_info["agencies"],
+                on_event=on_event,
+                update_existing=update_existing,
+            )
+        return summarize_import(result or {}, org_info)
+    finally:
+        upload.close()
+
+
+def export_download(upload, filename, org_info):
+    """Streamed NDJSON download of the payloads built from the spooled inventory; nothing is sent to I14Y"""
+    from core import import_datasets
 
+    try:
+        records = import_datasets.iter_payload_records(upload, org_info["agencies"])
+    except Exception:
+        upload.close()
+        raise
 
-def register_routes(app):
-    # Use system temp directory or create uploads in a location we know is writable
-    import tempfile
+    def generate():
+        try:
+            for record in records:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+        finally:
+            upload.close()
+
+    name = secure_filename(os.path.splitext(filename)[0]) or "inventory"
+    return Response(
+        generate(),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{name}.payloads.ndjson"'},
+    )
+
+
+def job_status_payload(job):
+    """JSON document polled by status.html"""
+    progress = job["progress"]
+    payload = {"job_id": job["id"], "status": job["status"], "progress": progress}
+
+    if job["status"] == "queued":
+        payload["message"] = "Import wartet auf Verarbeitung…"
+    elif job["status"] == "running":
+        if progress["total"]:
+            payload["message"] = f"{progress['done']} von {progress['total']} Datensätzen verarbeitet"
+        else:
+            payload["message"] = "Datei wird gelesen…"
+    elif job["result"] is not None:
+        result = job["result"]
+        payload["message"] = result["message"]
+        payload["i14y_links"] = result["i14y_links"]
+        payload["result"] = {
+            "success_count": result["success_count"],
+            "error_count": result["error_count"],
+            "skipped_count": result.get("skipped_count", 0),
+            "links_total": result["entry_counts"][result_store.LINKS],
+        }
+    else:
+        payload["message"] = "Fehler beim Import. Bitte erneut versuchen oder Support kontaktieren."
 
-    upload_folder = os.environ.get("UPLOAD_FOLDER", os.path.join(tempfile.gettempdir(), "i14y_uploads"))
+    return payload
 
-    # Make sure the directory exists and is writable
-    os.makedirs(upload_folder, exist_ok=True)
 
-    # Test if directory is writable
-    try:
-        test_file = os.path.join(upload_folder, "test_write.txt")
-        with open(test_file, "w") as f:
-            f.write("test")
-        os.remove(test_file)
-        print(f"Successfully confirmed upload directory is writable: {upload_folder}")
-    except Exception as e:
-        print(f"WARNING: Upload directory may not be writable: {upload_folder}, Error: {e}")
-        # Fall back to /tmp which should always be writable
-        upload_folder = os.path.join("/tmp", "i14y_uploads")  # nosec B108 - controlled fallback path, not user input
-        os.makedirs(upload_folder, exist_ok=True)
-        print(f"Using fallback upload directory: {upload_folder}")
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_job_events(job_id):
+    """Server-Sent Events for one job: failed rows as they happen, progress at most every SSE_MIN_INTERVAL.
+
+    A stream ends when the job finishes or after SSE_MAX_STREAM_SECONDS; the browser then
+    reconnects on its own, so a single stream never holds a worker thread for long.
+    """
+    deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+    version = None
+    last_failure = 0
+
+    yield "retry: 2000\n\n"
+    while time.monotonic() < deadline:
+        job = jobs.wait_for_change(job_id, version, timeout=min(15, max(0.0, deadline - time.monotonic())))
+        if job is None:
+            yield _sse("gone", {"message": "Import nicht gefunden oder abgelaufen"})
+            return
+
+        if job["version"] == version:
+            yield ": keep-alive\n\n"
+            continue
+        version = job["version"]
+
+        for failure in job["failures"]:
+            if failure["seq"] > last_failure:
+                last_failure = failure["seq"]
+                yield _sse("row_failed", failure)
+
+        yield _sse("progress", job_status_payload(job))
+        if job["finished_at"] is not None:
+            yield _sse("done", {"status": job["status"]})
+            return
+
+        time.sleep(SSE_MIN_INTERVAL)
+
+
+def _owns_job(job_id):
+    return job_id in session.get("job_ids", [])
+
+
+def register_routes(app):
+    # Token checks below rely on JWT_EXPECTED_ISSUER being set
+    check_web_settings()
+    # Uploads are parsed from memory; see spool_upload
+    app.request_class = SpooledUploadRequest
 
     @app.route("/health")
     def health():
         return jsonify({"status": "ok"}), 200
 
+    @app.route("/metrics")
+    def metrics_endpoint():
+        if not METRICS_ENABLED or not METRICS_TOKEN:
+            return jsonify({"status": "disabled"}), 404
+        # Stage timings and import counts are not public; compared in constant time
+        expected = f"Bearer {METRICS_TOKEN}".encode()
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode(), expected):
+            return jsonify({"status": "unauthorized"}), 401, {"WWW-Authenticate": "Bearer"}
+        return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
     @app.route("/")
     def index():
         return render_template("index.html")
 
+    @app.route("/template.xlsx")
+    def template_download():
+        # openpyxl is loaded by the first download (or the warm-up), not at startup
+        from core.inventory_template import get_template
+
+        try:
+            body, etag = get_template()
+        except Exception as e:
+            logger.warning("Could not generate the inventory template, serving the static one: %s", e)
+            return redirect(url_for("static", filename="inventory.xlsx"))
+
+        response = Response(body, mimetype=XLSX_MIMETYPE)
+        response.headers["Content-Disposition"] = 'attachment; filename="inventory.xlsx"'
+        # Revalidated on every download; unchanged templates cost a 304 without a body
+        response.headers["Cache-Control"] = "no-cache"
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
     @app.route("/upload", methods=["POST"])
     def upload_file():
         if "file" not in request.files:
@@ -181,75 +416,110 @@ def register_routes(app):
                 flash('Ungültiger Token. Bitte erneut einloggen.')
             return redirect(url_for("index"))
 
-        if file and allowed_file(file.filename) and allowed_file_content(file):
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4()}_{filename}"
-            filepath = os.path.join(upload_folder, unique_filename)
-
-            # Double-check directory exists before saving
-            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        mode = request.form.get("mode", "import")
+        if mode not in UPLOAD_MODES:
+            mode = "import"
 
-            file.save(filepath)
-
-            try:
-                # Process file synchronously
-                result = import_datasets.main(
-                    template_path=filepath,
-                    api_token=f"Bearer {access_token}" if not access_token.startswith("Bearer ") else access_token,
-                    organization_id=org_info["organization_id"],
-                    publisher_identifier=org_info["publisher_name"],
-                )
+        if mode == "replay" and not (
+            format_for_filename(file.filename) == "ndjson" and allowed_file_content(file, file.filename)
+        ):
+            flash("Zum Einspielen wird eine NDJSON-Datei aus einem Probelauf (.ndjson) benötigt")
+            return redirect(url_for("index"))
 
-                # Generate links
-                i14y_links = generate_i14y_links(result)
+        if file and allowed_file(file.filename) and allowed_file_content(file, file.filename):
+            upload = spool_upload(file)
 
-                # Store results in session for display
-                if result:
-                    success_count = result.get("success_count", 0)
-                    error_count = result.get("error_count", 0)
+            if mode == "export":
+                from core.import_datasets import ImportAbortedError
 
-                    session["import_result"] = {
-                        "org_info": org_info,
-                        "success_count": success_count,
-                        "error_count": error_count,
-                        "errors": result.get("errors", []),
-                        "i14y_links": i14y_links,
-                        "message": f"Import abgeschlossen: {success_count} erfolgreich, {error_count} fehlgeschlagen",
-                    }
+                try:
+                    return export_download(upload, file.filename, org_info)
+                except ImportAbortedError:
+                    flash("Die Datei konnte nicht gelesen werden. Bitte Format und Spalten prüfen.")
+                    return redirect(url_for("index"))
 
-                    if error_count > 0 and success_count > 0:
-                        status = "completed_with_errors"
-                    elif error_count > 0 and success_count == 0:
-                        status = "error"
-                    else:
-                        status = "completed"
+            api_token = f"Bearer {access_token}" if not access_token.startswith("Bearer ") else access_token
+            update_existing = request.form.get("update_existing") == "1"
+            try:
+                job_id = jobs.submit_job(
+                    run_import_job, upload, api_token, org_info, update_existing=update_existing, replay=mode == "replay"
+                )
+            except jobs.JobQueueFull:
+                upload.close()
+                logger.warning("Import refused: %s imports already queued", JOB_QUEUE_MAX_SIZE)
+                flash("Es warten bereits zu viele Importe. Bitte in einigen Minuten erneut versuchen.")
+                return render_template("index.html"), 503, {"Retry-After": "60"}
 
-                    session["import_status"] = status
+            # Remember the caller's recent jobs; only they may read the status
+            session["job_ids"] = (session.get("job_ids", []) + [job_id])[-20:]
 
-            except Exception:
-                session["import_result"] = {
-                    "org_info": org_info,
-                    "message": "Fehler beim Import. Bitte erneut versuchen oder Support kontaktieren.",
-                }
-                session["import_status"] = "error"
-
-            finally:
-                # Clean up the file
-                delete_uploaded_file(filepath)
-
-            # Redirect to results page
-            return redirect(url_for("results"))
+            return redirect(url_for("status", job_id=job_id))
         else:
-            flash("Nur gültige Excel-Dateien (.xlsx) sind erlaubt")
+            flash("Nur gültige Excel-, CSV- oder NDJSON-Dateien (.xlsx, .csv, .ndjson) sind erlaubt")
+            return redirect(url_for("index"))
+
+    @app.route("/status/<job_id>")
+    def status(job_id):
+        if not _owns_job(job_id) or jobs.get_job(job_id) is None:
+            flash("Import nicht gefunden oder abgelaufen")
             return redirect(url_for("index"))
 
-    @app.route("/results")
-    def results():
-        # Show results from session
-        if "import_result" not in session:
+        return render_template("status.html", job_id=job_id, use_sse=PROGRESS_SSE)
+
+    @app.route("/api/status/<job_id>")
+    def api_status(job_id):
+        job = jobs.get_job(job_id) if _owns_job(job_id) else None
+        if job is None:
+            return jsonify({"status": "unknown", "message": "Import nicht gefunden oder abgelaufen"}), 404
+
+        # Pollers pass the last failure seq they have seen and only get newer ones
+        since = request.args.get("since", 0, type=int)
+        payload = job_status_payload(job)
+        payload["failures"] = [failure for failure in job["failures"] if failure["seq"] > since]
+        return jsonify(payload)
+
+    @app.route("/api/events/<job_id>")
+    def api_events(job_id):
+        if not PROGRESS_SSE or not _owns_job(job_id) or jobs.get_job(job_id) is None:
+            return jsonify({"status": "unknown", "message": "Import nicht gefunden oder abgelaufen"}), 404
+
+        return Response(
+            stream_job_events(job_id),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.route("/results/<job_id>")
+    def results(job_id):
+        job = jobs.get_job(job_id) if _owns_job(job_id) else None
+        if job is None or job["finished_at"] is None:
             flash("Keine Import-Ergebnisse gefunden")
             return redirect(url_for("index"))
 
+        result = job["result"] or {
+            "message": "Fehler beim Import. Bitte erneut versuchen oder Support kontaktieren.",
+        }
+
+        pages = {}
+        sections = ((result_store.LINKS, "page"), (result_store.ERRORS, "errors_page"), (result_store.WARNINGS, "warnings_page"))
+        for kind, arg in sections:
+            total = result.get("entry_counts", {}).get(kind, 0)
+            page_count = max(1, -(-total // RESULTS_PAGE_SIZE))
+            page = min(max(request.args.get(arg, 1, type=int), 1), page_count)
+            entries = (
+                result_store.get_entries(result["result_id"], kind, (page - 1) * RESULTS_PAGE_SIZE, RESULTS_PAGE_SIZE)
+                if total
+                else []
+            )
+            pages[kind] = {"entries": entries, "page": page, "page_count": page_count, "total": total, "arg": arg}
+
         return render_template(
-            "results.html", result=session["import_result"], status=session.get("import_status", "unknown")
+            "results.html",
+            result=result,
+            status=job["status"],
+            job_id=job_id,
+            links=pages[result_store.LINKS],
+            errors=pages[result_store.ERRORS],
+            warnings=pages[result_store.WARNINGS],
+            page_args={section["arg"]: section["page"] for section in pages.values()},
         )
@@ -0,0 +1,6 @@
+# Benchmarks for the import pipeline; run the modules with ``python -m benchmarks.<name>``
+import os
+
+# The web app refuses to start without these; benchmarks never talk to a real issuer
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+os.environ.setdefault("JWT_EXPECTED_ISSUER", "http://127.0.0.1/realms/benchmark")
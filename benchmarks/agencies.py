@@ -0,0 +1,108 @@
+"""One mixed multi-agency inventory imported by agency fan-out versus one import per agency.
+
+Usage: python -m benchmarks.agencies [--agencies 3] [--rows 600] [--latency 0.02]
+
+The synthetic inventory of benchmarks.pipeline gets a publisher column that cycles through the
+agencies of the token. "sequential" imports the rows of each agency with import_datasets.main
+one after another, as users did with one workbook per agency; "fan-out" imports the whole
+inventory with import_by_publisher. Each scenario runs in a fresh process against the mock API.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.mock_api import MockApi
+from benchmarks.pipeline import inventory_workbook
+
+ORGANIZATIONS = ("BENCH_A", "BENCH_B", "BENCH_C", "BENCH_D", "BENCH_E", "BENCH_F")
+
+
+def agencies_of(count):
+    return [f"{organization}\\{organization.title()} Office" for organization in ORGANIZATIONS[:count]]
+
+
+def mixed_inventory(rows, agencies):
+    """CSV paths of the mixed inventory and of its per-agency parts, generated on first use"""
+    stem = os.path.join(tempfile.gettempdir(), f"i14y_bench_agencies_{rows}_{len(agencies)}")
+    paths = {"mixed": f"{stem}.csv", **{agency: f"{stem}_{n}.csv" for n, agency in enumerate(agencies)}}
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths
+
+    df = pd.read_excel(inventory_workbook(rows))
+    df["publisher"] = [agencies[i % len(agencies)].split("\\")[0] for i in range(len(df))]
+    df.to_csv(paths["mixed"], index=False)
+    for agency in agencies:
+        df[df["publisher"] == agency.split("\\")[0]].drop(columns="publisher").to_csv(paths[agency], index=False)
+    return paths
+
+
+def _child(scenario, paths, agencies, token, queue):
+    from core import import_datasets
+    from core.agencies import split_agency
+
+    api_token = f"Bearer {token}"
+    start = time.perf_counter()
+    if scenario == "fan-out":
+        results = [import_datasets.import_by_publisher(paths["mixed"], api_token, agencies)]
+    else:
+        results = [import_datasets.main(paths[agency], api_token, *split_agency(agency)) for agency in agencies]
+    wall = time.perf_counter() - start
+    queue.put(
+        {
+            "wall": wall,
+            "succeeded": sum(result["success_count"] for result in results),
+            "failed": sum(result["error_count"] for result in results),
+        }
+    )
+
+
+def measure(scenario, paths, agencies, token):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(scenario, paths, agencies, token, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agencies", type=int, default=3, help=f"agencies in the token (up to {len(ORGANIZATIONS)})")
+    parser.add_argument("--rows", type=int, default=600, help="rows of the mixed inventory")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per dataset POST")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    agencies = agencies_of(args.agencies)
+    paths = mixed_inventory(args.rows, agencies)
+
+    with MockApi(port=args.port, latency=args.latency) as api:
+        os.environ.update(
+            {
+                "API_BASE_URL": api.partner_url,
+                "I14Y_PUBLIC_API_BASE_URL": api.public_url,
+                "JWT_EXPECTED_ISSUER": api.issuer,
+                "IMPORT_LEDGER_PATH": "",
+                "CODELIST_SNAPSHOT_PATH": "",
+            }
+        )
+        token = api.issue_token(agencies=agencies)
+
+        print(f"{args.rows} rows over {args.agencies} agencies, {args.latency * 1000:.0f} ms per POST\n")
+        print(f"{'scenario':<11} {'wall s':>7} {'rows/s':>7} {'ok':>6} {'failed':>7}")
+        for scenario in ("sequential", "fan-out"):
+            api.reset()
+            result = measure(scenario, paths, agencies, token)
+            print(
+                f"{scenario:<11} {result['wall']:>7.2f} {args.rows / result['wall']:>7.0f} "
+                f"{result['succeeded']:>6} {result['failed']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Parse throughput and memory of the xlsx, CSV and NDJSON inventory readers.
+
+Usage: python -m benchmarks.input_formats [--rows 50000] [--repeat 3] [--formats xlsx,csv,ndjson]
+
+The synthetic workbook of benchmarks.pipeline is written once more as CSV (semicolon-separated,
+as Excel exports it in Swiss locales) and as NDJSON with ISO 8601 dates. Each run streams one
+file through iter_inventory_chunks in a fresh process, so peak RSS covers only that reader; the
+import stack is loaded before the baseline is taken. The report lists rows/s, the median wall
+time, file size, peak RSS and the increase over the baseline.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import time
+
+import pandas as pd
+
+from benchmarks.pipeline import inventory_workbook
+
+FORMATS = ("xlsx", "csv", "ndjson")
+
+
+def inventory_files(rows, seed=0):
+    """Paths of the same synthetic inventory as xlsx, CSV and NDJSON, generated on first use"""
+    xlsx = inventory_workbook(rows, seed)
+    stem = os.path.splitext(xlsx)[0]
+    paths = {"xlsx": xlsx, "csv": f"{stem}.csv", "ndjson": f"{stem}.ndjson"}
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths
+
+    df = pd.read_excel(xlsx)
+    for col in ("issued", "modified", "temporalCoverage_start", "temporalCoverage_end"):
+        df[col] = df[col].map(lambda value: value.isoformat() if pd.notna(value) else None)
+
+    tmp_path = f"{paths['csv']}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, sep=";", index=False, encoding="utf-8-sig")
+    os.replace(tmp_path, paths["csv"])
+
+    tmp_path = f"{paths['ndjson']}.{os.getpid()}.tmp"
+    # Empty cells are left out of the records, as exporters usually do
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in df.to_dict("records"):
+            f.write(json.dumps({k: v for k, v in record.items() if pd.notna(v)}, ensure_ascii=False))
+            f.write("\n")
+    os.replace(tmp_path, paths["ndjson"])
+    return paths
+
+
+def _status_mb(field):
+    # ru_maxrss survives exec and would report the parent's peak; VmHWM starts over in the child
+    with open("/proc/self/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _child(path, queue):
+    from core.inventory_reader import iter_inventory_chunks
+
+    baseline_mb = _status_mb("VmHWM")
+    start = time.perf_counter()
+    rows = 0
+    dates = 0
+    for df in iter_inventory_chunks(path):
+        rows += len(df)
+        dates += int(df["issued"].map(lambda value: hasattr(value, "isoformat")).sum())
+    wall = time.perf_counter() - start
+    queue.put({"wall": wall, "rows": rows, "dates": dates, "peak_mb": _status_mb("VmHWM"), "baseline_mb": baseline_mb})
+
+
+def measure(path):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per format; the median wall time is reported")
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    args = parser.parse_args()
+
+    paths = inventory_files(args.rows)
+
+    print(f"{args.rows} rows, median of {args.repeat} runs\n")
+    print(f"{'format':<7} {'size':>8} {'wall s':>7} {'rows/s':>8} {'peak RSS':>9} {'+ reader':>9} {'dates':>7}")
+    for file_format in args.formats.split(","):
+        path = paths[file_format]
+        runs = [measure(path) for _ in range(args.repeat)]
+        wall = statistics.median(run["wall"] for run in runs)
+        peak = max(run["peak_mb"] for run in runs)
+        growth = max(run["peak_mb"] - run["baseline_mb"] for run in runs)
+        rows = runs[0]["rows"]
+        print(
+            f"{file_format:<7} {os.path.getsize(path) / 1e6:>6.1f}MB {wall:>7.2f} {rows / wall:>8.0f} "
+            f"{peak:>7.0f}MB {growth:>7.0f}MB {runs[0]['dates']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
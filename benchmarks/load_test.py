@@ -0,0 +1,180 @@
+"""Concurrent uploads against a real gunicorn server started with gunicorn.conf.py.
+
+Usage: python -m benchmarks.load_test [--clients 20] [--rows 200] [--latency 0.02] [--port 8770]
+
+Each client uploads the same synthetic inventory through /upload with its own cookie session and
+polls /api/status until its import has finished, while a prober measures /health latency. The
+run is repeated for the old default (one synchronous worker) and for the profile from
+gunicorn.conf.py; the mock API stands in for I14Y and the OIDC issuer.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.mock_api import MockApi
+from benchmarks.pipeline import ORGANIZATION, PUBLISHER, inventory_workbook
+from benchmarks.submission import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, environment overrides for gunicorn.conf.py)
+PROFILES = [
+    ("1 sync worker (previous default)", {"GUNICORN_WORKER_CLASS": "sync", "WEB_CONCURRENCY": "1", "GUNICORN_THREADS": "1"}),
+    ("gunicorn.conf.py defaults", {}),
+]
+HEALTH_PROBE_INTERVAL = 0.05  # seconds
+STATUS_POLL_INTERVAL = 0.25  # seconds
+
+
+def _wait_for(url, timeout=60):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        if time.time() > deadline:
+            raise RuntimeError(f"{url} did not come up")
+        time.sleep(0.1)
+
+
+def start_server(port, env_overrides, env):
+    state_dir = tempfile.mkdtemp(prefix="i14y_load_test_")
+    server_env = dict(
+        os.environ,
+        **env,
+        **env_overrides,
+        PORT=str(port),
+        GUNICORN_ACCESS_LOG="",
+        JOB_STORE_DIR=os.path.join(state_dir, "jobs"),
+        RESULT_STORE_PATH=os.path.join(state_dir, "results.sqlite3"),
+        METRICS_DIR=os.path.join(state_dir, "metrics"),
+    )
+    log_path = os.path.join(state_dir, "gunicorn.log")
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "run:app"],
+            cwd=ROOT,
+            env=server_env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    try:
+        _wait_for(f"http://127.0.0.1:{port}/health")
+    except RuntimeError:
+        process.kill()
+        with open(log_path, encoding="utf-8", errors="replace") as log:
+            print(log.read()[-4000:])
+        raise
+    return process
+
+
+def upload_and_wait(base_url, workbook, token):
+    """One client: upload, then poll until done; returns (upload seconds, total seconds, final status)"""
+    session = requests.Session()
+    start = time.perf_counter()
+    with open(workbook, "rb") as f:
+        response = session.post(
+            f"{base_url}/upload",
+            data={"access_token": token},
+            files={"file": ("inventory.xlsx", f)},
+            allow_redirects=False,
+            timeout=300,
+        )
+    upload_seconds = time.perf_counter() - start
+    if response.status_code != 302 or "/status/" not in response.headers.get("Location", ""):
+        return upload_seconds, time.perf_counter() - start, "rejected"
+
+    job_id = response.headers["Location"].rsplit("/", 1)[1]
+    while True:
+        status = session.get(f"{base_url}/api/status/{job_id}", timeout=300).json()
+        if status["status"] not in ("queued", "running"):
+            return upload_seconds, time.perf_counter() - start, status["status"]
+        time.sleep(STATUS_POLL_INTERVAL)
+
+
+def probe_health(base_url, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            requests.get(f"{base_url}/health", timeout=60)
+            latencies.append(time.perf_counter() - start)
+        except requests.RequestException:
+            latencies.append(float("inf"))
+        time.sleep(HEALTH_PROBE_INTERVAL)
+
+
+def run_profile(base_url, clients, workbook, token):
+    stop = threading.Event()
+    health = []
+    prober = threading.Thread(target=probe_health, args=(base_url, stop, health), daemon=True)
+    prober.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        outcomes = list(executor.map(lambda _: upload_and_wait(base_url, workbook, token), range(clients)))
+    wall = time.perf_counter() - start
+
+    stop.set()
+    prober.join()
+    return wall, outcomes, health
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=20, help="concurrent uploads")
+    parser.add_argument("--rows", type=int, default=200, help="rows per uploaded inventory")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per dataset POST")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--mock-port", type=int, default=8765)
+    args = parser.parse_args()
+
+    workbook = inventory_workbook(args.rows)
+
+    with MockApi(port=args.mock_port, latency=args.latency) as api:
+        env = {
+            "API_BASE_URL": api.partner_url,
+            "I14Y_PUBLIC_API_BASE_URL": api.public_url,
+            "JWT_EXPECTED_ISSUER": api.issuer,
+            "IMPORT_LEDGER_PATH": "",
+            "CODELIST_SNAPSHOT_PATH": "",
+        }
+        token = api.issue_token(agencies=(f"{ORGANIZATION}\\{PUBLISHER}",))
+        base_url = f"http://127.0.0.1:{args.port}"
+
+        print(f"{args.clients} concurrent uploads of {args.rows} rows, {args.latency * 1000:.0f} ms per POST\n")
+        print(
+            f"{'profile':<34} {'wall s':>7} {'rows/s':>7} {'upload p50':>11} {'upload p99':>11} "
+            f"{'done p50':>9} {'done max':>9} {'health p99':>11} {'health max':>11} {'ok':>4}"
+        )
+
+        for label, overrides in PROFILES:
+            process = start_server(args.port, overrides, env)
+            try:
+                wall, outcomes, health = run_profile(base_url, args.clients, workbook, token)
+            finally:
+                process.terminate()
+                process.wait(timeout=60)
+
+            uploads = [upload for upload, _, _ in outcomes]
+            done = [total for _, total, _ in outcomes]
+            ok = sum(status == "completed" for _, _, status in outcomes)
+            print(
+                f"{label:<34} {wall:>7.1f} {args.clients * args.rows / wall:>7.0f} "
+                f"{statistics.median(uploads) * 1000:>9.0f}ms {percentile(uploads, 0.99) * 1000:>9.0f}ms "
+                f"{statistics.median(done):>8.1f}s {max(done):>8.1f}s "
+                f"{percentile(health, 0.99) * 1000:>9.0f}ms {max(health) * 1000:>9.0f}ms {ok:>4}"
+            )
+
+
+if __name__ == "__main__":
+    main()
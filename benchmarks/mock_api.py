@@ -0,0 +1,302 @@
+"""Local stand-in for the I14Y partner API, the public codelist exports and the OIDC issuer.
+
+Usage: python -m benchmarks.mock_api [--port 8765] [--latency 0.02] [--error-rate 0.0] [--capacity 0]
+
+Dataset POSTs sleep ``latency`` seconds and fail with 503 for ``error_rate`` of the requests.
+With ``capacity`` set, POSTs beyond that many in flight are answered with 429 and Retry-After.
+The issuer at ``/realms/benchmark`` serves a discovery document and the JWKS of the key that
+MockApi.issue_token signs with. Created datasets are kept in memory, so they can be listed
+(GET /datasets with page/pageSize) and replaced (PUT /datasets/{id}). GET /__stats returns request and connection counters, POST
+/__reset clears them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import jwt
+import openpyxl
+import requests
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "static", "inventory.xlsx")
+
+PARTNER_PREFIX = "/api/partner/v1"
+PUBLIC_PREFIX = "/api/public/v1"
+OIDC_REALM = "/realms/benchmark"
+SIGNING_KEY_ID = "benchmark"
+CODELIST_SHEETS = {
+    "08da58dc-4dc8-f9cb-b6f2-7d16b3fa0cde": "ThemesCodes",
+    "08db7eb9-8d92-b301-982e-5f7cbd44e45f": "LicenseCodes",
+}
+
+
+def _load_codelists():
+    """Codelist exports in the I14Y JSON shape, built from the template's code sheets"""
+    workbook = openpyxl.load_workbook(TEMPLATE_PATH, read_only=True)
+    exports = {}
+    for concept_id, sheet in CODELIST_SHEETS.items():
+        entries = [
+            {"code": code, "name": {"de": label}}
+            for code, label in workbook[sheet].iter_rows(min_row=2, values_only=True)
+            if code and label and code != "UNKNOWN"
+        ]
+        exports[concept_id] = json.dumps({"data": entries}).encode()
+    workbook.close()
+    return exports
+
+
+class MockState:
+    def __init__(self, latency=0.0, error_rate=0.0, capacity=0, retry_after=1, seed=0, jwks=None):
+        self.jwks = json.dumps(jwks or {"keys": []}).encode()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.random = random.Random(seed)
+        self.codelists = _load_codelists()
+        # dataset id -> stored dataset data, in creation order
+        self.datasets = {}
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter()
+            self.statuses = Counter()
+            self.connections = 0
+
+    def count(self, route, status):
+        with self.lock:
+            self.requests[route] += 1
+            self.statuses[str(status)] += 1
+
+    def stats(self):
+        with self.lock:
+            return {"requests": dict(self.requests), "statuses": dict(self.statuses), "connections": self.connections}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without this every response waits for a delayed ACK
+    disable_nagle_algorithm = True
+    state = None
+
+    def setup(self):
+        super().setup()
+        with self.state.lock:
+            self.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", route=None, content_type="application/json", headers=None):
+        if route:
+            self.state.count(route, status)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+
+        if path == "/__stats":
+            return self._send(200, json.dumps(self.state.stats()).encode())
+
+        if path.startswith(f"{PUBLIC_PREFIX}/concepts/") and path.endswith("/codelist-entries/exports/json"):
+            concept_id = path.split("/")[5]
+            export = self.state.codelists.get(concept_id)
+            if export is None:
+                return self._send(404, b"{}", route="GET codelist")
+            return self._send(200, export, route="GET codelist")
+
+        if path == f"{OIDC_REALM}/.well-known/openid-configuration":
+            issuer = f"http://{self.headers['Host']}{OIDC_REALM}"
+            document = {"issuer": issuer, "jwks_uri": f"{issuer}/protocol/openid-connect/certs"}
+            return self._send(
+                200, json.dumps(document).encode(), route="GET oidc discovery", headers={"Cache-Control": "max-age=300"}
+            )
+
+        if path == f"{OIDC_REALM}/protocol/openid-connect/certs":
+            return self._send(200, self.state.jwks, route="GET jwks", headers={"Cache-Control": "max-age=300"})
+
+        if path == f"{PARTNER_PREFIX}/datasets":
+            return self._list_datasets()
+
+        self._send(404, b"{}", route=f"GET {path}")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        body = self._read_body()
+
+        if path == "/__reset":
+            self.state.reset()
+            return self._send(204)
+
+        if path == f"{PARTNER_PREFIX}/datasets":
+            return self._create_dataset(body)
+
+        self._send(404, b"{}", route=f"POST {path}")
+
+    def do_PUT(self):
+        path = self.path.split("?", 1)[0]
+        body = self._read_body()
+
+        if path.startswith(f"{PARTNER_PREFIX}/datasets/"):
+            return self._update_dataset(path.rsplit("/", 1)[1], body)
+
+        self._send(404, b"{}", route=f"PUT {path}")
+
+    def _list_datasets(self):
+        query = parse_qs(urlsplit(self.path).query)
+        page = int(query.get("page", ["1"])[0])
+        page_size = int(query.get("pageSize", ["100"])[0])
+        publisher = query.get("publisherIdentifier", [None])[0]
+
+        with self.state.lock:
+            datasets = [
+                dict(data, id=dataset_id)
+                for dataset_id, data in self.state.datasets.items()
+                if publisher is None or data.get("publisher", {}).get("identifier") == publisher
+            ]
+        items = datasets[(page - 1) * page_size : page * page_size]
+        body = {"data": items, "page": page, "pageSize": page_size, "totalCount": len(datasets)}
+        return self._send(200, json.dumps(body).encode(), route="GET datasets")
+
+    def _update_dataset(self, dataset_id, body):
+        route = "PUT datasets"
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        data = json.loads(body)["data"]
+        with self.state.lock:
+            found = dataset_id in self.state.datasets
+            if found:
+                self.state.datasets[dataset_id] = data
+        if not found:
+            return self._send(404, b"Not Found", route=route, content_type="text/plain")
+        return self._send(204, route=route)
+
+    def _create_dataset(self, body):
+        route = "POST datasets"
+        state = self.state
+
+        with state.lock:
+            throttled = state.capacity and state.in_flight >= state.capacity
+            if not throttled:
+                state.in_flight += 1
+        if throttled:
+            return self._send(
+                429, b"Too Many Requests", route=route, content_type="text/plain",
+                headers={"Retry-After": str(state.retry_after)},
+            )
+
+        try:
+            if state.latency:
+                time.sleep(state.latency)
+            with state.lock:
+                failed = state.random.random() < state.error_rate
+        finally:
+            with state.lock:
+                state.in_flight -= 1
+
+        if failed:
+            return self._send(503, b"Service Unavailable", route=route, content_type="text/plain")
+        dataset_id = str(uuid.uuid4())
+        data = json.loads(body)["data"]
+        with state.lock:
+            state.datasets[dataset_id] = data
+        return self._send(201, json.dumps(dataset_id).encode(), route=route)
+
+
+def serve(port, **options):
+    MockHandler.state = MockState(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def _wait_until_ready(base_url, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            requests.get(f"{base_url}/__stats", timeout=1).raise_for_status()
+            return
+        except requests.RequestException:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+class MockApi:
+    """Runs the mock server in a child process so it does not compete for the benchmark's GIL"""
+
+    def __init__(self, port=8765, **options):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.partner_url = f"{self.base_url}{PARTNER_PREFIX}"
+        self.public_url = f"{self.base_url}{PUBLIC_PREFIX}"
+        self.issuer = f"{self.base_url}{OIDC_REALM}"
+
+        self._signing_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(RSAAlgorithm.to_jwk(self._signing_key.public_key()))
+        options["jwks"] = {"keys": [dict(jwk, kid=SIGNING_KEY_ID, use="sig", alg="RS256")]}
+
+        self._process = multiprocessing.get_context("spawn").Process(
+            target=serve, args=(port,), kwargs=options, daemon=True
+        )
+
+    def __enter__(self):
+        self._process.start()
+        _wait_until_ready(self.base_url)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
+
+    def stats(self):
+        response = requests.get(f"{self.base_url}/__stats", timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def reset(self):
+        requests.post(f"{self.base_url}/__reset", timeout=10).raise_for_status()
+
+    def issue_token(self, agencies=("BENCH\\Benchmark Office",), lifetime=3600):
+        """Access token signed with the key the mock issuer publishes"""
+        now = int(time.time())
+        claims = {"iss": self.issuer, "iat": now, "exp": now + lifetime, "agencies": list(agencies)}
+        return jwt.encode(claims, self._signing_key, algorithm="RS256", headers={"kid": SIGNING_KEY_ID})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per dataset POST")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of POSTs answered with 503")
+    parser.add_argument("--capacity", type=int, default=0, help="concurrent POSTs accepted before answering 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429")
+    args = parser.parse_args()
+
+    print(f"Mock I14Y API on http://127.0.0.1:{args.port} (partner prefix {PARTNER_PREFIX})")
+    serve(args.port, latency=args.latency, error_rate=args.error_rate, capacity=args.capacity, retry_after=args.retry_after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Payload construction throughput: per-row create_dataset_payload vs. columnar build_payloads.
+
+Usage: python -m benchmarks.payload_build [--rows 10000] [--repeat 3]
+
+Codelists are read from the sheets of app/static/inventory.xlsx, so no network access is needed.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import openpyxl
+
+from core import import_datasets
+from core.codelist_utils import ACCESS_RIGHTS_MAPPING, store_codelist
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "static", "inventory.xlsx")
+
+
+def load_template_codelists():
+    """Seed the codelist cache from the template's code sheets; returns (theme labels, license labels)"""
+    workbook = openpyxl.load_workbook(TEMPLATE_PATH, read_only=True)
+    labels = {}
+    for sheet, name, initial in (("ThemesCodes", "themes", {}), ("LicenseCodes", "licenses", {"Unknown": "UNKNOWN"})):
+        codelist = dict(initial)
+        for code, label in workbook[sheet].iter_rows(min_row=2, values_only=True):
+            if code and label:
+                codelist[label] = code
+                codelist[code] = code
+        store_codelist(name, codelist)
+        labels[name] = [label for label, code in codelist.items() if label != code]
+    workbook.close()
+    return labels["themes"], labels["licenses"]
+
+
+def synthetic_inventory(rows, theme_labels, license_labels, seed=0):
+    """DataFrame shaped like the inventory template with varied keyword/contact/distribution fill"""
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1)
+    access_labels = [label for label in ACCESS_RIGHTS_MAPPING if not label.isupper()]
+
+    def maybe(value, fill):
+        return value if rng.random() < fill else None
+
+    records = []
+    for i in range(rows):
+        record = {
+            "title": f"Datensatz {i}",
+            "description": f"Beschreibung des Datensatzes {i}",
+            "identificator": f"BENCH_DATASET_{i}",
+            "accessRights": rng.choice(access_labels),
+            "issued": start + timedelta(days=rng.randint(0, 3000)),
+            "modified": start + timedelta(days=rng.randint(0, 3000)),
+            "contactPoints_fn": maybe("Espace de l'Europe 10, CH-2010 Neuchâtel", 0.8),
+            "contactPoints_hasEmail": maybe("info@bfs.admin.ch", 0.8),
+            "contactPoints_hasTelephone": maybe("+41 58 463 60 11", 0.5),
+            "themes_label": maybe(rng.choice(theme_labels), 0.9),
+            "spatial": maybe("CH", 0.7),
+            "temporalCoverage_start": maybe(start + timedelta(days=rng.randint(0, 3000)), 0.5),
+            "temporalCoverage_end": maybe(start + timedelta(days=rng.randint(3000, 4000)), 0.3),
+        }
+        for k in range(1, 4):
+            record[f"keywords_{k}"] = maybe(f"Stichwort {rng.randint(0, 500)}", 0.9 - 0.3 * k)
+        for d in range(1, 4):
+            fill = 1.0 - 0.35 * (d - 1)
+            record[f"distribution_accessUrl_{d}"] = maybe(f"https://example.admin.ch/data/{i}/{d}", fill)
+            record[f"distribution_downloadUrl_{d}"] = maybe(f"https://example.admin.ch/data/{i}/{d}.csv", fill / 2)
+            record[f"distribution_license_label_{d}"] = maybe(rng.choice(license_labels), fill)
+        records.append(record)
+
+    return pd.DataFrame.from_records(records)
+
+
+def build_per_row(df, publisher):
+    return [import_datasets.create_dataset_payload(row, publisher) for _, row in df.iterrows()]
+
+
+def build_columnar(df, publisher):
+    return [payload for _, payload, _ in import_datasets.build_payloads(df, publisher)]
+
+
+def best_of(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payloads = func(df, "BENCH")
+        timings.append(time.perf_counter() - start)
+    return min(timings), payloads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = synthetic_inventory(args.rows, *load_template_codelists())
+
+    per_row_seconds, per_row = best_of(build_per_row, df, args.repeat)
+    columnar_seconds, columnar = best_of(build_columnar, df, args.repeat)
+
+    identical = [json.dumps(p) for p in per_row] == [json.dumps(p) for p in columnar]
+    print(f"rows: {args.rows}, identical JSON: {identical}")
+    print(f"per-row  (iterrows): {args.rows / per_row_seconds:>10,.0f} rows/s  ({per_row_seconds:.3f} s)")
+    print(f"columnar (build_payloads): {args.rows / columnar_seconds:>10,.0f} rows/s  ({columnar_seconds:.3f} s)")
+    print(f"speedup: {per_row_seconds / columnar_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""End-to-end import benchmark: import_datasets.main and the /upload route against the mock API.
+
+Usage: python -m benchmarks.pipeline [--rows 1000,10000] [--latency 0.02] [--error-rate 0.01]
+                                     [--scenarios main,upload,export,replay] [--json report.json]
+
+Synthetic workbooks shaped like app/static/inventory.xlsx are generated once per size and seed
+in the temp directory. Every scenario runs in a fresh process, so codelist and JWKS caches start
+cold and peak memory is comparable between runs. The report lists rows/s, per-row latency (from
+the moment a row is read until its outcome), peak RSS and the requests the mock API received per
+endpoint; --json writes the same numbers for comparing branches. The export scenario only builds
+the payloads into an NDJSON file and replay submits that file, so payload build and submission
+throughput can be told apart.
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+
+import openpyxl
+
+from benchmarks.mock_api import MockApi, TEMPLATE_PATH
+from benchmarks.payload_build import load_template_codelists, synthetic_inventory
+from benchmarks.submission import percentile
+
+ORGANIZATION = "BENCH"
+PUBLISHER = "Benchmark Office"
+# Endpoints of the mock API shown as report columns, in pipeline order
+STAGES = [
+    ("GET oidc discovery", "oidc"),
+    ("GET jwks", "jwks"),
+    ("GET codelist", "codelists"),
+    ("POST datasets", "POSTs"),
+]
+STATUS_POLL_INTERVAL = 0.05  # seconds
+
+
+def inventory_workbook(rows, seed=0):
+    """Path of a synthetic inventory workbook with the template's columns, generated on first use"""
+    path = os.path.join(tempfile.gettempdir(), f"i14y_bench_inventory_{rows}_{seed}.xlsx")
+    if os.path.exists(path):
+        return path
+
+    template = openpyxl.load_workbook(TEMPLATE_PATH, read_only=True)
+    columns = [value for value in next(template.worksheets[0].iter_rows(max_row=1, values_only=True)) if value]
+    template.close()
+
+    df = synthetic_inventory(rows, *load_template_codelists(), seed=seed)[columns]
+    # Normal (not write-only) mode writes the <dimension> element Excel files carry
+    tmp_path = f"{path}.{os.getpid()}.tmp.xlsx"
+    df.to_excel(tmp_path, sheet_name="Template", index=False, engine="openpyxl")
+    os.replace(tmp_path, path)
+    return path
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_main(workbook, token):
+    """import_datasets.main on a workbook path, as the CLI would call it"""
+    from core import import_datasets
+
+    latencies = []
+
+    def on_event(event):
+        if event["type"] in ("submitted", "failed"):
+            latencies.append(event["elapsed_ms"])
+
+    start = time.perf_counter()
+    result = import_datasets.main(workbook, f"Bearer {token}", ORGANIZATION, PUBLISHER, on_event=on_event)
+    wall = time.perf_counter() - start
+    return {"wall": wall, "latencies_ms": latencies, "failed": result.get("error_count", 0), "polls": 0}
+
+
+def run_upload(workbook, token):
+    """POST the workbook to /upload through the Flask test client and poll until the job finishes"""
+    import app.routes as routes
+    from run import app
+
+    latencies = []
+    run_import_job = routes.run_import_job
+
+    def traced_import_job(*args, on_event=None, **kwargs):
+        def tee(event):
+            if event["type"] in ("submitted", "failed"):
+                latencies.append(event["elapsed_ms"])
+            on_event(event)
+
+        return run_import_job(*args, on_event=tee, **kwargs)
+
+    # upload_file looks the job function up at request time
+    routes.run_import_job = traced_import_job
+
+    with open(workbook, "rb") as f:
+        content = f.read()
+
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.post(
+        "/upload",
+        data={"access_token": token, "file": (io.BytesIO(content), "inventory.xlsx")},
+        content_type="multipart/form-data",
+    )
+    upload_ms = (time.perf_counter() - start) * 1000
+    if response.status_code != 302 or "/status/" not in response.location:
+        raise RuntimeError(f"Upload was rejected: {response.status_code} {response.location}")
+
+    job_id = response.location.rsplit("/", 1)[1]
+    polls = 0
+    while True:
+        polls += 1
+        status = client.get(f"/api/status/{job_id}").get_json()
+        if status["status"] not in ("queued", "running"):
+            break
+        time.sleep(STATUS_POLL_INTERVAL)
+    wall = time.perf_counter() - start
+
+    return {
+        "wall": wall,
+        "latencies_ms": latencies,
+        "failed": status["progress"]["failed"],
+        "polls": polls,
+        "upload_ms": upload_ms,
+    }
+
+
+def payload_export_path(workbook):
+    return f"{os.path.splitext(workbook)[0]}.payloads.ndjson"
+
+
+def run_export(workbook, token):
+    """import_datasets.export_payloads: reading and payload build only, nothing is submitted"""
+    from core import import_datasets
+
+    latencies = []
+
+    def on_event(event):
+        if event["type"] == "payload_built":
+            latencies.append(event["build_ms"])
+
+    start = time.perf_counter()
+    with open(payload_export_path(workbook), "w", encoding="utf-8") as f:
+        counts = import_datasets.export_payloads(workbook, f, [f"{ORGANIZATION}\\{PUBLISHER}"], on_event=on_event)
+    wall = time.perf_counter() - start
+    return {"wall": wall, "latencies_ms": latencies, "failed": counts["error_count"], "polls": 0}
+
+
+def run_replay(workbook, token):
+    """import_datasets.replay_payloads on the file of the export scenario: submission only"""
+    from core import import_datasets
+
+    latencies = []
+
+    def on_event(event):
+        if event["type"] in ("submitted", "failed"):
+            latencies.append(event["elapsed_ms"])
+
+    start = time.perf_counter()
+    result = import_datasets.replay_payloads(
+        payload_export_path(workbook), f"Bearer {token}", [f"{ORGANIZATION}\\{PUBLISHER}"], on_event=on_event
+    )
+    wall = time.perf_counter() - start
+    return {"wall": wall, "latencies_ms": latencies, "failed": result.get("error_count", 0), "polls": 0}
+
+
+SCENARIOS = {"main": run_main, "upload": run_upload, "export": run_export, "replay": run_replay}
+
+
+def _child(scenario, workbook, token, queue):
+    try:
+        baseline_mb = _peak_rss_mb()
+        measurement = SCENARIOS[scenario](workbook, token)
+
+        from core import http_client
+
+        measurement["peak_rss_mb"] = _peak_rss_mb()
+        measurement["baseline_rss_mb"] = baseline_mb
+        measurement["http"] = http_client.get_http_metrics()
+        queue.put(measurement)
+    except BaseException as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def run_isolated(scenario, workbook, token):
+    """Run one scenario in a fresh interpreter, which reads config from the inherited environment"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(scenario, workbook, token, queue))
+    process.start()
+    measurement = queue.get()
+    process.join()
+    if "error" in measurement:
+        raise RuntimeError(f"{scenario} failed: {measurement['error']}")
+    return measurement
+
+
+def summarize(scenario, rows, measurement, stats):
+    latencies = measurement["latencies_ms"] or [0.0]
+    return {
+        "scenario": scenario,
+        "rows": rows,
+        "wall_s": round(measurement["wall"], 3),
+        "rows_per_s": round(rows / measurement["wall"], 1),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p99_ms": round(percentile(latencies, 0.99), 1),
+        "peak_rss_mb": round(measurement["peak_rss_mb"], 1),
+        "failed": measurement["failed"],
+        "status_polls": measurement["polls"],
+        "requests": stats["requests"],
+        "statuses": stats["statuses"],
+        "connections": stats["connections"],
+        "http": measurement["http"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="1000,10000", help="comma-separated inventory sizes (up to 50000)")
+    parser.add_argument("--scenarios", default="main,upload", help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per dataset POST")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="share of POSTs answered with 503")
+    parser.add_argument("--capacity", type=int, default=0, help="concurrent POSTs accepted before answering 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.rows.split(",")]
+    scenarios = args.scenarios.split(",")
+    workbooks = {rows: inventory_workbook(rows, args.seed) for rows in sizes}
+
+    options = {"latency": args.latency, "error_rate": args.error_rate, "capacity": args.capacity, "seed": args.seed}
+    with MockApi(port=args.port, **options) as api:
+        os.environ.update(
+            {
+                "API_BASE_URL": api.partner_url,
+                "I14Y_PUBLIC_API_BASE_URL": api.public_url,
+                "JWT_EXPECTED_ISSUER": api.issuer,
+                # Every run must submit all rows and start without snapshots of earlier runs
+                "IMPORT_LEDGER_PATH": "",
+                "CODELIST_SNAPSHOT_PATH": "",
+                "METRICS_DIR": tempfile.mkdtemp(prefix="i14y_bench_metrics_"),
+            }
+        )
+        token = api.issue_token(agencies=(f"{ORGANIZATION}\\{PUBLISHER}",))
+
+        print(f"{args.latency * 1000:.0f} ms per POST, {args.error_rate:.0%} transient 503s, capacity {args.capacity or 'unlimited'}\n")
+        header = f"{'scenario':<8} {'rows':>6} {'wall s':>8} {'rows/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'RSS MB':>7}"
+        header += "".join(f" {label:>9}" for _, label in STAGES) + f" {'conns':>6} {'failed':>7}"
+        print(header)
+
+        report = []
+        for rows in sizes:
+            for scenario in scenarios:
+                if scenario == "replay" and not os.path.exists(payload_export_path(workbooks[rows])):
+                    run_isolated("export", workbooks[rows], token)
+                api.reset()
+                measurement = run_isolated(scenario, workbooks[rows], token)
+                summary = summarize(scenario, rows, measurement, api.stats())
+                report.append(summary)
+
+                line = (
+                    f"{scenario:<8} {rows:>6} {summary['wall_s']:>8.2f} {summary['rows_per_s']:>8.0f} "
+                    f"{summary['p50_ms']:>8.1f} {summary['p99_ms']:>9.1f} {summary['peak_rss_mb']:>7.0f}"
+                )
+                line += "".join(f" {summary['requests'].get(route, 0):>9}" for route, _ in STAGES)
+                line += f" {summary['connections']:>6} {summary['failed']:>7}"
+                print(line)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
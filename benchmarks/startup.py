@@ -0,0 +1,125 @@
+"""Cold start of the gunicorn server: time to the first /health answer and idle worker memory.
+
+Usage: python -m benchmarks.startup [--workers 1] [--settle 5] [--repeat 3] [--port 8770]
+
+The server is started with gunicorn.conf.py once per warm-up mode (GUNICORN_WARM_UP) and
+/health is polled from the moment the process is spawned. After ``settle`` seconds the RSS of
+the master and the idle workers is read from /proc, then one small workbook is uploaded to show
+what the first import still has to load. The mock API stands in for I14Y and the OIDC issuer.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks.load_test import ROOT, upload_and_wait
+from benchmarks.mock_api import MockApi
+from benchmarks.pipeline import ORGANIZATION, PUBLISHER, inventory_workbook
+
+WARM_UP_MODES = ("off", "worker", "master")
+HEALTH_POLL_INTERVAL = 0.005  # seconds
+FIRST_IMPORT_ROWS = 10
+
+
+def _rss_mb(pid):
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def start_until_healthy(port, env, timeout=60):
+    """Spawn gunicorn and return (process, seconds until /health answered 200)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "run:app"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    while True:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process, time.perf_counter() - start
+        except requests.RequestException:
+            pass
+        if time.perf_counter() - start > timeout or process.poll() is not None:
+            process.kill()
+            raise RuntimeError("gunicorn did not answer /health")
+        time.sleep(HEALTH_POLL_INTERVAL)
+
+
+def measure(mode, args, base_env, workbook, token):
+    state_dir = tempfile.mkdtemp(prefix="i14y_startup_")
+    env = dict(
+        base_env,
+        GUNICORN_WARM_UP=mode,
+        WEB_CONCURRENCY=str(args.workers),
+        PORT=str(args.port),
+        GUNICORN_ACCESS_LOG="",
+        JOB_STORE_DIR=os.path.join(state_dir, "jobs"),
+        RESULT_STORE_PATH=os.path.join(state_dir, "results.sqlite3"),
+        METRICS_DIR=os.path.join(state_dir, "metrics"),
+    )
+    process, first_health = start_until_healthy(args.port, env)
+    try:
+        time.sleep(args.settle)
+        workers = _children(process.pid)
+        master_rss = _rss_mb(process.pid)
+        worker_rss = statistics.mean(_rss_mb(pid) for pid in workers) if workers else 0.0
+        _, first_import, status = upload_and_wait(f"http://127.0.0.1:{args.port}", workbook, token)
+        if status != "completed":
+            raise RuntimeError(f"first import ended with status {status}")
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    return first_health, master_rss, worker_rss, first_import
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1, help="WEB_CONCURRENCY")
+    parser.add_argument("--settle", type=float, default=5.0, help="seconds between first /health and the RSS reading")
+    parser.add_argument("--repeat", type=int, default=3, help="starts per mode; the median is reported")
+    parser.add_argument("--modes", default=",".join(WARM_UP_MODES), help="comma-separated GUNICORN_WARM_UP values")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--mock-port", type=int, default=8765)
+    args = parser.parse_args()
+
+    workbook = inventory_workbook(FIRST_IMPORT_ROWS)
+
+    with MockApi(port=args.mock_port) as api:
+        base_env = dict(
+            os.environ,
+            API_BASE_URL=api.partner_url,
+            I14Y_PUBLIC_API_BASE_URL=api.public_url,
+            JWT_EXPECTED_ISSUER=api.issuer,
+            IMPORT_LEDGER_PATH="",
+            CODELIST_SNAPSHOT_PATH="",
+        )
+        token = api.issue_token(agencies=(f"{ORGANIZATION}\\{PUBLISHER}",))
+
+        print(f"{args.workers} worker(s), median of {args.repeat} starts, RSS {args.settle:.0f}s after the first /health\n")
+        print(f"{'warm-up':<8} {'first /health':>14} {'master RSS':>11} {'worker RSS':>11} {'first import':>13}")
+        for mode in args.modes.split(","):
+            runs = [measure(mode, args, base_env, workbook, token) for _ in range(args.repeat)]
+            health, master_rss, worker_rss, first_import = (statistics.median(values) for values in zip(*runs))
+            print(
+                f"{mode:<8} {health * 1000:>12.0f}ms {master_rss:>9.0f}MB {worker_rss:>9.0f}MB {first_import * 1000:>11.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Submission throughput against the local mock API: row-by-row vs. batched submission.
+
+Usage: python -m benchmarks.submission [--rows 2000] [--latency 0.02] [--error-rate 0.02]
+
+Reports wall time, rows/s, per-row latency (from the moment a row enters the submission engine
+until its outcome is yielded) and the number of POSTs and TCP connections the mock API saw.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.mock_api import MockApi
+
+# (label, max_workers, batch_size)
+CONFIGURATIONS = [
+    ("sequential, one POST per row", 1, 1),
+    ("8 workers, one POST per row", 8, 1),
+    ("8 workers, batches of 10", 8, 10),
+    ("8 workers, batches of 50", 8, 50),
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(import_datasets, payloads, max_workers, batch_size):
+    entered = {}
+
+    def items():
+        for key, payload in enumerate(payloads):
+            entered[key] = time.perf_counter()
+            yield key, payload
+
+    latencies = []
+    failures = 0
+    start = time.perf_counter()
+    for key, _, error in import_datasets.submit_datasets(items(), "Bearer benchmark", max_workers, batch_size):
+        latencies.append(time.perf_counter() - entered[key])
+        failures += error is not None
+    return time.perf_counter() - start, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per dataset POST")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="share of POSTs answered with 503")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with MockApi(port=args.port, latency=args.latency, error_rate=args.error_rate) as api:
+        os.environ["API_BASE_URL"] = api.partner_url
+
+        from benchmarks.payload_build import load_template_codelists, synthetic_inventory
+        from core import import_datasets
+
+        df = synthetic_inventory(args.rows, *load_template_codelists())
+        payloads = [payload for _, payload, _ in import_datasets.build_payloads(df, "BENCH")]
+
+        print(f"{args.rows} rows, {args.latency * 1000:.0f} ms per POST, {args.error_rate:.0%} transient 503s\n")
+        print(f"{'configuration':<32} {'wall s':>8} {'rows/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'POSTs':>7} {'new conns':>10} {'failed':>7}")
+
+        for label, max_workers, batch_size in CONFIGURATIONS:
+            api.reset()
+            wall, latencies, failures = run(import_datasets, payloads, max_workers, batch_size)
+            stats = api.stats()
+            print(
+                f"{label:<32} {wall:>8.2f} {args.rows / wall:>8.0f} "
+                f"{statistics.median(latencies) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>8.1f} "
+                f"{stats['requests'].get('POST datasets', 0):>7} {stats['connections']:>10} {failures:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cost of /template.xlsx: first build, cached downloads, 304 revalidation and codelist refreshes.
+
+Usage: python -m benchmarks.template [--requests 200]
+
+Runs in one process against the mock API through the Flask test client. After the first build,
+downloads are served from the cached bytes and If-None-Match requests answer 304 without a body;
+a codelist refresh with unchanged entries must keep the ETag and must not rebuild the workbook.
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.mock_api import MockApi
+from benchmarks.submission import percentile
+
+
+def _timed(client, path, repeat, headers=None):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        response.get_data()
+        timings.append(time.perf_counter() - start)
+    return response, timings
+
+
+def _row(label, response, timings):
+    print(
+        f"{label:<24} {response.status_code:>6} {len(response.get_data()):>9} "
+        f"{statistics.median(timings) * 1000:>9.2f} {percentile(timings, 0.99) * 1000:>9.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="downloads per cached scenario")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with MockApi(port=args.port) as api:
+        os.environ.update(
+            {
+                "API_BASE_URL": api.partner_url,
+                "I14Y_PUBLIC_API_BASE_URL": api.public_url,
+                "JWT_EXPECTED_ISSUER": api.issuer,
+                "CODELIST_SNAPSHOT_PATH": "",
+            }
+        )
+        from core import metrics
+        from core.codelist_utils import CODELISTS, refresh_codelist
+        from run import app
+
+        client = app.test_client()
+        print(f"{'scenario':<24} {'status':>6} {'bytes':>9} {'p50 ms':>9} {'p99 ms':>9}")
+
+        response, timings = _timed(client, "/template.xlsx", 1)
+        _row("first build", response, timings)
+        etag = response.headers["ETag"]
+
+        response, timings = _timed(client, "/template.xlsx", args.requests)
+        _row("cached download", response, timings)
+
+        response, timings = _timed(client, "/template.xlsx", args.requests, {"If-None-Match": etag})
+        _row("If-None-Match", response, timings)
+
+        for name in CODELISTS:
+            refresh_codelist(name)
+        response, timings = _timed(client, "/template.xlsx", 1, {"If-None-Match": etag})
+        _row("after codelist refresh", response, timings)
+
+        builds = sum(value for _, value in metrics.local_values("i14y_template_builds_total"))
+        print(f"\nworkbook builds: {builds:.0f}, ETag unchanged after refresh: {response.status_code == 304}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Submission against a mock API that only accepts a few concurrent POSTs and answers 429 otherwise.
+
+Usage: python -m benchmarks.throttling [--rows 600] [--capacity 4] [--workers 16]
+
+Compares a fixed in-flight window (the pool size, no adaptation) with the adaptive limiter, which
+halves its window on 429/503, honours Retry-After and grows back additively.
+"""
+import argparse
+import os
+import time
+
+from benchmarks.mock_api import MockApi
+
+
+def run(import_datasets, payloads, workers):
+    start = time.perf_counter()
+    failures = sum(
+        error is not None
+        for _, _, error in import_datasets.submit_datasets(enumerate(payloads), "Bearer benchmark", workers, 1)
+    )
+    return time.perf_counter() - start, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=600)
+    parser.add_argument("--capacity", type=int, default=4, help="concurrent POSTs the mock accepts")
+    parser.add_argument("--workers", type=int, default=16, help="submission threads")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    with MockApi(port=args.port, latency=args.latency, capacity=args.capacity, retry_after=args.retry_after) as api:
+        os.environ["API_BASE_URL"] = api.partner_url
+
+        from benchmarks.payload_build import load_template_codelists, synthetic_inventory
+        from core import import_datasets, rate_limit
+
+        df = synthetic_inventory(args.rows, *load_template_codelists())
+        payloads = [payload for _, payload, _ in import_datasets.build_payloads(df, "BENCH")]
+
+        print(f"{args.rows} rows, {args.workers} workers, mock accepts {args.capacity} concurrent POSTs\n")
+        print(f"{'limiter':<28} {'wall s':>8} {'rows/s':>8} {'POSTs':>7} {'429s':>6} {'failed':>7} {'final window':>13}")
+
+        for label, adaptive in (("fixed window", False), ("adaptive (AIMD + Retry-After)", True)):
+            api.reset()
+            limiter = rate_limit.configure_submission_limiter(initial=args.workers, maximum=args.workers)
+            if not adaptive:
+                limiter.window.on_throttle = lambda at_capacity=True: None
+                limiter.bucket.pause = lambda seconds: None
+
+            wall, failures = run(import_datasets, payloads, args.workers)
+            stats = api.stats()
+            print(
+                f"{label:<28} {wall:>8.2f} {args.rows / wall:>8.0f} {stats['requests'].get('POST datasets', 0):>7} "
+                f"{stats['statuses'].get('429', 0):>6} {failures:>7} {limiter.snapshot()['concurrency_limit']:>13}"
+            )
+
+
+if __name__ == "__main__":
+    main()
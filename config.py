@@ -1,23 +1,101 @@
 import os
+import tempfile
 
 # I14Y API configuration
 API_BASE_URL = os.environ.get("API_BASE_URL", "https://api.i14y.admin.ch/api/partner/v1")
+I14Y_PUBLIC_API_BASE_URL = os.environ.get("I14Y_PUBLIC_API_BASE_URL", "https://api.i14y.admin.ch/api/public/v1")
 
-# Flask web application settings
-# Prefer standardized SECRET_KEY; keep FLASK_SECRET_KEY as backward-compat fallback.
-SECRET_KEY = os.environ.get("SECRET_KEY") or os.environ.get("FLASK_SECRET_KEY")
+# Codelist cache: entries older than the TTL are served while being refreshed in the background
+CODELIST_CACHE_TTL = int(os.environ.get("CODELIST_CACHE_TTL", 3600))  # seconds
+# Optional JSON snapshot of the cached codelists, read on cold start and rewritten after each refresh
+CODELIST_SNAPSHOT_PATH = os.environ.get("CODELIST_SNAPSHOT_PATH")
+# Labels without an exact match (after case, accent and spacing normalization) take the closest
+# label at least this similar (0-1, 0 disables); results are memoized per codelist refresh
+LABEL_MATCH_CUTOFF = float(os.environ.get("LABEL_MATCH_CUTOFF", 0.9))
+LABEL_MATCH_CACHE_SIZE = int(os.environ.get("LABEL_MATCH_CACHE_SIZE", 1024))
+
+# Rows parsed from a workbook before their payloads are built and handed to the submission pool
+READ_CHUNK_SIZE = int(os.environ.get("READ_CHUNK_SIZE", 200))
+
+# Maximum number of dataset POSTs in flight at the same time during an import
+SUBMIT_CONCURRENCY = int(os.environ.get("SUBMIT_CONCURRENCY", 8))
+# Datasets sent back to back by one worker over a single keep-alive connection; 1 submits row by row
+SUBMIT_BATCH_SIZE = int(os.environ.get("SUBMIT_BATCH_SIZE", 1))
+# How often a dataset rejected with 429/503 (or a connect timeout) is sent again, with jittered backoff
+SUBMIT_RETRIES = int(os.environ.get("SUBMIT_RETRIES", 4))
+SUBMIT_RETRY_BACKOFF = float(os.environ.get("SUBMIT_RETRY_BACKOFF", 0.5))  # seconds, doubled per attempt
+SUBMIT_RETRY_MAX_DELAY = float(os.environ.get("SUBMIT_RETRY_MAX_DELAY", 30))  # seconds
+
+# Process-wide limits shared by all imports: requests per second (0 = unlimited) and the ceiling of
+# the in-flight window, which halves on 429/503 and grows back by one per window of successes
+SUBMIT_RATE_LIMIT = float(os.environ.get("SUBMIT_RATE_LIMIT", 0))
+SUBMIT_RATE_BURST = float(os.environ.get("SUBMIT_RATE_BURST", 10))
+SUBMIT_MAX_IN_FLIGHT = int(os.environ.get("SUBMIT_MAX_IN_FLIGHT", 32))
+
+# Background import jobs: concurrent imports per process, and how long finished results are kept
+IMPORT_WORKERS = int(os.environ.get("IMPORT_WORKERS", 4))
+# Imports waiting for a worker thread per process; each holds its spooled upload, so more are refused
+JOB_QUEUE_MAX_SIZE = int(os.environ.get("JOB_QUEUE_MAX_SIZE", 2 * IMPORT_WORKERS))
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 3600))  # seconds
+# Job snapshots are shared through this directory so any gunicorn worker can answer status requests
+JOB_STORE_DIR = os.environ.get("JOB_STORE_DIR", os.path.join(tempfile.gettempdir(), "i14y_jobs"))
+# Created-dataset links and error messages of finished imports, paged by the results page
+RESULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", os.path.join(tempfile.gettempdir(), "i14y_results.sqlite3"))
+RESULTS_PAGE_SIZE = int(os.environ.get("RESULTS_PAGE_SIZE", 50))
+
+# Shared outbound HTTP client (I14Y API, codelists, OIDC discovery and JWKS)
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 10))  # seconds
+SUBMIT_TIMEOUT = float(os.environ.get("SUBMIT_TIMEOUT", 20))  # seconds, dataset submissions
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))  # distinct hosts kept pooled
+# Connections per host: one for every submission the imports of a process can have in flight
+HTTP_POOL_MAXSIZE = int(
+    os.environ.get("HTTP_POOL_MAXSIZE", max(10, SUBMIT_MAX_IN_FLIGHT, IMPORT_WORKERS * SUBMIT_CONCURRENCY))
+)
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 3))  # idempotent requests only
+HTTP_RETRY_BACKOFF = float(os.environ.get("HTTP_RETRY_BACKOFF", 0.5))
+
+# SQLite ledger of created datasets; unchanged rows of a re-uploaded inventory are skipped.
+# Set IMPORT_LEDGER_PATH to an empty string to always submit every row.
+IMPORT_LEDGER_PATH = os.environ.get(
+    "IMPORT_LEDGER_PATH", os.path.join(tempfile.gettempdir(), "i14y_import_ledger.sqlite3")
+)
+IMPORT_LEDGER_TTL = int(os.environ.get("IMPORT_LEDGER_TTL", 30 * 24 * 3600))  # seconds
 
-if not SECRET_KEY:
-    raise ValueError("Missing SECRET_KEY environment variable")
-if len(SECRET_KEY) < 32:
-    raise ValueError("SECRET_KEY must be at least 32 characters long")
+# Update mode: the publisher's existing datasets are listed page by page and cached per process
+REMOTE_DATASETS_PAGE_SIZE = int(os.environ.get("REMOTE_DATASETS_PAGE_SIZE", 500))
+REMOTE_DATASETS_CACHE_TTL = int(os.environ.get("REMOTE_DATASETS_CACHE_TTL", 300))  # seconds
 
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+# Each worker process writes its metrics here; /metrics sums the files of all workers
+METRICS_DIR = os.environ.get("METRICS_DIR", os.path.join(tempfile.gettempdir(), "i14y_metrics"))
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", 1.0))  # seconds
+# Bearer token a scraper must send to /metrics; without one the endpoint is not served
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Live import progress over Server-Sent Events; status.html falls back to polling when disabled.
+# Every open stream occupies a worker thread, so streams are cut after SSE_MAX_STREAM_SECONDS and
+# the browser reconnects.
+PROGRESS_SSE = os.environ.get("PROGRESS_SSE", "1").lower() in ("1", "true", "yes")
+SSE_MAX_STREAM_SECONDS = int(os.environ.get("SSE_MAX_STREAM_SECONDS", 30))
+SSE_MIN_INTERVAL = float(os.environ.get("SSE_MIN_INTERVAL", 0.25))  # seconds between progress messages
+
+# Flask web application settings, checked by check_web_settings() when the app is created so the
+# batch CLI runs with the API settings alone
+# Prefer standardized SECRET_KEY; keep FLASK_SECRET_KEY as backward-compat fallback.
+SECRET_KEY = os.environ.get("SECRET_KEY") or os.environ.get("FLASK_SECRET_KEY")
 JWT_EXPECTED_ISSUER = os.environ.get("JWT_EXPECTED_ISSUER")
-if not JWT_EXPECTED_ISSUER:
-    raise ValueError("Missing JWT_EXPECTED_ISSUER environment variable")
 
 MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))  # 16MB max file size by default
-ALLOWED_EXTENSIONS = {"xlsx"}
+# Uploads up to this size are parsed from memory; larger ones spill to an anonymous temporary file
+UPLOAD_SPOOL_MAX_SIZE = int(os.environ.get("UPLOAD_SPOOL_MAX_SIZE", 8 * 1024 * 1024))
+ALLOWED_EXTENSIONS = {"xlsx", "csv", "ndjson", "jsonl"}
+
+# OIDC discovery and JWKS documents are cached for their Cache-Control max-age, or this long without one
+JWKS_CACHE_TTL = int(os.environ.get("JWKS_CACHE_TTL", 3600))  # seconds
+# Minimum time between JWKS downloads triggered by an unknown kid (key rotation)
+JWKS_REFETCH_COOLDOWN = int(os.environ.get("JWKS_REFETCH_COOLDOWN", 60))  # seconds
+# Verified tokens whose claims are memoized until they expire
+VERIFIED_TOKEN_CACHE_SIZE = int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", 256))
 
 # JWT configuration
 JWT_DECODE_OPTIONS = {
@@ -28,3 +106,13 @@ JWT_DECODE_OPTIONS = {
     "verify_aud": False,
     "verify_iss": bool(JWT_EXPECTED_ISSUER),
 }
+
+
+def check_web_settings():
+    """Refuse to start the web app without a strong session key and the expected token issuer"""
+    if not SECRET_KEY:
+        raise ValueError("Missing SECRET_KEY environment variable")
+    if len(SECRET_KEY) < 32:
+        raise ValueError("SECRET_KEY must be at least 32 characters long")
+    if not JWT_EXPECTED_ISSUER:
+        raise ValueError("Missing JWT_EXPECTED_ISSUER environment variable")
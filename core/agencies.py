@@ -0,0 +1,30 @@
+# Optional inventory column naming the agency a row is imported for
+PUBLISHER_COLUMN = "publisher"
+
+
+def split_agency(agency):
+    """Organization id and publisher name of a token agency ("ORG\\Publisher"); the publisher defaults to the organization"""
+    organization_id, _, publisher = agency.partition("\\")
+    return organization_id, publisher or organization_id
+
+
+def _agency_key(value):
+    return str(value).strip().casefold()
+
+
+def agency_lookup(agencies):
+    """Map organization ids, publisher names and full agency entries to ``(organization_id, publisher)``.
+
+    Matching ignores case and surrounding whitespace; the first agency wins when a name repeats.
+    """
+    lookup = {}
+    for agency in agencies:
+        organization_id, publisher = split_agency(agency)
+        for name in (agency, publisher, organization_id):
+            lookup.setdefault(_agency_key(name), (organization_id, publisher))
+    return lookup
+
+
+def match_agency(lookup, value):
+    """``(organization_id, publisher)`` for a publisher column value, or None if the token has no such agency"""
+    return lookup.get(_agency_key(value))
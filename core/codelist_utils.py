@@ -1,62 +1,386 @@
-import requests
+import difflib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
 import pandas as pd
 
+from core import http_client
+from config import (
+    I14Y_PUBLIC_API_BASE_URL,
+    CODELIST_CACHE_TTL,
+    CODELIST_SNAPSHOT_PATH,
+    LABEL_MATCH_CACHE_SIZE,
+    LABEL_MATCH_CUTOFF,
+)
+
+
+logger = logging.getLogger(__name__)
+
+THEMES_CONCEPT_ID = "08da58dc-4dc8-f9cb-b6f2-7d16b3fa0cde"
+LICENSE_CONCEPT_ID = "08db7eb9-8d92-b301-982e-5f7cbd44e45f"
+
+# Failed refreshes are retried after this many seconds instead of on every lookup
+CODELIST_RETRY_AFTER = 60
+
+# Label languages of the codelist exports; German wins when two languages share a label
+LABEL_LANGUAGES = ("de", "fr", "it", "en")
+# Near matches are only searched for labels up to this length
+MAX_FUZZY_LABEL_LENGTH = 200
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _fetch_codelist(concept_id, initial=None):
+    """Download a codelist export and index it by its labels in every language and by code"""
+    url = f"{I14Y_PUBLIC_API_BASE_URL}/concepts/{concept_id}/codelist-entries/exports/json"
+    response = http_client.get(url, endpoint="i14y.codelist")
+    response.raise_for_status()
+    data = response.json()
+
+    result = dict(initial or {})
+    for item in data["data"]:
+        code = item.get("code")
+        if not code:
+            continue
+        names = item.get("name") or {}
+        for lang in LABEL_LANGUAGES:
+            label = names.get(lang)
+            if label:
+                result.setdefault(label, code)
+        if names.get("de"):
+            result[names["de"]] = code
+            result[code] = code
+
+    return result
+
+
+def normalize_label(value):
+    """Case-, accent- and punctuation-insensitive form of a label, e.g. 'nicht offentlich' for 'Nicht-öffentlich'"""
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+class LabelIndex:
+    """Codes by normalized label, with a bounded memo of near matches for misspelled labels.
+
+    Near matches are only searched among labels, never codes, and only with ``fuzzy``. A near
+    match must reach LABEL_MATCH_CUTOFF similarity and must not be ambiguous: when the two
+    closest labels both qualify but belong to different codes, nothing is matched.
+    """
+
+    def __init__(self, mapping, fuzzy=True):
+        self.exact = {}
+        # Normalized label -> label as listed, the candidates for near matches
+        self._labels = {}
+        for label, code in mapping.items():
+            key = normalize_label(label)
+            self.exact.setdefault(key, code)
+            if label != code:
+                self._labels.setdefault(key, label)
+        self._candidates = list(self._labels)
+        self.fuzzy = fuzzy and LABEL_MATCH_CUTOFF > 0
+        self._near = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, value):
+        """The code for a label or code in any supported spelling, or None"""
+        return self.match(value)[0]
+
+    def match(self, value):
+        """``(code, label)`` for a value; ``label`` is the known label a misspelled value was taken for, else None"""
+        key = normalize_label(value)
+        code = self.exact.get(key)
+        if code is not None or not key or not self.fuzzy or len(key) > MAX_FUZZY_LABEL_LENGTH:
+            return code, None
+
+        with self._lock:
+            if key in self._near:
+                self._near.move_to_end(key)
+                return self._near[key]
+
+        matches = difflib.get_close_matches(key, self._candidates, n=2, cutoff=LABEL_MATCH_CUTOFF)
+        codes = {self.exact[match] for match in matches}
+        near = (codes.pop(), self._labels[matches[0]]) if len(codes) == 1 else (None, None)
+
+        with self._lock:
+            self._near[key] = near
+            while len(self._near) > LABEL_MATCH_CACHE_SIZE:
+                self._near.popitem(last=False)
+        return near
+
 
 def get_themes_codelist():
     """Fetch themes codelist from I14Y API"""
-    url = "https://api.i14y.admin.ch/api/public/v1/concepts/08da58dc-4dc8-f9cb-b6f2-7d16b3fa0cde/codelist-entries/exports/json"
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        result = {}
-        for item in data["data"]:
-            code = item.get("code")
-            label = item.get("name", {}).get("de", "")
-            if code and label:
-                result[label] = code
-                result[code] = code
-
-        return result
+        return _fetch_codelist(THEMES_CONCEPT_ID)
     except Exception as e:
-        print(f"Error fetching themes codelist: {e}")
+        logger.warning("Error fetching themes codelist: %s", e)
         return {}
 
 
 def get_license_codelist():
     """Fetch license codelist from I14Y API"""
-    url = "https://api.i14y.admin.ch/api/public/v1/concepts/08db7eb9-8d92-b301-982e-5f7cbd44e45f/codelist-entries/exports/json"
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        result = {"Unknown": "UNKNOWN"}
-        for item in data["data"]:
-            code = item.get("code")
-            label = item.get("name", {}).get("de", "")
-            if code and label:
-                result[label] = code
-                result[code] = code
-
-        return result
+        return _fetch_codelist(LICENSE_CONCEPT_ID, {"Unknown": "UNKNOWN"})
     except Exception as e:
-        print(f"Error fetching license codelist: {e}")
+        logger.warning("Error fetching license codelist: %s", e)
         return {"Unknown": "UNKNOWN"}
 
 
-# Static mapping for access rights
+# Codelists known to the cache: name -> (concept id, entries present even when the fetch fails)
+CODELISTS = {
+    "themes": (THEMES_CONCEPT_ID, {}),
+    "licenses": (LICENSE_CONCEPT_ID, {"Unknown": "UNKNOWN"}),
+}
+# Codelists whose labels must match exactly (up to case, accents and spacing): a near miss of a
+# license label is more likely a different license than a typo
+EXACT_CODELISTS = frozenset({"licenses"})
+
+# Process-wide cache: name -> {"data": dict, "fetched_at": float, "expires_at": float}
+_codelist_cache = {}
+_codelist_stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+_cache_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+_refreshing = set()
+_snapshot_loaded = False
+_scheduler = None
+
+
+def _load_snapshot():
+    """Seed the cache from the on-disk snapshot so a cold worker starts warm"""
+    global _snapshot_loaded
+    _snapshot_loaded = True
+
+    if not CODELIST_SNAPSHOT_PATH or not os.path.exists(CODELIST_SNAPSHOT_PATH):
+        return
+
+    try:
+        with open(CODELIST_SNAPSHOT_PATH, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except Exception as e:
+        logger.warning("Failed to read codelist snapshot %s: %s", CODELIST_SNAPSHOT_PATH, e)
+        return
+
+    _seed(snapshot)
+
+
+def _seed(snapshot):
+    for name, entry in snapshot.items():
+        if name in CODELISTS and name not in _codelist_cache:
+            fetched_at = entry.get("fetched_at", 0)
+            _codelist_cache[name] = {
+                "data": entry.get("data", {}),
+                "fetched_at": fetched_at,
+                "expires_at": fetched_at + CODELIST_CACHE_TTL,
+            }
+
+
+def export_codelists():
+    """The cached codelists in snapshot form, for handing to another process"""
+    with _cache_lock:
+        return {
+            name: {"data": entry["data"], "fetched_at": entry["fetched_at"]}
+            for name, entry in _codelist_cache.items()
+        }
+
+
+def seed_codelists(snapshot):
+    """Fill an empty cache from export_codelists() of another process instead of fetching again"""
+    global _snapshot_loaded
+    with _cache_lock:
+        _snapshot_loaded = True
+        _seed(snapshot)
+
+
+def _save_snapshot():
+    if not CODELIST_SNAPSHOT_PATH:
+        return
+
+    snapshot = export_codelists()
+
+    try:
+        tmp_path = f"{CODELIST_SNAPSHOT_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, CODELIST_SNAPSHOT_PATH)
+    except Exception as e:
+        logger.warning("Failed to write codelist snapshot %s: %s", CODELIST_SNAPSHOT_PATH, e)
+
+
+def refresh_codelist(name):
+    """Fetch a codelist and store it in the cache; keeps the previous entry on failure"""
+    concept_id, initial = CODELISTS[name]
+
+    try:
+        data = _fetch_codelist(concept_id, initial)
+    except Exception as e:
+        logger.warning("Error fetching %s codelist: %s", name, e)
+        now = time.time()
+        with _cache_lock:
+            _codelist_stats["refresh_errors"] += 1
+            entry = _codelist_cache.get(name)
+            if entry is None:
+                entry = _codelist_cache[name] = {"data": dict(initial), "fetched_at": 0}
+            entry["expires_at"] = now + CODELIST_RETRY_AFTER
+            _refreshing.discard(name)
+            return entry["data"]
+
+    with _cache_lock:
+        _codelist_stats["refreshes"] += 1
+
+    store_codelist(name, data)
+    return data
+
+
+def store_codelist(name, data):
+    """Put a freshly fetched codelist into the cache and the on-disk snapshot"""
+    now = time.time()
+    with _cache_lock:
+        _codelist_cache[name] = {"data": data, "fetched_at": now, "expires_at": now + CODELIST_CACHE_TTL}
+        _refreshing.discard(name)
+
+    _save_snapshot()
+
+
+def _reset_after_fork():
+    """A forked worker inherits the cache but not the scheduler thread or refreshes in progress"""
+    global _scheduler
+    _scheduler = None
+    _refreshing.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        _scheduler = BackgroundScheduler(daemon=True)
+        _scheduler.start()
+    return _scheduler
+
+
+def _schedule_refresh(name):
+    """Refresh a stale codelist in the background; concurrent callers share one refresh"""
+    with _cache_lock:
+        if name in _refreshing:
+            return
+        _refreshing.add(name)
+
+    try:
+        _get_scheduler().add_job(refresh_codelist, args=[name], id=f"codelist-refresh-{name}", replace_existing=True)
+    except Exception as e:
+        logger.warning("Could not schedule %s codelist refresh: %s", name, e)
+        with _cache_lock:
+            _refreshing.discard(name)
+
+
+def get_cached_codelist(name):
+    """Return a codelist from the process-wide cache, serving stale entries while they refresh"""
+    with _cache_lock:
+        if not _snapshot_loaded:
+            _load_snapshot()
+
+        entry = _codelist_cache.get(name)
+        if entry is not None:
+            if entry["expires_at"] > time.time():
+                _codelist_stats["hits"] += 1
+                return entry["data"]
+            _codelist_stats["stale_hits"] += 1
+
+    if entry is not None:
+        _schedule_refresh(name)
+        return entry["data"]
+
+    # Cold cache: fetch synchronously, once, even when many threads miss at the same time
+    with _refresh_lock:
+        with _cache_lock:
+            entry = _codelist_cache.get(name)
+            if entry is not None:
+                _codelist_stats["hits"] += 1
+                return entry["data"]
+            _codelist_stats["misses"] += 1
+            _refreshing.add(name)
+        return refresh_codelist(name)
+
+
+def get_codelist_cache_stats():
+    """Counters and entry ages of the codelist cache"""
+    now = time.time()
+    with _cache_lock:
+        stats = dict(_codelist_stats)
+        stats["entries"] = {
+            name: {"size": len(entry["data"]), "age_seconds": round(now - entry["fetched_at"], 1)}
+            for name, entry in _codelist_cache.items()
+        }
+    return stats
+
+
+def get_label_index(name):
+    """LabelIndex of a cached codelist, built once per refresh"""
+    data = get_cached_codelist(name)
+    with _cache_lock:
+        entry = _codelist_cache.get(name)
+        if entry is None or entry["data"] is not data:
+            return LabelIndex(data, fuzzy=name not in EXACT_CODELISTS)
+        if "index" not in entry:
+            entry["index"] = LabelIndex(data, fuzzy=name not in EXACT_CODELISTS)
+        return entry["index"]
+
+
+def display_labels(mapping):
+    """One label per code of a label -> code mapping, for dropdowns.
+
+    The first label of a code wins: the German one, which _fetch_codelist inserts first and
+    ACCESS_RIGHTS_MAPPING lists first. Codes that only map to themselves are left out.
+    """
+    labels = {}
+    for label, code in mapping.items():
+        if label != code:
+            labels.setdefault(code, label)
+    return labels
+
+
+def clear_codelist_cache():
+    global _snapshot_loaded
+    with _cache_lock:
+        _codelist_cache.clear()
+        _refreshing.clear()
+        _snapshot_loaded = False
+
+
+# Static mapping for access rights (German labels first, as in the inventory template)
 ACCESS_RIGHTS_MAPPING = {
     "Nicht-öffentlich": "NON_PUBLIC",
     "Öffentlich": "PUBLIC",
     "Eingeschränkt": "RESTRICTED",
     "Vertraulich": "CONFIDENTIAL",
+    "Non public": "NON_PUBLIC",
+    "Public": "PUBLIC",
+    "Restreint": "RESTRICTED",
+    "Confidentiel": "CONFIDENTIAL",
+    "Non pubblico": "NON_PUBLIC",
+    "Pubblico": "PUBLIC",
+    "Limitato": "RESTRICTED",
+    "Confidenziale": "CONFIDENTIAL",
+    "Non-public": "NON_PUBLIC",
+    "Restricted": "RESTRICTED",
+    "Confidential": "CONFIDENTIAL",
     "NON_PUBLIC": "NON_PUBLIC",
     "PUBLIC": "PUBLIC",
     "RESTRICTED": "RESTRICTED",
     "CONFIDENTIAL": "CONFIDENTIAL",
 }
+ACCESS_RIGHTS_INDEX = LabelIndex(ACCESS_RIGHTS_MAPPING)
 
 
 def map_theme_to_code(theme_value):
@@ -64,8 +388,8 @@ def map_theme_to_code(theme_value):
     if pd.isna(theme_value) or not theme_value:
         return None
 
-    themes_map = get_themes_codelist()
-    return themes_map.get(theme_value, theme_value)
+    themes_map = get_cached_codelist("themes")
+    return themes_map.get(theme_value) or get_label_index("themes").lookup(theme_value) or theme_value
 
 
 def map_license_to_code(license_value):
@@ -73,8 +397,8 @@ def map_license_to_code(license_value):
     if pd.isna(license_value) or not license_value:
         return None
 
-    license_map = get_license_codelist()
-    return license_map.get(license_value, license_value)
+    license_map = get_cached_codelist("licenses")
+    return license_map.get(license_value) or get_label_index("licenses").lookup(license_value) or license_value
 
 
 def map_access_rights_to_code(access_rights_value):
@@ -82,4 +406,8 @@ def map_access_rights_to_code(access_rights_value):
     if pd.isna(access_rights_value) or not access_rights_value:
         return None
 
-    return ACCESS_RIGHTS_MAPPING.get(access_rights_value, access_rights_value)
+    return (
+        ACCESS_RIGHTS_MAPPING.get(access_rights_value)
+        or ACCESS_RIGHTS_INDEX.lookup(access_rights_value)
+        or access_rights_value
+    )
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+from config import (
+    HTTP_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF,
+)
+from core import metrics
+
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Methods never retried by the session itself
+WRITE_METHODS = frozenset({"POST", "PUT"})
+
+_session = None
+_session_pid = None
+_adapter = None
+_session_lock = threading.Lock()
+
+
+def _create_session():
+    """Session with keep-alive connection pools and backoff retries for idempotent requests"""
+    # Imported on first use so a starting worker can answer /health sooner
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUS_CODES,
+        # Dataset writes are retried by the submission path, where 429/503 also feed the rate limiter
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS - WRITE_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session, adapter
+
+
+def get_session():
+    """Return the shared per-process session; a forked worker gets its own pools"""
+    global _session, _session_pid, _adapter
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session, _adapter = _create_session()
+                _session_pid = pid
+    return _session
+
+
+def request(method, url, endpoint=None, **kwargs):
+    """Send a request over the shared session and record its latency under ``endpoint``"""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    endpoint = endpoint or f"{method.upper()} {url.split('?', 1)[0]}"
+
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = get_session().request(method, url, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        metrics.observe("i14y_http_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        metrics.inc("i14y_http_responses_total", endpoint=endpoint, status=status)
+
+
+def get(url, endpoint=None, **kwargs):
+    return request("GET", url, endpoint=endpoint, **kwargs)
+
+
+def post(url, endpoint=None, **kwargs):
+    return request("POST", url, endpoint=endpoint, **kwargs)
+
+
+def put(url, endpoint=None, **kwargs):
+    return request("PUT", url, endpoint=endpoint, **kwargs)
+
+
+def get_http_metrics():
+    """Connection reuse and per-endpoint latency histograms for this process"""
+    connections = 0
+    requests_sent = 0
+    if _adapter is not None and _session_pid == os.getpid():
+        pools = _adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+
+    errors = {}
+    for labels, count in metrics.local_values("i14y_http_responses_total"):
+        if labels["status"] == "error" or int(labels["status"]) >= 400:
+            errors[labels["endpoint"]] = errors.get(labels["endpoint"], 0) + count
+
+    endpoints = {
+        labels["endpoint"]: {
+            "count": histogram["count"],
+            "errors": errors.get(labels["endpoint"], 0),
+            "sum_seconds": round(histogram["sum"], 6),
+            "buckets": dict(zip([*map(str, metrics.DURATION_BUCKETS), "+Inf"], histogram["buckets"])),
+        }
+        for labels, histogram in metrics.local_values("i14y_http_request_seconds")
+    }
+
+    return {
+        "connections_opened": connections,
+        "requests_sent": requests_sent,
+        "connection_reuse_ratio": round(1 - connections / requests_sent, 4) if requests_sent else 0.0,
+        "endpoints": endpoints,
+    }
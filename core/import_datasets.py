@@ -1,11 +1,52 @@
-import traceback
+import io
+import itertools
+import logging
+import os
+import queue
+import threading
+import numpy as np
 import pandas as pd
-import requests
 from datetime import datetime
 import json
-import sys
-from config import API_BASE_URL
-from core.codelist_utils import map_theme_to_code, map_license_to_code, map_access_rights_to_code
+import random
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import ConnectTimeout
+from config import (
+    API_BASE_URL,
+    READ_CHUNK_SIZE,
+    SUBMIT_CONCURRENCY,
+    SUBMIT_TIMEOUT,
+    SUBMIT_BATCH_SIZE,
+    SUBMIT_RETRIES,
+    SUBMIT_RETRY_BACKOFF,
+    SUBMIT_RETRY_MAX_DELAY,
+)
+from core import http_client, metrics
+from core.agencies import PUBLISHER_COLUMN, agency_lookup, match_agency, split_agency
+from core.rate_limit import THROTTLE_STATUS_CODES, get_submission_limiter, parse_retry_after
+from core.inventory_reader import FIRST_CHUNK_SIZE, READ_ERROR_COLUMN, iter_inventory_chunks
+from core.ledger import open_ledger, payload_hash
+from core.remote_datasets import changed_fields, forget_remote_datasets, get_remote_datasets
+from core.validation import ValidationError, label_warnings, validate_rows
+from core.codelist_utils import (
+    ACCESS_RIGHTS_INDEX,
+    ACCESS_RIGHTS_MAPPING,
+    get_cached_codelist,
+    get_label_index,
+    map_theme_to_code,
+    map_license_to_code,
+    map_access_rights_to_code,
+)
+
+
+logger = logging.getLogger(__name__)
+
+STAGE_SECONDS = metrics.STAGE_SECONDS
+
+# Rejections the API answers before creating anything
+RETRYABLE_STATUS_CODES = (429, 503)
 
 
 def create_language_object(text, lang="de", label=False):
@@ -155,89 +196,1201 @@ def create_dataset_payload(row, publisher_identifier=None):
     return payload
 
 
+KEYWORD_COLUMNS = [f"keywords_{i}" for i in range(1, 4)]
+DISTRIBUTION_INDICES = range(1, 4)
+
+
+def _column(df, col):
+    """Values of a column as plain Python objects, with missing cells (and missing columns) as None"""
+    if col not in df.columns:
+        return [None] * len(df)
+
+    series = df[col]
+    return [value if present else None for value, present in zip(series.astype(object).tolist(), series.notna().tolist())]
+
+
+def _titled(df):
+    """Rows with a title, plus unreadable lines so they are reported as failed rows"""
+    return df[[bool(title) or error is not None for title, error in zip(_column(df, "title"), _column(df, READ_ERROR_COLUMN))]]
+
+
+def _code_column(df, col, mapping, index=None):
+    """Map labels to codes with Series.map; unknown values pass through unchanged like map_*_to_code.
+
+    Values without an exact match are resolved through ``index`` (a LabelIndex), once per
+    distinct value.
+    """
+    if col not in df.columns:
+        return [None] * len(df)
+
+    series = df[col].astype(object)
+    mapped = series.map(mapping)
+    if index is not None:
+        missing = mapped.isna() & series.notna()
+        if missing.any():
+            resolved = {value: index.lookup(value) for value in series[missing].unique()}
+            mapped = mapped.where(~missing, series.map(resolved))
+    codes = mapped.where(mapped.notna(), series).tolist()
+    return [
+        code if is_present and value else None
+        for code, value, is_present in zip(codes, series.tolist(), series.notna().tolist())
+    ]
+
+
+def _isoformat(value):
+    try:
+        return value.isoformat()
+    except Exception as e:
+        return e
+
+
+def _isoformat_column(df, col, required=False):
+    """ISO strings per cell; cells that cannot be formatted hold the exception the row builder would raise"""
+    if col not in df.columns:
+        return [KeyError(col) if required else None] * len(df)
+
+    series = df[col]
+    present = series.notna().tolist()
+
+    if pd.api.types.is_datetime64_dtype(series):
+        # Timestamp.isoformat() drops the fractional part for whole seconds, so numpy's formatting matches it
+        formatted = np.datetime_as_string(series.to_numpy().astype("datetime64[s]"), unit="s").tolist()
+        fractional = ((series.dt.microsecond != 0) | (series.dt.nanosecond != 0)) & series.notna()
+        for i in np.flatnonzero(fractional.to_numpy()):
+            formatted[i] = series.iat[i].isoformat()
+        return [value if is_present else None for value, is_present in zip(formatted, present)]
+
+    return [_isoformat(value) if is_present else None for value, is_present in zip(series.astype(object).tolist(), present)]
+
+
+def _first_error(*values):
+    for value in values:
+        if isinstance(value, Exception):
+            return value
+    return None
+
+
+def build_payloads(df, publisher_identifier=None):
+    """Columnar equivalent of create_dataset_payload for a whole DataFrame.
+
+    Every column is normalized once (null masks, ISO dates, code mapping) and the payloads are
+    then assembled from plain tuples. Yields ``(index, payload, error)`` in row order, where
+    ``error`` is the exception create_dataset_payload would have raised for that row.
+    """
+    with metrics.timed(STAGE_SECONDS, stage="codelist_lookup"):
+        themes_map = get_cached_codelist("themes")
+        license_map = get_cached_codelist("licenses")
+        themes_index = get_label_index("themes")
+        license_index = get_label_index("licenses")
+
+    titles = df["title"].astype(object).tolist()
+    descriptions = df["description"].astype(object).tolist()
+    access_rights = _code_column(df, "accessRights", ACCESS_RIGHTS_MAPPING, ACCESS_RIGHTS_INDEX)
+    issued = _isoformat_column(df, "issued", required=True)
+    modified = _isoformat_column(df, "modified", required=True)
+    identificators = _column(df, "identificator")
+    keywords = list(zip(*(_column(df, col) for col in KEYWORD_COLUMNS)))
+    contact_fns = _column(df, "contactPoints_fn")
+    contact_emails = _column(df, "contactPoints_hasEmail")
+    contact_phones = _column(df, "contactPoints_hasTelephone")
+    themes = _code_column(df, "themes_label", themes_map, themes_index)
+    spatials = _column(df, "spatial")
+    temporal_starts = _isoformat_column(df, "temporalCoverage_start")
+    temporal_ends = _isoformat_column(df, "temporalCoverage_end")
+    distributions = list(
+        zip(
+            *(
+                list(
+                    zip(
+                        _column(df, f"distribution_accessUrl_{i}"),
+                        _column(df, f"distribution_downloadUrl_{i}"),
+                        _code_column(df, f"distribution_license_label_{i}", license_map, license_index),
+                    )
+                )
+                for i in DISTRIBUTION_INDICES
+            )
+        )
+    )
+
+    rows = zip(
+        df.index,
+        titles,
+        descriptions,
+        access_rights,
+        issued,
+        modified,
+        identificators,
+        keywords,
+        contact_fns,
+        contact_emails,
+        contact_phones,
+        themes,
+        spatials,
+        temporal_starts,
+        temporal_ends,
+        distributions,
+    )
+
+    for (
+        idx,
+        title,
+        description,
+        access_rights_code,
+        issued_iso,
+        modified_iso,
+        identificator,
+        row_keywords,
+        contact_fn,
+        contact_email,
+        contact_phone,
+        theme_code,
+        spatial,
+        temp_start,
+        temp_end,
+        row_distributions,
+    ) in rows:
+        error = _first_error(issued_iso, modified_iso, temp_start, temp_end)
+        if error is not None:
+            yield idx, None, error
+            continue
+
+        data = {
+            "title": {"de": title},
+            "description": {"de": description},
+            "publisher": {"identifier": publisher_identifier or ""},
+            "accessRights": {"code": access_rights_code or "PUBLIC"},
+            "issued": issued_iso,
+            "modified": modified_iso,
+        }
+
+        if identificator:
+            data["identifiers"] = [identificator]
+
+        row_keywords = [{"label": {"de": keyword}} for keyword in row_keywords if keyword is not None]
+        if row_keywords:
+            data["keywords"] = row_keywords
+
+        if contact_fn is not None or contact_email is not None:
+            contact_point = {"kind": "Organization"}
+            if publisher_identifier:
+                contact_point["fn"] = {"de": publisher_identifier}
+            if contact_fn is not None:
+                contact_point["hasAddress"] = {"de": contact_fn}
+            if contact_email is not None:
+                contact_point["hasEmail"] = contact_email
+            if contact_phone is not None:
+                contact_point["hasTelephone"] = contact_phone
+            data["contactPoints"] = [contact_point]
+
+        if theme_code:
+            data["themes"] = [{"code": theme_code}]
+
+        if spatial is not None:
+            data["spatial"] = [spatial]
+
+        if temp_start is not None or temp_end is not None:
+            coverage = {}
+            if temp_start is not None:
+                coverage["start"] = temp_start
+            if temp_end is not None:
+                coverage["end"] = temp_end
+            data["temporalCoverage"] = [coverage]
+
+        row_distributions = [
+            _build_distribution(access_url, download_url, license_code)
+            for access_url, download_url, license_code in row_distributions
+            if access_url is not None or download_url is not None
+        ]
+        if row_distributions:
+            data["distributions"] = row_distributions
+
+        yield idx, {"data": data}, None
+
+
+def _build_distribution(access_url, download_url, license_code):
+    url = access_url if access_url is not None else download_url
+    distribution = {"accessUrl": {"uri": url}, "downloadUrl": {"uri": url}}
+    if license_code:
+        distribution["license"] = {"code": license_code}
+    distribution["title"] = {"de": "Datenexport"}
+    distribution["description"] = {"de": "Export der Daten"}
+    return distribution
+
+
+class ImportAbortedError(Exception):
+    """The import could not start: missing credentials or an unreadable workbook"""
+
+
+def abort_message(last_row, error):
+    """Error of an import whose inventory could not be read beyond ``last_row``"""
+    return f"Import aborted: the inventory could not be read after row {last_row} ({error}); later rows were not imported"
+
+
+def _readable(chunks, stopped, indexes=lambda df: df.index):
+    """Pass chunks through until reading fails; the error and the last row read are put into ``stopped``.
+
+    ``indexes`` gives the row indexes of a chunk; by default chunks are DataFrames.
+    """
+    try:
+        for chunk in chunks:
+            index = indexes(chunk)
+            if len(index):
+                stopped["last_row"] = int(index[-1]) + 1
+            yield chunk
+    except Exception as e:
+        stopped["error"] = e
+
+
+class SubmissionError(Exception):
+    """Non-success answer from the dataset endpoint"""
+
+    def __init__(self, status_code, text, retry_after=None):
+        super().__init__(f"API submission failed: {status_code} - {text}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
 def submit_to_api(payload, api_token):
     headers = {"Authorization": api_token, "Content-Type": "application/json"}
 
-    response = requests.post(f"{API_BASE_URL}/datasets", headers=headers, json=payload, timeout=20)
+    response = http_client.post(
+        f"{API_BASE_URL}/datasets", endpoint="i14y.datasets.create", headers=headers, json=payload, timeout=SUBMIT_TIMEOUT
+    )
 
     if response.status_code not in (200, 201):
-        raise Exception(f"API submission failed: {response.status_code} - {response.text}")
+        raise SubmissionError(
+            response.status_code, response.text, parse_retry_after(response.headers.get("Retry-After"))
+        )
 
     return response.text.strip('"')
 
 
-def main(template_path, api_token=None, organization_id=None, publisher_identifier=None):
-    # Remove the default template path fallback since we always provide a path
+def update_on_api(dataset_id, payload, api_token):
+    headers = {"Authorization": api_token, "Content-Type": "application/json"}
+
+    response = http_client.put(
+        f"{API_BASE_URL}/datasets/{dataset_id}",
+        endpoint="i14y.datasets.update",
+        headers=headers,
+        json=payload,
+        timeout=SUBMIT_TIMEOUT,
+    )
+
+    if response.status_code not in (200, 204):
+        raise SubmissionError(
+            response.status_code, response.text, parse_retry_after(response.headers.get("Retry-After"))
+        )
+
+    return dataset_id
+
+
+# Chunks buffered per agency in import_by_publisher; the reader waits while an agency falls behind
+PARTITION_QUEUE_SIZE = 2
+_PARTITION_END = object()
+
+# A payload that replaces an existing dataset instead of creating a new one
+DatasetUpdate = namedtuple("DatasetUpdate", ["dataset_id", "payload"])
+
+
+def _try_submit(payload, api_token):
+    limiter = get_submission_limiter()
+    # Includes the wait for a limiter slot; the request alone is in i14y_http_request_seconds
+    with metrics.timed(STAGE_SECONDS, stage="submit"), limiter.slot():
+        try:
+            if isinstance(payload, DatasetUpdate):
+                dataset_id = update_on_api(payload.dataset_id, payload.payload, api_token)
+            else:
+                dataset_id = submit_to_api(payload, api_token)
+        except Exception as e:
+            if getattr(e, "status_code", None) in THROTTLE_STATUS_CODES:
+                limiter.record_throttle(e.status_code, e.retry_after)
+            return None, e
+
+    limiter.record_success()
+    return dataset_id, None
+
+
+def is_retryable(error):
+    """Failures where the dataset was certainly not created, so sending it again cannot duplicate it"""
+    if isinstance(error, SubmissionError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, ConnectTimeout)
+
+
+def retry_delay(attempt, error):
+    """Jittered exponential backoff, never shorter than the server's Retry-After"""
+    backoff = min(SUBMIT_RETRY_MAX_DELAY, SUBMIT_RETRY_BACKOFF * 2**attempt)
+    return max(getattr(error, "retry_after", None) or 0.0, random.uniform(backoff / 2, backoff))
+
+
+def submit_batch(payloads, api_token):
+    """Send a batch one after another over the pooled keep-alive connection.
+
+    Only items that failed with a retryable error are queued again, up to SUBMIT_RETRIES times,
+    after a jittered backoff. Returns ``(dataset_id, error)`` per payload in input order.
+    """
+    outcomes = [None] * len(payloads)
+    todo = range(len(payloads))
+
+    for attempt in range(SUBMIT_RETRIES + 1):
+        failed = []
+        for i in todo:
+            outcomes[i] = _try_submit(payloads[i], api_token)
+            if outcomes[i][1] is not None and is_retryable(outcomes[i][1]):
+                failed.append(i)
+        if not failed or attempt == SUBMIT_RETRIES:
+            break
+
+        time.sleep(max(retry_delay(attempt, outcomes[i][1]) for i in failed))
+        todo = failed
+
+    return outcomes
+
+
+def _batched(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _resolve_batch(batch, outcomes):
+    outcomes = iter(outcomes)
+    for key, payload in batch:
+        yield (key, *next(outcomes)) if payload is not None else (key, None, None)
+
+
+def submit_datasets(items, api_token, max_workers=None, batch_size=None):
+    """Submit ``(key, payload)`` items over a bounded thread pool; yields ``(key, dataset_id, error)`` in input order.
+
+    Items are grouped into batches of ``batch_size`` (SUBMIT_BATCH_SIZE by default); each batch is one
+    task on the pool. The stream is consumed lazily with only a small window of batches in flight, so
+    the first rows are submitted while later ones are still being read. Items without a payload are
+    passed through unsent.
+    """
+    max_workers = max_workers or SUBMIT_CONCURRENCY
+    batch_size = batch_size or SUBMIT_BATCH_SIZE
+
+    def payloads_of(batch):
+        return [payload for _, payload in batch if payload is not None]
+
+    if max_workers <= 1:
+        for batch in _batched(items, batch_size):
+            yield from _resolve_batch(batch, submit_batch(payloads_of(batch), api_token))
+        return
+
+    window = max(max_workers * 2, 4)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="i14y-submit") as executor:
+        for batch in _batched(items, batch_size):
+            payloads = payloads_of(batch)
+            future = executor.submit(submit_batch, payloads, api_token) if payloads else None
+            pending.append((batch, future))
+
+            while pending and (len(pending) > window or pending[0][1] is None or pending[0][1].done()):
+                batch, future = pending.popleft()
+                yield from _resolve_batch(batch, future.result() if future is not None else [])
+
+        while pending:
+            batch, future = pending.popleft()
+            yield from _resolve_batch(batch, future.result() if future is not None else [])
+
+
+def _built_chunks(chunks, publisher_identifier=None, emit=None):
+    """Validate and build one chunk of rows at a time; yields ``(started_at, build_ms, rows)``.
+
+    ``rows`` holds ``(idx, title, identificator, payload, build_error, warnings)`` per titled or
+    unreadable row, where ``warnings`` lists the labels that were only resolved as near matches.
+    """
+    for df in metrics.timed_iter(chunks, STAGE_SECONDS, stage="excel_load"):
+        with metrics.timed(STAGE_SECONDS, stage="row_filter"):
+            df = _titled(df)
+        titles = _column(df, "title")
+        identificators = [
+            identificator if identificator is not None else f"Dataset_{idx}"
+            for idx, identificator in zip(df.index, _column(df, "identificator"))
+        ]
+
+        started_at = time.perf_counter()
+        if emit:
+            for idx, identificator in zip(df.index, identificators):
+                emit({"type": "row_started", "row": idx + 1, "identifier": identificator})
+
+        # Rows that would only fail at the API are rejected here, before any request is made
+        with metrics.timed(STAGE_SECONDS, stage="validation"):
+            invalid = validate_rows(df)
+            warnings = label_warnings(df)
+        with metrics.timed(STAGE_SECONDS, stage="payload_build"):
+            if invalid:
+                logger.info("%s of %s rows rejected by validation", len(invalid), len(df))
+                clean = {built[0]: built for built in build_payloads(df.drop(index=list(invalid)), publisher_identifier)}
+                built = [clean.get(idx) or (idx, None, ValidationError(invalid[idx])) for idx in df.index]
+            else:
+                built = list(build_payloads(df, publisher_identifier))
+        build_ms = round((time.perf_counter() - started_at) * 1000 / max(len(built), 1), 3)
+
+        rows = [
+            (idx, title_value, identificator, payload, build_error, warnings.get(idx, []))
+            for (idx, payload, build_error), title_value, identificator in zip(built, titles, identificators)
+        ]
+        yield started_at, build_ms, rows
+
+
+def _prepared(built_chunks, emit=None, ledger=None, remote=None):
+    """Yield ``((idx, title, identificator, build_error, started_at, content_hash, previous_id, changed, warnings), payload)`` per row.
+
+    With a ``ledger``, payloads are hashed and looked up once per chunk; rows whose content was
+    already imported carry the earlier ``previous_id`` and no payload, so they are not submitted
+    again. With ``remote`` (see core.remote_datasets), rows whose identifier already exists are
+    compared with that dataset: unchanged ones are skipped the same way, changed ones become a
+    DatasetUpdate and ``changed`` lists the differing fields. The existing dataset takes precedence
+    over the ledger, so edits made on I14Y since the last import are reconciled; the ledger only
+    decides for rows without one.
+    """
+    for started_at, build_ms, rows in built_chunks:
+        hashes = [None] * len(rows)
+        known = {}
+        if ledger is not None:
+            hashes = [payload_hash(payload) if payload is not None else None for _, _, _, payload, _, _ in rows]
+            known = ledger.known(hashes)
+
+        for (idx, title_value, identificator, payload, build_error, warnings), content_hash in zip(rows, hashes):
+            previous_id = None
+            changed = None
+            existing = None
+            if remote is not None and payload is not None:
+                identifier = (payload["data"].get("identifiers") or [None])[0]
+                # Numeric cells arrive as int, while the API lists identifiers as strings
+                existing = remote.get(str(identifier)) if identifier is not None else None
+            if existing is not None:
+                with metrics.timed(STAGE_SECONDS, stage="remote_diff"):
+                    changed = changed_fields(payload["data"], existing["data"])
+                if changed:
+                    payload = DatasetUpdate(existing["id"], payload)
+                else:
+                    previous_id = existing["id"]
+            else:
+                previous_id = known.get(content_hash)
+
+            if emit and build_error is None:
+                emit({"type": "payload_built", "row": idx + 1, "identifier": identificator, "build_ms": build_ms})
+            key = (idx, title_value, identificator, build_error, started_at, content_hash, previous_id, changed, warnings)
+            yield key, (payload if previous_id is None else None)
+
+
+def _open_inventory(template_path):
+    try:
+        with metrics.timed(STAGE_SECONDS, stage="excel_open"):
+            return iter_inventory_chunks(template_path)
+    except Exception as e:
+        raise ImportAbortedError(f"Error loading inventory file: {e}") from e
+
+
+def _source_name(source):
+    return source if isinstance(source, str) else "upload buffer"
+
+
+def _route(values, lookup, default):
+    """Group row positions by the agency their publisher value names: ``{(target, unknown): [position, ...]}``.
+
+    ``target`` is the ``(organization_id, publisher)`` of an agency in ``lookup``; empty values go
+    to ``default``. Values naming no agency of the token get None and keep the value as ``unknown``.
+    """
+    groups = {}
+    for position, value in enumerate(values):
+        if value is None or not str(value).strip():
+            key = (default, None)
+        else:
+            target = match_agency(lookup, value)
+            key = (target, None if target is not None else value)
+        groups.setdefault(key, []).append(position)
+    return groups
+
+
+def _unknown_agency(value):
+    return f"publisher '{value}' is not one of the agencies in the token"
+
+
+def iter_payload_records(template_path, agencies, on_event=None):
+    """Build the payload of every row without contacting the dataset API; yields one export record per row.
+
+    Rows are assigned to ``agencies`` by their PUBLISHER_COLUMN like in import_by_publisher, so
+    each payload names the publisher the import would send it for. A record is ``{"row",
+    "identifier", "title", "publisher", "payload"}``, or carries ``error`` instead of ``payload``
+    when the row failed validation or names an agency that is not in ``agencies``, plus
+    ``warnings`` for labels taken as near matches. The inventory is opened before this function
+    returns, so unreadable files raise ImportAbortedError immediately.
+    """
+    if not agencies:
+        raise ImportAbortedError("No agencies provided")
+
+    default = split_agency(agencies[0])
+    lookup = agency_lookup(agencies)
+    chunks = _open_inventory(template_path)
+
+    def records():
+        for df in chunks:
+            df = _titled(df)
+            chunk = []
+            for (target, unknown), positions in _route(_column(df, PUBLISHER_COLUMN), lookup, default).items():
+                part = df.iloc[positions]
+                if target is None:
+                    for idx, title_value, identificator in zip(part.index, _column(part, "title"), _column(part, "identificator")):
+                        chunk.append(
+                            {
+                                "row": idx + 1,
+                                "identifier": identificator if identificator is not None else f"Dataset_{idx}",
+                                "title": title_value,
+                                "publisher": unknown,
+                                "error": _unknown_agency(unknown),
+                            }
+                        )
+                    continue
+
+                for _, _, rows in _built_chunks([part], target[1], on_event):
+                    for idx, title_value, identificator, payload, build_error, warnings in rows:
+                        record = {"row": idx + 1, "identifier": identificator, "title": title_value, "publisher": target[1]}
+                        if build_error is None:
+                            record["payload"] = payload
+                        else:
+                            record["error"] = str(build_error)
+                        if warnings:
+                            record["warnings"] = warnings
+                        chunk.append(record)
+            yield from sorted(chunk, key=lambda record: record["row"])
+
+    return records()
+
+
+def export_payloads(template_path, output, agencies, on_event=None):
+    """Write the export records of iter_payload_records to the text stream ``output`` as NDJSON.
+
+    The file can be reviewed and later submitted with replay_payloads. Returns the counts of
+    built and rejected rows.
+    """
+    payload_count = 0
+    error_count = 0
+    logger.info("Exporting payloads from %s", _source_name(template_path))
+    for record in iter_payload_records(template_path, agencies, on_event):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if "payload" in record:
+            payload_count += 1
+        else:
+            error_count += 1
+
+    logger.info("Export finished: %s payloads, %s rows rejected", payload_count, error_count)
+    return {"payload_count": payload_count, "error_count": error_count, "total_count": payload_count + error_count}
+
+
+def _replay_row(line_number, line):
+    """``((idx, title, identificator, payload, build_error, warnings), publisher)`` of one export line, or None for a blank line.
+
+    ``publisher`` is the one the payload names, else the one of the export record; None when the
+    line does not say.
+    """
+    line = line.strip()
+    if not line:
+        return None
+    idx = line_number - 1
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return (idx, None, f"Dataset_{idx}", None, ValueError(f"Line {line_number}: invalid JSON ({e})"), []), None
+    if not isinstance(record, dict):
+        return (idx, None, f"Dataset_{idx}", None, ValueError(f"Line {line_number}: expected a JSON object"), []), None
+
+    # The row number of the original inventory, so reports of both stages line up
+    row = record.get("row")
+    idx = row - 1 if isinstance(row, int) and row > 0 else idx
+    identificator = record.get("identifier") or f"Dataset_{idx}"
+    payload = record.get("payload")
+    warnings = record.get("warnings") if isinstance(record.get("warnings"), list) else []
+    publisher = record.get("publisher")
+    if "error" in record and payload is None:
+        return (idx, record.get("title"), identificator, None, ValueError(record["error"]), warnings), publisher
+    if not isinstance(payload, dict) or not isinstance(payload.get("data"), dict):
+        error = ValueError(f"Line {line_number}: no payload with a data object")
+        return (idx, record.get("title"), identificator, None, error, warnings), publisher
+    title = record.get("title") or (payload["data"].get("title") or {}).get("de")
+    named = payload["data"].get("publisher")
+    if isinstance(named, dict) and named.get("identifier"):
+        publisher = named["identifier"]
+    return (idx, title, identificator, payload, None, warnings), publisher
+
+
+def _replayed_chunks(lines, rows=None, emit=None, chunk_size=None):
+    """Export lines as ``(started_at, build_ms, rows, publishers)`` chunks, see _replay_row"""
+    chunk_size = chunk_size or READ_CHUNK_SIZE
+    # Small first chunk as in the inventory reader, so submission starts right away
+    limit = min(chunk_size, FIRST_CHUNK_SIZE)
+    batch = []
+    publishers = []
+    started_at = time.perf_counter()
+    for line_number, line in enumerate(lines, start=1):
+        replayed = _replay_row(line_number, line)
+        if replayed is None or (rows is not None and replayed[0][0] + 1 not in rows):
+            continue
+        row, publisher = replayed
+        if emit:
+            emit({"type": "row_started", "row": row[0] + 1, "identifier": row[2]})
+        batch.append(row)
+        publishers.append(publisher)
+        if len(batch) >= limit:
+            yield started_at, round((time.perf_counter() - started_at) * 1000 / len(batch), 3), batch, publishers
+            batch = []
+            publishers = []
+            limit = chunk_size
+            started_at = time.perf_counter()
+    if batch:
+        yield started_at, round((time.perf_counter() - started_at) * 1000 / len(batch), 3), batch, publishers
+
+
+def _load_remote(api_token, publisher_identifier):
+    # Without the listing every row would be created again, so the import does not start
+    try:
+        with metrics.timed(STAGE_SECONDS, stage="remote_fetch"):
+            remote = get_remote_datasets(api_token, publisher_identifier)
+    except Exception as e:
+        raise ImportAbortedError(f"Error loading existing datasets: {e}") from e
+    logger.info("Update mode: %s existing datasets of %s", len(remote), publisher_identifier)
+    return remote
+
+
+def _check_credentials(api_token, publisher_identifier):
     if not api_token:
-        print("Error: No API token provided")
-        sys.exit(1)
+        raise ImportAbortedError("No API token provided")
 
     if not publisher_identifier:
-        print("Error: No publisher identifier provided")
-        sys.exit(1)
+        raise ImportAbortedError("No publisher identifier provided")
+
+
+def main(
+    template_path,
+    api_token=None,
+    organization_id=None,
+    publisher_identifier=None,
+    max_workers=None,
+    on_event=None,
+    batch_size=None,
+    skip_unchanged=True,
+    update_existing=False,
+):
+    """Import every row of an inventory workbook, given as a path or a binary file object.
+
+    ``on_event`` receives a dict per progress event: ``row_started``, ``payload_built``,
+    ``submitted``, ``skipped`` and ``failed`` per row (with timings in milliseconds), then
+    ``import_finished``. With ``skip_unchanged``, rows whose payload was already imported for the
+    organization (see core.ledger) are skipped instead of creating a duplicate. With
+    ``update_existing``, rows whose identificator matches an existing dataset of the publisher
+    update that dataset, and only when a field changed; ``submitted`` events then carry
+    ``action`` "updated" and the changed fields. Theme and access rights labels that only match a
+    known label approximately are imported with its code and reported as ``warnings`` on the row
+    events and in the result.
+
+    Raises ImportAbortedError when the import cannot start at all. When the inventory stops being
+    readable after rows were already submitted, the import ends early: the result reports those
+    rows as usual and adds ``aborted`` with the last row read (``after_row``) and the ``error``,
+    which is also the last entry of ``errors``.
+    """
+    _check_credentials(api_token, publisher_identifier)
+    remote = _load_remote(api_token, publisher_identifier) if update_existing else None
+    chunks = _open_inventory(template_path)
+
+    logger.info("Starting dataset import from %s", _source_name(template_path))
+    return _run_import(
+        _built_chunks(chunks, publisher_identifier, on_event),
+        api_token,
+        organization_id,
+        publisher_identifier,
+        max_workers,
+        on_event,
+        batch_size,
+        skip_unchanged,
+        remote,
+    )
+
 
+def replay_payloads(
+    source,
+    api_token=None,
+    agencies=(),
+    max_workers=None,
+    on_event=None,
+    batch_size=None,
+    skip_unchanged=True,
+    update_existing=False,
+    rows=None,
+):
+    """Submit the payloads of an export_payloads file, given as a path or a binary file object.
+
+    Works like import_by_publisher without reading an inventory: each payload is sent as it is in
+    the file, for the agency of ``agencies`` its publisher names, whose organization keys the
+    ledger and whose existing datasets update mode compares against. Payloads naming an agency
+    that is not in ``agencies`` fail. Events and the result refer to the original inventory rows.
+    With ``rows`` (a set of row numbers, e.g. the failed rows of an earlier report), only those
+    lines are submitted. Rows the export already rejected are reported as failed again.
+    """
+    if not agencies:
+        raise ImportAbortedError("No agencies provided")
+
+    default = split_agency(agencies[0])
+    _check_credentials(api_token, default[1])
     try:
-        df = pd.read_excel(template_path, header=0)
-        df = df.dropna(subset=["title", "description"], how="all")
-
-        for col in ["title", "description", "identificator"]:
-            if col in df.columns:
-                df = df[df[col] != col]
-
-        actual_rows = len(df)
-        print(f"Successfully loaded {actual_rows} valid entries from {template_path}")
-
-        if actual_rows == 0:
-            print("Warning: No valid data rows found in the Excel file")
-            return {
-                "success_count": 0,
-                "error_count": 0,
-                "total_count": 0,
-                "message": "No valid data rows found in the Excel file",
-            }
+        stream = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+        lines = io.TextIOWrapper(stream, encoding="utf-8-sig")
     except Exception as e:
-        print(f"Error loading Excel file: {e}")
-        sys.exit(1)
+        raise ImportAbortedError(f"Error loading payload file: {e}") from e
+
+    emit = on_event or (lambda event: None)
+    lookup = agency_lookup(agencies)
+    stopped = {"last_row": 0, "error": None}
+
+    chunks = _replayed_chunks(lines, rows, emit)
+    try:
+        first = next(chunks, None)
+    except Exception as e:
+        lines.close()
+        raise ImportAbortedError(f"Error loading payload file: {e}") from e
+    chunks = itertools.chain([first] if first is not None else [], chunks)
+
+    def parts():
+        readable = _readable(chunks, stopped, lambda chunk: [row[0] for row in chunk[2]])
+        for started_at, build_ms, batch, publishers in readable:
+            for (target, unknown), positions in _route(publishers, lookup, default).items():
+                yield target, unknown, (started_at, build_ms, [batch[position] for position in positions])
+
+    def reject(part, message):
+        return _reject_replayed(part[2], message, emit)
+
+    logger.info("Replaying payloads from %s", _source_name(source))
+    emit({"type": "import_started"})
+    try:
+        return _import_partitioned(
+            parts(), api_token, max_workers, emit, batch_size, skip_unchanged, update_existing, _replayed, reject, stopped
+        )
+    finally:
+        lines.close()
+
+
+def _replayed(chunks, publisher, emit):
+    # Replayed rows are already built; the partition only submits them
+    return chunks
+
+
+def _reject_rows(df, message, emit):
+    """Report inventory rows that cannot be imported for any agency as failed; returns the error strings"""
+    errors = []
+    identificators = _column(df, "identificator")
+    for idx, identificator in zip(df.index, identificators):
+        identificator = identificator if identificator is not None else f"Dataset_{idx}"
+        emit({"type": "row_started", "row": idx + 1, "identifier": identificator})
+        emit({"type": "failed", "row": idx + 1, "identifier": identificator, "error": message, "elapsed_ms": 0.0})
+        metrics.inc("i14y_import_rows_total", outcome="failed")
+        errors.append(message)
+    return errors
+
+
+def _reject_replayed(rows, message, emit):
+    """Report replayed rows that cannot be imported for any agency as failed; their start was already reported"""
+    errors = []
+    for idx, _, identificator, _, _, _ in rows:
+        emit({"type": "failed", "row": idx + 1, "identifier": identificator, "error": message, "elapsed_ms": 0.0})
+        metrics.inc("i14y_import_rows_total", outcome="failed")
+        errors.append(message)
+    return errors
+
+
+def _run_partition(partition, api_token, max_workers, emit, batch_size, skip_unchanged, remote, build):
+    publisher = partition["publisher"]
+
+    def queued_chunks():
+        while True:
+            part = partition["queue"].get()
+            if part is _PARTITION_END:
+                partition["drained"] = True
+                return
+            yield part
+
+    def partition_emit(event):
+        # The caller reports one start and one finish for all partitions
+        if event["type"] not in ("import_started", "import_finished"):
+            emit(dict(event, publisher=publisher))
+
+    try:
+        partition["result"] = _run_import(
+            build(queued_chunks(), publisher, partition_emit),
+            api_token,
+            partition["organization_id"],
+            publisher,
+            max_workers,
+            partition_emit,
+            batch_size,
+            skip_unchanged,
+            remote,
+        )
+    except Exception as e:
+        logger.error("Import for %s failed: %s", publisher, e, exc_info=True)
+        partition["error"] = e
+        # The reader must never block on a partition that stopped consuming
+        if not partition.get("drained"):
+            for _ in queued_chunks():
+                pass
+
+
+def _start_partition(target, api_token, max_workers, emit, batch_size, skip_unchanged, update_existing, build):
+    organization_id, publisher = target
+    partition = {
+        "organization_id": organization_id,
+        "publisher": publisher,
+        "queue": queue.Queue(maxsize=PARTITION_QUEUE_SIZE),
+        "thread": None,
+        "result": None,
+        "error": None,
+    }
+    try:
+        remote = _load_remote(api_token, publisher) if update_existing else None
+    except ImportAbortedError as e:
+        # Rows of this agency are rejected; the other agencies are still imported
+        partition["error"] = e
+        return partition
+
+    logger.info("Importing rows for %s (%s)", publisher, organization_id)
+    partition["thread"] = threading.Thread(
+        target=_run_partition,
+        args=(partition, api_token, max_workers, emit, batch_size, skip_unchanged, remote, build),
+        name=f"i14y-partition-{organization_id}",
+        daemon=True,
+    )
+    partition["thread"].start()
+    return partition
+
+
+def _import_partitioned(parts, api_token, max_workers, emit, batch_size, skip_unchanged, update_existing, build, reject, stopped):
+    """Hand ``parts`` to one partition thread per agency and merge their results.
+
+    ``parts`` yields ``(target, unknown, part)`` as grouped by _route; ``build(parts, publisher,
+    emit)`` turns an agency's parts into built chunks for _run_import, and ``reject(part,
+    message)`` reports the rows of a part that cannot be imported as failed.
+    """
+    partitions = {}
+    rejected = []
+    try:
+        # A read error ends the routing; the partitions still submit and report what they received
+        for target, unknown, part in parts:
+            if target is None:
+                rejected.extend(reject(part, _unknown_agency(unknown)))
+                continue
+            if target not in partitions:
+                partitions[target] = _start_partition(
+                    target, api_token, max_workers, emit, batch_size, skip_unchanged, update_existing, build
+                )
+            partition = partitions[target]
+            if partition["thread"] is None:
+                rejected.extend(reject(part, f"{partition['publisher']}: {partition['error']}"))
+            else:
+                partition["queue"].put(part)
+    finally:
+        for partition in partitions.values():
+            if partition["thread"] is not None:
+                partition["queue"].put(_PARTITION_END)
+        for partition in partitions.values():
+            if partition["thread"] is not None:
+                partition["thread"].join()
+
+    return _merge_partitions(list(partitions.values()), rejected, emit, stopped)
+
+
+def import_by_publisher(
+    template_path,
+    api_token=None,
+    agencies=(),
+    max_workers=None,
+    on_event=None,
+    batch_size=None,
+    skip_unchanged=True,
+    update_existing=False,
+):
+    """Import an inventory whose rows may belong to different agencies of the token.
+
+    Each row goes to the agency named in its PUBLISHER_COLUMN (organization id or publisher name,
+    see core.agencies); empty cells go to the first agency and rows naming an agency that is not
+    in ``agencies`` fail. Every agency's rows are built and submitted on their own thread with
+    their own pool of ``max_workers``, so one mixed workbook is imported in parallel; the shared
+    submission limiter still bounds the total request rate. Without the column this is main for
+    the first agency. The result has main's keys summed over all agencies plus ``partitions``
+    with the counts per agency; row events carry the ``publisher`` they were imported for.
+    """
+    if not agencies:
+        raise ImportAbortedError("No agencies provided")
+
+    default = split_agency(agencies[0])
+    _check_credentials(api_token, default[1])
+    chunks = _open_inventory(template_path)
+
+    try:
+        first = next(chunks, None)
+    except Exception as e:
+        raise ImportAbortedError(f"Error loading inventory file: {e}") from e
+    chunks = itertools.chain([first] if first is not None else [], chunks)
+    if first is None or PUBLISHER_COLUMN not in first.columns:
+        remote = _load_remote(api_token, default[1]) if update_existing else None
+        logger.info("Starting dataset import from %s", _source_name(template_path))
+        return _run_import(
+            _built_chunks(chunks, default[1], on_event),
+            api_token,
+            default[0],
+            default[1],
+            max_workers,
+            on_event,
+            batch_size,
+            skip_unchanged,
+            remote,
+        )
+
+    emit = on_event or (lambda event: None)
+    lookup = agency_lookup(agencies)
+    stopped = {"last_row": 0, "error": None}
+
+    def parts():
+        for df in _readable(chunks, stopped):
+            df = _titled(df)
+            for (target, unknown), positions in _route(_column(df, PUBLISHER_COLUMN), lookup, default).items():
+                yield target, unknown, df.iloc[positions]
+
+    def reject(part, message):
+        return _reject_rows(part, message, emit)
+
+    logger.info("Starting dataset import from %s for %s agencies", _source_name(template_path), len(agencies))
+    emit({"type": "import_started"})
+    return _import_partitioned(
+        parts(), api_token, max_workers, emit, batch_size, skip_unchanged, update_existing, _built_chunks, reject, stopped
+    )
+
+
+def _merge_partitions(partitions, rejected, emit, stopped):
+    counts = ("success_count", "updated_count", "error_count", "skipped_count", "total_count")
+    merged = {
+        "successful_datasets": [],
+        "skipped_datasets": [],
+        "errors": list(rejected),
+        "warnings": [],
+        "partitions": [],
+        **dict.fromkeys(counts, 0),
+    }
+    merged["error_count"] = merged["total_count"] = len(rejected)
+
+    for partition in partitions:
+        result = partition["result"] or {}
+        section = {"organization_id": partition["organization_id"], "publisher": partition["publisher"]}
+        section.update((key, result.get(key, 0)) for key in counts)
+        if partition["error"] is not None:
+            section["error"] = str(partition["error"])
+            merged["errors"].append(f"{partition['publisher']}: {partition['error']}")
+        merged["partitions"].append(section)
+
+        for key in counts:
+            merged[key] += section[key]
+        merged["successful_datasets"].extend(
+            dict(dataset, publisher=partition["publisher"]) for dataset in result.get("successful_datasets", [])
+        )
+        merged["skipped_datasets"].extend(result.get("skipped_datasets", []))
+        merged["errors"].extend(result.get("errors", []))
+        merged["warnings"].extend(result.get("warnings", []))
+
+    aborted = [partition["result"]["aborted"] for partition in partitions if "aborted" in (partition["result"] or {})]
+    if stopped["error"] is not None:
+        aborted.append({"after_row": stopped["last_row"], "error": abort_message(stopped["last_row"], stopped["error"])})
+        logger.error(aborted[-1]["error"])
+        merged["errors"].append(aborted[-1]["error"])
+    if aborted:
+        merged["aborted"] = min(aborted, key=lambda abort: abort["after_row"])
+
+    emit({"type": "import_finished", **{key: merged[key] for key in counts}})
+    logger.info(
+        "Import finished for %s agencies: %s processed, %s successful, %s failed, %s unchanged",
+        len(partitions),
+        merged["total_count"],
+        merged["success_count"],
+        merged["error_count"],
+        merged["skipped_count"],
+    )
+    if merged["total_count"] == 0 and not merged["errors"]:
+        merged["message"] = "No valid data rows found in the inventory file"
+    return merged
+
+
+def _run_import(
+    built_chunks,
+    api_token,
+    organization_id,
+    publisher_identifier,
+    max_workers,
+    on_event,
+    batch_size,
+    skip_unchanged,
+    remote,
+):
+    """Submit built rows and collect the outcome; runs main and every partition of import_by_publisher and replay_payloads"""
+    emit = on_event or (lambda event: None)
 
     success_count = 0
+    updated_count = 0
     error_count = 0
+    skipped_count = 0
     successful_datasets = []
+    skipped_datasets = []
     errors = []
+    warnings = []
 
-    print("\nStarting dataset import...\n")
+    emit({"type": "import_started"})
 
-    for idx, row in df.iterrows():
-        title_value = safe_get(row, "title")
-        if pd.isna(title_value) or not title_value:
-            continue
-
-        identificator = safe_get(row, "identificator", f"Dataset_{idx}")
-        print(f"Processing dataset {idx + 1}: {identificator}")
+    # Rows are read, built and submitted as a stream; the total grows while the sheet is parsed
+    read_count = 0
+    last_row = 0
+    read_error = None
 
+    def counted(items):
+        nonlocal read_count, last_row, read_error
         try:
-            payload = create_dataset_payload(row, publisher_identifier)
-            dataset_id = submit_to_api(payload, api_token)
-            success_count += 1
+            for item in items:
+                read_count += 1
+                last_row = item[0][0] + 1
+                yield item
+        except Exception as e:
+            # Ends the stream instead of the import: rows already in flight are still collected
+            read_error = e
 
-            successful_datasets.append({"id": dataset_id, "title": title_value, "identifier": identificator})
-            print(f"✓ Success - Dataset ID: {dataset_id}\n")
+    ledger = open_ledger(organization_id or publisher_identifier) if skip_unchanged else None
+    try:
+        outcomes = submit_datasets(
+            counted(_prepared(built_chunks, on_event, ledger, remote)),
+            api_token,
+            max_workers,
+            batch_size,
+        )
 
-        except Exception as e:
-            error_count += 1
-            print(f"✗ Error: {str(e)}\n")
-            errors.append(str(e))
-            traceback.print_exc()
-            print()
+        for key, dataset_id, error in outcomes:
+            idx, title_value, identificator, build_error, started_at, content_hash, previous_id, changed, row_warnings = key
+            error = build_error or error
+            elapsed_ms = round((time.perf_counter() - started_at) * 1000, 3)
+            # Labels taken as near matches are reported whatever the outcome, so the user can check them
+            notes = {"warnings": row_warnings} if row_warnings else {}
+            for warning in row_warnings:
+                warnings.append(f"Row {idx + 1} ({identificator}): {warning}")
+                logger.debug("Dataset %s (%s): %s", idx + 1, identificator, warning)
+
+            if previous_id is not None:
+                skipped_count += 1
+                metrics.inc("i14y_import_rows_total", outcome="skipped")
+                skipped_datasets.append({"id": previous_id, "title": title_value, "identifier": identificator})
+                logger.debug("Dataset %s (%s) unchanged, already imported as %s", idx + 1, identificator, previous_id)
+                emit({"type": "skipped", "row": idx + 1, "identifier": identificator, "dataset_id": previous_id, **notes})
+                continue
+
+            if error is None:
+                success_count += 1
+                action = "updated" if changed else "created"
+                if changed:
+                    updated_count += 1
+                metrics.inc("i14y_import_rows_total", outcome="updated" if changed else "submitted")
+                if ledger is not None:
+                    ledger.record(content_hash, identificator, dataset_id)
+                successful_datasets.append(
+                    {"id": dataset_id, "title": title_value, "identifier": identificator, "action": action}
+                )
+                logger.debug("Dataset %s (%s) %s: %s", idx + 1, identificator, action, dataset_id)
+                event = {
+                    "type": "submitted",
+                    "action": action,
+                    "row": idx + 1,
+                    "identifier": identificator,
+                    "dataset_id": dataset_id,
+                    "elapsed_ms": elapsed_ms,
+                    "rows_read": read_count,
+                    **notes,
+                }
+                if changed:
+                    event["changed_fields"] = changed
+                emit(event)
+            else:
+                error_count += 1
+                metrics.inc("i14y_import_rows_total", outcome="failed")
+                errors.append(str(error))
+                logger.warning(
+                    "Dataset %s (%s) failed: %s", idx + 1, identificator, error, exc_info=logger.isEnabledFor(logging.DEBUG) and error
+                )
+                emit(
+                    {
+                        "type": "failed",
+                        "row": idx + 1,
+                        "identifier": identificator,
+                        "error": str(error),
+                        "elapsed_ms": elapsed_ms,
+                        "rows_read": read_count,
+                        **notes,
+                    }
+                )
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if success_count:
+            # A cached listing no longer knows the datasets just created or updated
+            forget_remote_datasets(publisher_identifier)
+
+    if read_error is not None and read_count == 0:
+        raise ImportAbortedError(f"Error loading inventory file: {read_error}") from read_error
+
+    emit(
+        {
+            "type": "import_finished",
+            "success_count": success_count,
+            "updated_count": updated_count,
+            "error_count": error_count,
+            "skipped_count": skipped_count,
+            "total_count": success_count + error_count + skipped_count,
+        }
+    )
+
+    aborted = None
+    if read_error is not None:
+        aborted = {"after_row": last_row, "error": abort_message(last_row, read_error)}
+        logger.error(aborted["error"])
+        errors.append(aborted["error"])
+
+    if read_count == 0:
+        logger.warning("No valid data rows found in the inventory file")
+        return {
+            "success_count": 0,
+            "error_count": 0,
+            "skipped_count": 0,
+            "total_count": 0,
+            "message": "No valid data rows found in the inventory file",
+        }
 
-    print("=== Import Summary ===")
-    print(f"Total processed: {success_count + error_count}")
-    print(f"Successful: {success_count}")
-    print(f"Failed: {error_count}")
+    logger.info(
+        "Import finished: %s processed, %s successful, %s failed, %s unchanged",
+        success_count + error_count + skipped_count,
+        success_count,
+        error_count,
+        skipped_count,
+    )
 
-    return {
+    result = {
         "successful_datasets": successful_datasets,
+        "skipped_datasets": skipped_datasets,
         "success_count": success_count,
+        "updated_count": updated_count,
         "error_count": error_count,
-        "total_count": success_count + error_count,
+        "skipped_count": skipped_count,
+        "total_count": success_count + error_count + skipped_count,
         "errors": errors,
+        "warnings": warnings,
     }
+    if aborted is not None:
+        result["aborted"] = aborted
+    return result
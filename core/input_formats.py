@@ -0,0 +1,90 @@
+import codecs
+import csv
+import json
+import os
+
+
+# Inventory formats by file extension
+FORMAT_BY_EXTENSION = {"xlsx": "xlsx", "csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson"}
+
+# XLSX files are ZIP archives; magic bytes are PK (0x50 0x4B 0x03 0x04)
+XLSX_MAGIC = b"PK\x03\x04"
+CSV_DELIMITERS = ",;\t"
+# CSV that is not UTF-8 is read as Windows-1252, which Excel writes on Windows and which covers Latin-1 text
+CSV_FALLBACK_ENCODING = "cp1252"
+# Bytes inspected to tell the formats apart
+SNIFF_SIZE = 8192
+
+
+def _first_line(sample):
+    text = sample.decode("utf-8-sig", errors="replace").lstrip("\r\n")
+    return text.splitlines()[0] if text else ""
+
+
+def sniff_csv_delimiter(line):
+    try:
+        return csv.Sniffer().sniff(line, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+
+def sniff_csv_stream(stream):
+    """Delimiter of a CSV stream, guessed from its header line; the stream position is restored"""
+    position = stream.tell()
+    try:
+        sample = stream.read(SNIFF_SIZE)
+    finally:
+        stream.seek(position)
+    return sniff_csv_delimiter(_first_line(sample))
+
+
+def sniff_csv_encoding(stream):
+    """Encoding of a CSV stream: UTF-8 (BOM optional) if its first bytes decode as such, else the fallback"""
+    position = stream.tell()
+    try:
+        sample = stream.read(SNIFF_SIZE)
+    finally:
+        stream.seek(position)
+    try:
+        # A sample cut off inside a multi-byte character is still UTF-8
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) < SNIFF_SIZE)
+    except UnicodeDecodeError:
+        return CSV_FALLBACK_ENCODING
+    return "utf-8-sig"
+
+
+def sniff_format(stream):
+    """Format of an inventory ("xlsx", "csv" or "ndjson") from its first bytes, or None.
+
+    CSV needs a header row with a title column and NDJSON a JSON object on its first line;
+    the stream position is restored afterwards.
+    """
+    position = stream.tell()
+    try:
+        sample = stream.read(SNIFF_SIZE)
+    finally:
+        stream.seek(position)
+
+    if sample.startswith(XLSX_MAGIC):
+        return "xlsx"
+
+    line = _first_line(sample).strip()
+    if line.startswith("{"):
+        if len(sample) == SNIFF_SIZE and b"\n" not in sample.lstrip(b"\xef\xbb\xbf\r\n"):
+            # A first record longer than the sample cannot be checked here; the reader reports it
+            return "ndjson"
+        try:
+            return "ndjson" if isinstance(json.loads(line), dict) else None
+        except ValueError:
+            return None
+
+    header = next(csv.reader([line], delimiter=sniff_csv_delimiter(line)), [])
+    if "title" in (cell.strip() for cell in header):
+        return "csv"
+    return None
+
+
+def format_for_filename(filename):
+    """Format expected from a file name's extension, or None for unsupported extensions"""
+    extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    return FORMAT_BY_EXTENSION.get(extension)
@@ -0,0 +1,292 @@
+import csv
+import io
+import itertools
+import json
+import os
+import warnings
+from datetime import datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from config import READ_CHUNK_SIZE
+from core.input_formats import sniff_csv_encoding, sniff_csv_stream, sniff_format
+
+
+# Columns that must exist; rows where both are empty are skipped like pd.read_excel(...).dropna(how="all")
+REQUIRED_COLUMNS = ("title", "description")
+# Columns whose value equals the column name mark a repeated header row
+HEADER_REPEAT_COLUMNS = ("title", "description", "identificator")
+# Text formats carry dates as ISO 8601 strings; xlsx cells already arrive as datetimes
+DATE_COLUMNS = ("issued", "modified", "temporalCoverage_start", "temporalCoverage_end")
+# Column added for NDJSON lines that could not be parsed; the row is kept so it is reported as failed
+READ_ERROR_COLUMN = "_read_error"
+
+# The first chunk is kept small so the first submission does not wait for a full chunk to be parsed
+FIRST_CHUNK_SIZE = 16
+
+# Same strings pandas reads as missing by default, so streamed rows match pd.read_excel
+NA_STRINGS = frozenset(
+    [
+        "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+        "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+    ]
+)
+
+
+def _convert_cell(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return None if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        # pd.read_excel turns whole-number cells into ints as well
+        return int(value)
+    return value
+
+
+def _header(cells):
+    columns = []
+    seen = {}
+    for position, cell in enumerate(cells):
+        name = str(cell) if cell is not None else f"Unnamed: {position}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    while columns and columns[-1].startswith("Unnamed: "):
+        columns.pop()
+    return columns
+
+
+def _keep_row(record, positions):
+    position = positions.get(READ_ERROR_COLUMN)
+    if position is not None and record[position] is not None:
+        return True
+
+    title = record[positions["title"]]
+    description = record[positions["description"]]
+    if title is None and description is None:
+        return False
+
+    for col in HEADER_REPEAT_COLUMNS:
+        position = positions.get(col)
+        if position is not None and record[position] == col:
+            return False
+    return True
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        return value
+
+
+def _parse_dates(df):
+    """Turn ISO 8601 strings in the date columns into datetimes, in place.
+
+    Strings that are not dates are kept, so validation reports them like a text cell in a
+    workbook date column.
+    """
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        text = series[series.map(lambda value: isinstance(value, str))]
+        if text.empty:
+            continue
+        try:
+            with warnings.catch_warnings():
+                # pandas only warns about mixed UTC offsets for now; they cannot share one column dtype
+                warnings.simplefilter("error", FutureWarning)
+                parsed = pd.to_datetime(text, errors="coerce", format="ISO8601")
+        except (ValueError, TypeError, FutureWarning):
+            parsed = text.map(_parse_date)
+            parsed = parsed.where(parsed.map(lambda value: isinstance(value, datetime)))
+
+        ok = parsed.notna()
+        if ok.all() and len(text) == series.notna().sum():
+            df[col] = parsed.reindex(series.index)
+        else:
+            values = series.astype(object)
+            values.loc[parsed.index[ok]] = parsed[ok].astype(object).tolist()
+            df[col] = values
+
+
+def _frame(records, columns, index, parse_dates):
+    width = len(columns)
+    for record in records:
+        if len(record) < width:
+            record.extend([None] * (width - len(record)))
+    df = pd.DataFrame.from_records(records, columns=list(columns), index=index)
+    if parse_dates:
+        _parse_dates(df)
+    return df
+
+
+def _iter_chunks(source, rows, columns, chunk_size, parse_dates=False):
+    """Chunk converted rows into DataFrames; ``columns`` may grow while NDJSON rows are read"""
+    positions = {col: position for position, col in enumerate(columns)}
+
+    try:
+        records = []
+        index = []
+        limit = min(chunk_size, FIRST_CHUNK_SIZE)
+        for row_number, cells in enumerate(rows):
+            width = len(columns)
+            if width != len(positions):
+                positions = {col: position for position, col in enumerate(columns)}
+            record = [_convert_cell(value) for value in cells[:width]]
+            if len(record) < width:
+                record.extend([None] * (width - len(record)))
+
+            if not _keep_row(record, positions):
+                continue
+
+            records.append(record)
+            index.append(row_number)
+            if len(records) >= limit:
+                yield _frame(records, columns, index, parse_dates)
+                records = []
+                index = []
+                limit = chunk_size
+
+        if records:
+            yield _frame(records, columns, index, parse_dates)
+    finally:
+        source.close()
+
+
+def _ndjson_value(value):
+    # Nested values have no column to go to; keep them as text like a workbook cell would
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _ndjson_record(line, line_number):
+    """The object on a line, or a record holding only the reason it could not be read"""
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        return {READ_ERROR_COLUMN: f"Line {line_number}: invalid JSON ({e})"}
+    if not isinstance(record, dict):
+        return {READ_ERROR_COLUMN: f"Line {line_number}: expected a JSON object"}
+    record.pop(READ_ERROR_COLUMN, None)
+    return record
+
+
+def _ndjson_rows(lines, columns):
+    """One cell list per line; keys not seen before are appended to ``columns``.
+
+    A line that is not a JSON object does not stop the file: its row only carries the problem in
+    READ_ERROR_COLUMN, so validation reports it as a failed row.
+    """
+    positions = {col: position for position, col in enumerate(columns)}
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            # Kept as an empty row so the row index stays the line position
+            yield ()
+            continue
+        record = _ndjson_record(line, line_number)
+
+        for key in record:
+            if key not in positions:
+                positions[key] = len(columns)
+                columns.append(key)
+        cells = [None] * len(columns)
+        for key, value in record.items():
+            cells[positions[key]] = _ndjson_value(value)
+        yield cells
+
+
+def _check_columns(columns):
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise KeyError(f"Missing required columns: {', '.join(missing)}")
+
+
+def _open_xlsx(source):
+    workbook = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        # Dimensions stored in the file are not always accurate
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        columns = _header(next(rows, ()))
+        _check_columns(columns)
+    except Exception:
+        workbook.close()
+        raise
+    return workbook, rows, columns
+
+
+def _open_csv(stream):
+    delimiter = sniff_csv_stream(stream)
+    text = io.TextIOWrapper(stream, encoding=sniff_csv_encoding(stream), newline="")
+    try:
+        rows = csv.reader(text, delimiter=delimiter)
+        columns = _header([cell.strip() or None for cell in next(rows, ())])
+        _check_columns(columns)
+    except Exception:
+        text.close()
+        raise
+    return text, rows, columns
+
+
+def _open_ndjson(stream):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    try:
+        columns = []
+        rows = _ndjson_rows(text, columns)
+        # Read up to the first readable record so its keys can be checked like a header row
+        leading = []
+        for cells in rows:
+            leading.append(cells)
+            position = columns.index(READ_ERROR_COLUMN) if READ_ERROR_COLUMN in columns else None
+            if cells and (position is None or cells[position] is None):
+                break
+        _check_columns(columns)
+    except Exception:
+        text.close()
+        raise
+    return text, itertools.chain(leading, rows), columns
+
+
+def iter_inventory_chunks(source, chunk_size=None):
+    """Stream an inventory (xlsx workbook, CSV or NDJSON file) as DataFrame chunks.
+
+    ``source`` is a path or a binary file object; the format is taken from the content. Workbooks
+    are opened in openpyxl's read-only mode, CSV and NDJSON are read line by line, and rows are
+    converted lazily, so memory stays flat regardless of file size. CSV needs a header row, NDJSON
+    has one object per line whose keys are the column names; ISO 8601 strings in the date columns
+    are parsed into datetimes. Empty title/description rows and repeated header rows are dropped
+    on the fly; the index of each chunk is the row position below the header (the line position
+    for NDJSON), matching the index pd.read_excel would assign. The file is opened and the header
+    checked before this function returns, so unreadable files fail immediately.
+    """
+    owned = isinstance(source, (str, os.PathLike))
+    stream = open(source, "rb") if owned else source
+    try:
+        file_format = sniff_format(stream)
+        if file_format == "xlsx":
+            if owned:
+                stream.close()
+            reader, rows, columns = _open_xlsx(source)
+        elif file_format == "csv":
+            reader, rows, columns = _open_csv(stream)
+        elif file_format == "ndjson":
+            reader, rows, columns = _open_ndjson(stream)
+        else:
+            raise ValueError("File is not an xlsx workbook, a CSV file with a header row or NDJSON")
+    except Exception:
+        if owned:
+            stream.close()
+        raise
+
+    return _iter_chunks(reader, rows, columns, chunk_size or READ_CHUNK_SIZE, parse_dates=file_format != "xlsx")
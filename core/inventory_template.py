@@ -0,0 +1,114 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+
+from openpyxl import load_workbook
+from openpyxl.utils import quote_sheetname
+from openpyxl.writer.excel import ExcelWriter
+
+from core import metrics
+from core.codelist_utils import ACCESS_RIGHTS_MAPPING, CODELISTS, display_labels, get_cached_codelist
+
+
+# Workbook the template is generated from: columns, example rows, formatting and dropdowns
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "static", "inventory.xlsx")
+
+# Sheet holding the code/label rows of a dropdown -> codelist name (None: ACCESS_RIGHTS_MAPPING)
+CHOICE_SHEETS = {"ThemesCodes": "themes", "LicenseCodes": "licenses", "AccessRights": None}
+
+DROPDOWN_ERROR_TITLE = "Unbekannter Wert"
+DROPDOWN_ERROR = "Bitte einen Wert aus der Liste wählen; unbekannte Werte können beim Import fehlschlagen."
+
+with open(TEMPLATE_PATH, "rb") as _f:
+    _BASE = _f.read()
+_BASE_DIGEST = hashlib.sha256(_BASE).hexdigest()
+
+# Fixed zip entry timestamp so every worker builds the same bytes for the same ETag
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Last generated template and the codelist dicts it was checked against
+_cache = {"sources": None, "etag": None, "body": None}
+_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    """A lock held by a warm-up thread at fork time would never be released in the child"""
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def template_choices(codelists):
+    """``{sheet: {code: label}}`` for the dropdowns; codelists only available as offline fallback keep the shipped rows"""
+    choices = {}
+    for sheet, name in CHOICE_SHEETS.items():
+        if name is None:
+            choices[sheet] = display_labels(ACCESS_RIGHTS_MAPPING)
+        elif len(codelists[name]) > len(CODELISTS[name][1]):
+            choices[sheet] = display_labels(codelists[name])
+    return choices
+
+
+def build_template(choices):
+    """Workbook bytes with the code sheets rewritten from ``choices`` and the dropdowns pointing at them"""
+    workbook = load_workbook(io.BytesIO(_BASE))
+    sheet = workbook.worksheets[0]
+
+    ranges = {}
+    for name, labels in choices.items():
+        codes = workbook[name]
+        codes.delete_rows(2, codes.max_row)
+        for code, label in labels.items():
+            codes.append([code, label])
+        ranges[name] = f"{quote_sheetname(name)}!$B$2:$B${len(labels) + 1}"
+
+    for validation in sheet.data_validations.dataValidation:
+        name = validation.formula1.split("!")[0].strip("'")
+        if name in ranges:
+            validation.formula1 = ranges[name]
+        if name in CHOICE_SHEETS:
+            # Other values can still be typed, but Excel warns before the upload would fail on them
+            validation.showErrorMessage = True
+            validation.errorStyle = "warning"
+            validation.errorTitle = DROPDOWN_ERROR_TITLE
+            validation.error = DROPDOWN_ERROR
+
+    # ExcelWriter instead of workbook.save(), which stamps the current time into docProps/core.xml
+    written = io.BytesIO()
+    with zipfile.ZipFile(written, "w", zipfile.ZIP_DEFLATED) as archive:
+        ExcelWriter(workbook, archive).save()
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(written) as source, zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for entry in source.infolist():
+            archive.writestr(zipfile.ZipInfo(entry.filename, ZIP_DATE_TIME), source.read(entry), zipfile.ZIP_DEFLATED)
+    metrics.inc("i14y_template_builds_total")
+    return buffer.getvalue()
+
+
+def get_template():
+    """Inventory template bytes and their strong ETag.
+
+    The bytes are cached per process and only rebuilt when the dropdown choices changed: a
+    codelist refresh with the same entries keeps the bytes and the ETag, so browsers revalidating
+    with If-None-Match get a 304.
+    """
+    sources = {name: get_cached_codelist(name) for name in CODELISTS}
+    with _lock:
+        cached = _cache["sources"]
+        if cached is not None and all(sources[name] is cached[name] for name in CODELISTS):
+            return _cache["body"], _cache["etag"]
+
+        choices = template_choices(sources)
+        canonical = json.dumps(choices, sort_keys=True, ensure_ascii=False)
+        etag = hashlib.sha256(f"{_BASE_DIGEST}:{canonical}".encode("utf-8")).hexdigest()
+        if etag != _cache["etag"]:
+            _cache["body"] = build_template(choices)
+            _cache["etag"] = etag
+        _cache["sources"] = sources
+        return _cache["body"], _cache["etag"]
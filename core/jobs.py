@@ -0,0 +1,275 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import IMPORT_WORKERS, JOB_QUEUE_MAX_SIZE, JOB_RESULT_TTL, JOB_STORE_DIR
+from core import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Progress updates are written to disk at most this often per job
+PERSIST_INTERVAL = 0.5  # seconds
+# Failed rows kept per job for the live status view (the full error list is part of the result)
+MAX_FAILURE_EVENTS = 200
+# Jobs of other worker processes are only visible through their snapshots; re-read them this often
+REMOTE_POLL_INTERVAL = 1.0  # seconds
+
+# job_id -> job dict for jobs running in this process; finished jobs expire after JOB_RESULT_TTL
+_jobs = {}
+_jobs_lock = threading.Lock()
+# Notified on every job change; used by status streams waiting for progress
+_jobs_changed = threading.Condition(_jobs_lock)
+_last_persisted = {}
+
+_executor = None
+_executor_pid = None
+
+
+class JobQueueFull(Exception):
+    """JOB_QUEUE_MAX_SIZE imports of this process are already waiting for a worker thread"""
+
+
+def _get_executor():
+    """Per-process worker pool, created lazily so forked gunicorn workers get their own threads"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    with _jobs_lock:
+        if _executor is None or _executor_pid != pid:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="i14y-import")
+            _executor_pid = pid
+        return _executor
+
+
+def _job_path(job_id):
+    return os.path.join(JOB_STORE_DIR, f"{job_id}.json")
+
+
+def _persist(job):
+    """Write a job snapshot so status requests served by other gunicorn workers can read it"""
+    try:
+        os.makedirs(JOB_STORE_DIR, exist_ok=True)
+        tmp_path = f"{_job_path(job['id'])}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, _job_path(job["id"]))
+    except Exception as e:
+        logger.warning("Failed to persist job %s: %s", job["id"], e)
+
+
+def _load(job_id):
+    try:
+        with open(_job_path(job_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _purge_expired():
+    now = time.time()
+    with _jobs_lock:
+        expired = [
+            job_id
+            for job_id, job in _jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > JOB_RESULT_TTL
+        ]
+        for job_id in expired:
+            del _jobs[job_id]
+            _last_persisted.pop(job_id, None)
+
+    for job_id in expired:
+        try:
+            os.remove(_job_path(job_id))
+        except OSError:
+            pass
+
+
+def _purge_stale_files():
+    """Remove snapshots left behind by worker processes that exited before their jobs expired"""
+    cutoff = time.time() - JOB_RESULT_TTL
+    try:
+        with os.scandir(JOB_STORE_DIR) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+    except OSError:
+        pass
+
+
+def _snapshot(job):
+    snapshot = dict(job)
+    snapshot["progress"] = dict(job["progress"])
+    snapshot["failures"] = list(job["failures"])
+    return snapshot
+
+
+def _changed(job_id, job, force):
+    """Bump the job version and wake waiting streams; returns a snapshot when it is due to be persisted"""
+    job["version"] += 1
+    job["updated_at"] = now = time.time()
+    _jobs_changed.notify_all()
+
+    if not force and now - _last_persisted.get(job_id, 0) < PERSIST_INTERVAL:
+        return None
+    _last_persisted[job_id] = now
+    return json.loads(json.dumps(job))
+
+
+def _update_job(job_id, force=True, **fields):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        snapshot = _changed(job_id, job, force)
+
+    if snapshot is not None:
+        _persist(snapshot)
+
+
+def _handle_event(job_id, event):
+    """Fold a progress event of import_datasets.main into the job's counters"""
+    event_type = event["type"]
+    if event_type not in ("row_started", "submitted", "skipped", "failed"):
+        return
+
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+
+        progress = job["progress"]
+        if event_type == "row_started":
+            progress["total"] += 1
+        else:
+            progress["done"] += 1
+            if event_type == "failed":
+                progress["failed"] += 1
+                job["failures"].append(
+                    {"seq": progress["failed"], "row": event["row"], "identifier": event["identifier"], "error": event["error"]}
+                )
+                del job["failures"][:-MAX_FAILURE_EVENTS]
+            elif event_type == "skipped":
+                progress["skipped"] += 1
+            else:
+                progress["succeeded"] += 1
+                if event.get("action") == "updated":
+                    progress["updated"] += 1
+
+            elapsed = time.time() - job["started_at"]
+            if elapsed > 0:
+                rate = progress["done"] / elapsed
+                progress["rows_per_second"] = round(rate, 2)
+                progress["eta_seconds"] = round((progress["total"] - progress["done"]) / rate, 1) if rate else None
+
+        snapshot = _changed(job_id, job, force=False)
+
+    if snapshot is not None:
+        _persist(snapshot)
+
+
+def _run_job(job_id, func, args, kwargs):
+    _update_job(job_id, status="running", started_at=time.time())
+    metrics.inc("i14y_import_queue_depth", -1)
+    metrics.inc("i14y_imports_in_flight")
+
+    try:
+        result = func(*args, on_event=lambda event: _handle_event(job_id, event), **kwargs)
+        status = (result or {}).get("status", "completed")
+    except Exception as e:
+        # An aborted import (ImportAbortedError) or any other error must not take the worker thread down
+        logger.exception("Import job %s failed", job_id)
+        _update_job(job_id, status="error", error=str(e), finished_at=time.time())
+        status = "error"
+    else:
+        _update_job(job_id, status=status, result=result, finished_at=time.time())
+    finally:
+        metrics.inc("i14y_imports_in_flight", -1)
+
+    metrics.inc("i14y_imports_total", status=status)
+    # Gauges must not lag behind until the next flush interval
+    metrics.flush()
+
+
+def submit_job(func, *args, **kwargs):
+    """Run ``func(*args, on_event=..., **kwargs)`` on the import pool and return the job id.
+
+    Raises JobQueueFull instead of queueing more than JOB_QUEUE_MAX_SIZE jobs.
+    """
+    _purge_expired()
+    _purge_stale_files()
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    job = {
+        "id": job_id,
+        "status": "queued",
+        "progress": {
+            "done": 0,
+            "total": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "skipped": 0,
+            "updated": 0,
+            "rows_per_second": None,
+            "eta_seconds": None,
+        },
+        "failures": [],
+        "version": 0,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "started_at": None,
+        "finished_at": None,
+    }
+    with _jobs_lock:
+        if sum(queued["status"] == "queued" for queued in _jobs.values()) >= JOB_QUEUE_MAX_SIZE:
+            raise JobQueueFull()
+        _jobs[job_id] = job
+    _persist(job)
+    metrics.inc("i14y_import_queue_depth")
+
+    _get_executor().submit(_run_job, job_id, func, args, kwargs)
+    return job_id
+
+
+def get_job(job_id):
+    """Snapshot of a job, or None if it is unknown or expired"""
+    _purge_expired()
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            return _snapshot(job)
+
+    # Started by another worker process
+    job = _load(job_id)
+    if job is None or (job["finished_at"] is not None and time.time() - job["finished_at"] > JOB_RESULT_TTL):
+        return None
+    return job
+
+
+def wait_for_change(job_id, version, timeout):
+    """Block until the job's version differs from ``version`` or ``timeout`` passes; returns its snapshot"""
+    deadline = time.monotonic() + timeout
+    with _jobs_changed:
+        job = _jobs.get(job_id)
+        if job is not None:
+            while job["version"] == version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _jobs_changed.wait(remaining)
+            return _snapshot(job)
+
+    # Jobs of other processes only change on disk
+    while True:
+        job = get_job(job_id)
+        if job is None or job["version"] != version or time.monotonic() >= deadline:
+            return job
+        time.sleep(min(REMOTE_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
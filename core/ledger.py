@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from config import IMPORT_LEDGER_PATH, IMPORT_LEDGER_TTL
+
+
+logger = logging.getLogger(__name__)
+
+# Hashes looked up with one query; SQLite allows 999 bound parameters by default
+LOOKUP_BATCH_SIZE = 500
+# Created datasets are buffered and written in one transaction after this many rows
+FLUSH_EVERY = 25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS imported_datasets (
+    organization TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    identifier TEXT,
+    dataset_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (organization, content_hash)
+)
+"""
+
+
+def _lookup_query(count):
+    """SELECT for ``count`` hashes; only the number of ``?`` placeholders varies, the hashes are bound"""
+    placeholders = ",".join("?" * count)
+    where = f"organization = ? AND created_at >= ? AND content_hash IN ({placeholders})"
+    return "SELECT content_hash, dataset_id FROM imported_datasets WHERE " + where  # nosec B608
+
+
+def payload_hash(payload):
+    """Stable content hash of a dataset payload; key order and whitespace do not matter"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ImportLedger:
+    """Datasets already created per organization, keyed by the content hash of the submitted payload.
+
+    Only successful submissions are recorded, so rows that failed before are sent again on the
+    next upload and edited rows hash differently and count as new.
+    """
+
+    def __init__(self, path, organization):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+        self.organization = organization
+        self._pending = []
+
+    def known(self, hashes):
+        """Return ``{content_hash: dataset_id}`` for the hashes already imported within IMPORT_LEDGER_TTL"""
+        hashes = list(dict.fromkeys(h for h in hashes if h))
+        not_before = time.time() - IMPORT_LEDGER_TTL
+        found = {}
+
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            part = hashes[start : start + LOOKUP_BATCH_SIZE]
+            rows = self._conn.execute(_lookup_query(len(part)), [self.organization, not_before, *part])
+            found.update(rows)
+
+        return found
+
+    def record(self, content_hash, identifier, dataset_id):
+        """Remember a created dataset; written to disk in batches of FLUSH_EVERY"""
+        self._pending.append((self.organization, content_hash, identifier, dataset_id, time.time()))
+        if len(self._pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO imported_datasets "
+                "(organization, content_hash, identifier, dataset_id, created_at) VALUES (?, ?, ?, ?, ?)",
+                self._pending,
+            )
+        self._pending = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+
+def open_ledger(organization):
+    """Open the import ledger for one organization, or return None when IMPORT_LEDGER_PATH is empty"""
+    if not IMPORT_LEDGER_PATH or not organization:
+        return None
+
+    try:
+        return ImportLedger(IMPORT_LEDGER_PATH, organization)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Import ledger unavailable, all rows will be submitted: %s", e)
+        return None
@@ -0,0 +1,252 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from config import METRICS_DIR, METRICS_ENABLED, METRICS_FLUSH_INTERVAL
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Histogram the import hot path and token checks report their stage timings to
+STAGE_SECONDS = "i14y_import_stage_seconds"
+
+# name -> (type, help); gauges are summed over live worker processes, counters and histograms over all
+METRICS = {
+    "i14y_import_stage_seconds": ("histogram", "Time spent per import stage"),
+    "i14y_http_request_seconds": ("histogram", "Outbound HTTP request latency by endpoint"),
+    "i14y_http_responses_total": ("counter", "Outbound HTTP responses by endpoint and status code"),
+    "i14y_import_rows_total": ("counter", "Imported rows by outcome"),
+    "i14y_imports_total": ("counter", "Finished imports by status"),
+    "i14y_jwt_verifications_total": ("counter", "Access token checks by result"),
+    "i14y_template_builds_total": ("counter", "Inventory templates generated from changed codelists"),
+    "i14y_imports_in_flight": ("gauge", "Imports currently running"),
+    "i14y_import_queue_depth": ("gauge", "Imports waiting for a worker thread"),
+}
+
+# Counters and histograms of exited workers, folded together by retire()
+RETIRED_FILE = "retired.json"
+
+# (name, ((label, value), ...)) -> float for counters and gauges, histogram dict for histograms
+_values = {}
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+def _reset_after_fork():
+    """A forked worker starts from zero; the parent's values stay in the parent's file"""
+    global _lock, _last_flush
+    _values.clear()
+    _lock = threading.Lock()
+    _last_flush = 0.0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Add to a counter, or to a gauge when ``amount`` is negative"""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+    _maybe_flush()
+
+
+def observe(name, seconds, **labels):
+    """Record a duration in a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _values.get(key)
+        if histogram is None:
+            histogram = _values[key] = {"buckets": [0] * (len(DURATION_BUCKETS) + 1), "count": 0, "sum": 0.0}
+        histogram["buckets"][bisect_left(DURATION_BUCKETS, seconds)] += 1
+        histogram["count"] += 1
+        histogram["sum"] += seconds
+    _maybe_flush()
+
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed_iter(iterable, name, **labels):
+    """Yield from ``iterable``, recording how long each item took to produce"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        observe(name, time.perf_counter() - start, **labels)
+        yield item
+
+
+def local_values(name):
+    """This process's values of one metric as ``[(labels, value), ...]``"""
+    with _lock:
+        return [
+            (dict(labels), dict(value, buckets=list(value["buckets"])) if isinstance(value, dict) else value)
+            for (metric, labels), value in _values.items()
+            if metric == name
+        ]
+
+
+def _snapshot():
+    with _lock:
+        return [[name, [list(label) for label in labels], value] for (name, labels), value in _values.items()]
+
+
+def _path(pid):
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def flush():
+    """Write this process's values so /metrics on any worker can aggregate them"""
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not METRICS_ENABLED:
+        # Nobody reads the files; local_values still sees the in-memory values
+        return
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp_path = f"{_path(os.getpid())}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp_path, _path(os.getpid()))
+    except OSError as e:
+        logger.warning("Failed to write metrics: %s", e)
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _add(totals, name, labels, value):
+    key = (name, tuple(tuple(label) for label in labels))
+    if METRICS.get(name, ("counter",))[0] == "histogram":
+        total = totals.setdefault(key, {"buckets": [0] * len(value["buckets"]), "count": 0, "sum": 0.0})
+        total["buckets"] = [a + b for a, b in zip(total["buckets"], value["buckets"])]
+        total["count"] += value["count"]
+        total["sum"] += value["sum"]
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def _read(path):
+    """``[[name, labels, value], ...]`` as written by flush(), or None for a missing or torn file"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def retire(pid):
+    """Fold the counters and histograms of an exited worker into RETIRED_FILE and delete its file.
+
+    Runs in the gunicorn master (child_exit), the only writer of RETIRED_FILE, so the directory
+    keeps one file per live worker while the totals survive restarts. Gauges are dropped.
+    """
+    values = _read(_path(pid))
+    if values is None:
+        return
+    retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+    totals = {}
+    for name, labels, value in (_read(retired_path) or []) + values:
+        if METRICS.get(name, ("counter",))[0] != "gauge":
+            _add(totals, name, labels, value)
+    try:
+        tmp_path = f"{retired_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([[name, [list(label) for label in labels], value] for (name, labels), value in totals.items()], f)
+        os.replace(tmp_path, retired_path)
+        os.remove(_path(pid))
+    except OSError as e:
+        logger.warning("Failed to retire the metrics of worker %s: %s", pid, e)
+
+
+def collect():
+    """Values of all worker processes that shared METRICS_DIR, summed per metric and label set"""
+    flush()
+    totals = {}
+    try:
+        entries = list(os.scandir(METRICS_DIR))
+    except OSError:
+        entries = []
+
+    for entry in entries:
+        pid = entry.name[: -len(".json")]
+        # Only the <pid>.json files flush() writes and RETIRED_FILE; anything else in the directory is ignored
+        if entry.name == RETIRED_FILE:
+            alive = False
+        elif entry.name.endswith(".json") and pid.isdigit():
+            alive = _alive(int(pid))
+        else:
+            continue
+        values = _read(entry.path)
+        if values is None:
+            continue
+
+        for name, labels, value in values:
+            if METRICS.get(name, ("counter",))[0] == "gauge" and not alive:
+                continue
+            _add(totals, name, labels, value)
+
+    return totals
+
+
+def _format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus():
+    """All workers' metrics in the Prometheus text exposition format"""
+    totals = collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric, labels), value in sorted(totals.items()):
+            if metric != name:
+                continue
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*map(str, DURATION_BUCKETS), "+Inf"], value["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value['sum']:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
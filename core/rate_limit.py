@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+from config import SUBMIT_RATE_LIMIT, SUBMIT_RATE_BURST, SUBMIT_CONCURRENCY, SUBMIT_MAX_IN_FLIGHT
+
+
+# Status codes that signal overload and shrink the concurrency window
+THROTTLE_STATUS_CODES = (429, 503)
+
+# A burst of throttled responses from requests already in flight only halves the window once
+DECREASE_COOLDOWN = 1.0  # seconds
+
+# Growth is this many times slower once the window is within one slot of the last throttled size
+PROBE_SLOWDOWN = 50
+
+
+def parse_retry_after(value):
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Requests per second with a burst allowance; a rate of 0 disables the limit"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = max(1.0, burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.rate <= 0:
+                        return
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hand out no tokens for ``seconds``, e.g. after a Retry-After"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class AdaptiveConcurrencyLimit:
+    """AIMD window: grows by one per window's worth of successes, halves when the API throttles.
+
+    The size at which the API last answered 429 is remembered; close to it the window grows
+    PROBE_SLOWDOWN times slower, so it settles just below the API's capacity instead of
+    overshooting it again right after every decrease.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.ceiling = None
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def on_success(self):
+        with self.condition:
+            if self.limit >= self.maximum:
+                return
+            step = 1 / self.limit
+            if self.ceiling is not None:
+                if self.limit + 1 >= self.ceiling:
+                    step /= PROBE_SLOWDOWN
+                if self.limit >= self.ceiling + 1:
+                    # Grew past the old throttling point without trouble: capacity went up
+                    self.ceiling = None
+            self.limit = min(self.maximum, self.limit + step)
+            self.condition.notify_all()
+
+    def on_throttle(self, at_capacity=True):
+        """Halve the window; ``at_capacity`` marks an explicit rate-limit answer (429) whose size is remembered"""
+        with self.condition:
+            now = time.monotonic()
+            if now - self.last_decrease >= DECREASE_COOLDOWN:
+                if at_capacity:
+                    self.ceiling = self.limit
+                self.limit = max(self.minimum, self.limit / 2)
+                self.last_decrease = now
+
+
+class SubmissionLimiter:
+    """Token bucket plus adaptive concurrency window shared by all imports of a process"""
+
+    def __init__(self, rate=SUBMIT_RATE_LIMIT, burst=SUBMIT_RATE_BURST, initial=SUBMIT_CONCURRENCY, maximum=SUBMIT_MAX_IN_FLIGHT):
+        self.bucket = TokenBucket(rate, burst)
+        self.window = AdaptiveConcurrencyLimit(initial, maximum=maximum)
+        self.stats = {"sent": 0, "throttled": 0, "paused_seconds": 0.0}
+        self.stats_lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        """Wait for a concurrency slot and a token, then hold the slot while the request runs"""
+        self.window.acquire()
+        try:
+            self.bucket.acquire()
+            with self.stats_lock:
+                self.stats["sent"] += 1
+            yield
+        finally:
+            self.window.release()
+
+    def record_success(self):
+        self.window.on_success()
+
+    def record_throttle(self, status_code, retry_after=None):
+        self.window.on_throttle(at_capacity=status_code == 429)
+        if retry_after:
+            self.bucket.pause(retry_after)
+        with self.stats_lock:
+            self.stats["throttled"] += 1
+            self.stats["paused_seconds"] += retry_after or 0.0
+
+    def snapshot(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["concurrency_limit"] = int(self.window.limit)
+        stats["in_flight"] = self.window.in_flight
+        stats["rate_limit"] = self.bucket.rate
+        return stats
+
+
+_limiter = None
+_limiter_pid = None
+_limiter_lock = threading.Lock()
+
+
+def get_submission_limiter():
+    """The process-wide limiter; forked workers start with a fresh one"""
+    global _limiter, _limiter_pid
+    pid = os.getpid()
+    if _limiter is None or _limiter_pid != pid:
+        with _limiter_lock:
+            if _limiter is None or _limiter_pid != pid:
+                _limiter = SubmissionLimiter()
+                _limiter_pid = pid
+    return _limiter
+
+
+def configure_submission_limiter(**options):
+    """Replace the process-wide limiter, e.g. to give each process of a pool its share of the rate"""
+    global _limiter, _limiter_pid
+    with _limiter_lock:
+        _limiter = SubmissionLimiter(**options)
+        _limiter_pid = os.getpid()
+    return _limiter
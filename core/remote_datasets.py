@@ -0,0 +1,127 @@
+import threading
+import time
+
+from config import API_BASE_URL, REMOTE_DATASETS_CACHE_TTL, REMOTE_DATASETS_PAGE_SIZE
+from core import http_client
+
+
+# Dataset fields create_dataset_payload/build_payloads can set; only these are compared
+MANAGED_FIELDS = (
+    "title",
+    "description",
+    "publisher",
+    "accessRights",
+    "issued",
+    "modified",
+    "identifiers",
+    "keywords",
+    "contactPoints",
+    "themes",
+    "spatial",
+    "temporalCoverage",
+    "distributions",
+)
+
+# Process-wide cache: publisher identifier -> {"index": {identifier: {"id", "data"}}, "expires_at": float}
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _page_items(body):
+    """Datasets of one list response, which is either a plain list or wrapped in ``data``"""
+    if isinstance(body, list):
+        return body
+    return body.get("data") or body.get("items") or []
+
+
+def fetch_remote_datasets(api_token, publisher_identifier):
+    """List all datasets of a publisher page by page; returns ``{str(identifier): {"id": ..., "data": ...}}``.
+
+    Datasets without an identifier cannot be matched to a workbook row and are left out.
+    """
+    headers = {"Authorization": api_token, "Accept": "application/json"}
+    index = {}
+    seen = set()
+    page = 1
+    while True:
+        response = http_client.get(
+            f"{API_BASE_URL}/datasets",
+            endpoint="i14y.datasets.list",
+            headers=headers,
+            params={"publisherIdentifier": publisher_identifier, "page": page, "pageSize": REMOTE_DATASETS_PAGE_SIZE},
+        )
+        response.raise_for_status()
+        body = response.json()
+        items = _page_items(body)
+
+        new = 0
+        for item in items:
+            data = item.get("data", item)
+            dataset_id = item.get("id") or data.get("id")
+            if dataset_id not in seen:
+                seen.add(dataset_id)
+                new += 1
+            for identifier in data.get("identifiers") or []:
+                if dataset_id and identifier:
+                    index[str(identifier)] = {"id": dataset_id, "data": data}
+
+        # The API may cap pageSize below what was asked for, so a short page is not necessarily the
+        # last one: stop at an empty page, at totalCount, or when a page repeats datasets already listed
+        total = body.get("totalCount") if isinstance(body, dict) else None
+        if not new or (isinstance(total, int) and len(seen) >= total):
+            return index
+        page += 1
+
+
+def get_remote_datasets(api_token, publisher_identifier):
+    """Cached fetch_remote_datasets; repeated imports of one publisher within REMOTE_DATASETS_CACHE_TTL share one listing"""
+    with _cache_lock:
+        entry = _cache.get(publisher_identifier)
+        if entry is not None and entry["expires_at"] > time.time():
+            return entry["index"]
+
+    index = fetch_remote_datasets(api_token, publisher_identifier)
+    with _cache_lock:
+        _cache[publisher_identifier] = {"index": index, "expires_at": time.time() + REMOTE_DATASETS_CACHE_TTL}
+    return index
+
+
+def forget_remote_datasets(publisher_identifier):
+    """Drop a publisher's cached listing after datasets were created or updated"""
+    with _cache_lock:
+        _cache.pop(publisher_identifier, None)
+
+
+def clear_remote_datasets_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _is_empty(value):
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _matches(local, remote):
+    """Whether the remote value carries everything of the local one; extra keys the API adds are ignored"""
+    if isinstance(local, dict):
+        if not isinstance(remote, dict):
+            return False
+        return all(
+            _is_empty(value) and _is_empty(remote.get(key)) or _matches(value, remote.get(key))
+            for key, value in local.items()
+        )
+    if isinstance(local, list):
+        return isinstance(remote, list) and len(local) == len(remote) and all(map(_matches, local, remote))
+    if isinstance(local, int) and not isinstance(local, bool) and isinstance(remote, str):
+        # Whole-number cells are read as int; the API returns the same value as text
+        return str(local) == remote
+    return local == remote
+
+
+def changed_fields(local, remote):
+    """Managed fields whose value in the payload data differs from the existing dataset"""
+    return [
+        field
+        for field in MANAGED_FIELDS
+        if not (_is_empty(local.get(field)) and _is_empty(remote.get(field)) or _matches(local.get(field), remote.get(field)))
+    ]
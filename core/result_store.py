@@ -0,0 +1,98 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+from config import RESULT_STORE_PATH, JOB_RESULT_TTL
+
+
+# Entry kinds stored per result
+LINKS = "link"
+ERRORS = "error"
+WARNINGS = "warning"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    result_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS result_entries (
+    result_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (result_id, kind, seq)
+);
+"""
+
+_initialized = set()
+
+
+def _connect():
+    """Short-lived connection; SQLite handles the locking between threads and gunicorn workers"""
+    directory = os.path.dirname(RESULT_STORE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(RESULT_STORE_PATH, timeout=30)
+    key = (os.getpid(), RESULT_STORE_PATH)
+    if key not in _initialized:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized.add(key)
+    return conn
+
+
+def purge_expired():
+    conn = _connect()
+    try:
+        with conn:
+            expired = [row[0] for row in conn.execute("SELECT result_id FROM results WHERE expires_at < ?", (time.time(),))]
+            conn.executemany("DELETE FROM result_entries WHERE result_id = ?", [(r,) for r in expired])
+            conn.executemany("DELETE FROM results WHERE result_id = ?", [(r,) for r in expired])
+    finally:
+        conn.close()
+
+
+def save_result(summary, entries):
+    """Store the entry lists of a result (``{kind: [item, ...]}``); returns ``summary`` with the result id and counts"""
+    purge_expired()
+
+    result_id = uuid.uuid4().hex
+    counts = {kind: len(items) for kind, items in entries.items()}
+    summary = dict(summary, result_id=result_id, entry_counts=counts)
+
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO results (result_id, expires_at) VALUES (?, ?)",
+                (result_id, time.time() + JOB_RESULT_TTL),
+            )
+            conn.executemany(
+                "INSERT INTO result_entries (result_id, kind, seq, data) VALUES (?, ?, ?, ?)",
+                (
+                    (result_id, kind, seq, json.dumps(item, ensure_ascii=False))
+                    for kind, items in entries.items()
+                    for seq, item in enumerate(items)
+                ),
+            )
+    finally:
+        conn.close()
+
+    return summary
+
+
+def get_entries(result_id, kind, offset=0, limit=50):
+    """One page of a result's entries, or an empty list once the result has expired"""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT e.data FROM result_entries e JOIN results r ON r.result_id = e.result_id "
+            "WHERE e.result_id = ? AND e.kind = ? AND r.expires_at >= ? ORDER BY e.seq LIMIT ? OFFSET ?",
+            (result_id, kind, time.time(), limit, offset),
+        )
+        return [json.loads(data) for (data,) in rows]
+    finally:
+        conn.close()
@@ -0,0 +1,157 @@
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from core.codelist_utils import ACCESS_RIGHTS_INDEX, ACCESS_RIGHTS_MAPPING, CODELISTS, get_cached_codelist, get_label_index
+from core.inventory_reader import DATE_COLUMNS, READ_ERROR_COLUMN
+
+
+DISTRIBUTION_INDICES = range(1, 4)
+LICENSE_COLUMNS = tuple(f"distribution_license_label_{i}" for i in DISTRIBUTION_INDICES)
+URL_SCHEMES = frozenset({"http", "https"})
+
+
+class ValidationError(ValueError):
+    """A row that would be rejected by the API, found before it is submitted"""
+
+    def __init__(self, messages):
+        self.messages = messages
+        super().__init__("Validation failed: " + "; ".join(messages))
+
+
+def _label_index(name):
+    """LabelIndex of a cached codelist, or None while only the offline fallback is available"""
+    if len(get_cached_codelist(name)) <= len(CODELISTS[name][1]):
+        return None
+    return get_label_index(name)
+
+
+def _present(df, col):
+    """Null mask as a NumPy array; blank strings count as missing like in the payload builder"""
+    series = df[col]
+    present = series.notna().to_numpy()
+    if series.dtype == object:
+        present &= series.astype(str).str.strip().ne("").to_numpy()
+    return present
+
+
+def _unresolved(df, col, index):
+    """Mask of present cells that no label or code of ``index`` matches, looked up once per distinct value"""
+    present = _present(df, col)
+    series = df[col]
+    resolvable = [value for value in series[present].unique() if index.lookup(value) is not None]
+    return present & ~series.isin(resolvable).to_numpy()
+
+
+def _is_url(value):
+    """Absolute http(s) URL with a host and without whitespace; single-label hosts and IP literals count"""
+    value = str(value).strip()
+    if not value or any(char.isspace() for char in value):
+        return False
+    try:
+        parts = urlsplit(value)
+        parts.port  # raises for a port that is not a number
+    except ValueError:
+        return False
+    return parts.scheme.lower() in URL_SCHEMES and bool(parts.hostname)
+
+
+def _report(errors, df, invalid, message, col=None):
+    for i in np.flatnonzero(invalid):
+        value = df[col].iat[i] if col else None
+        errors.setdefault(df.index[i], []).append(message.format(col=col, value=value))
+
+
+def validate_rows(df):
+    """Check a chunk of inventory rows column by column before any payload is built.
+
+    Returns ``{index: [message, ...]}`` for the rows with problems; rows not in the result are
+    clean. Codelist checks are skipped while a codelist could not be fetched. Rows that could not
+    be read from the file only report that.
+    """
+    errors = {}
+    if df.empty:
+        return errors
+
+    if READ_ERROR_COLUMN in df.columns:
+        unreadable = df[READ_ERROR_COLUMN].notna().to_numpy()
+        _report(errors, df, unreadable, "{value}", READ_ERROR_COLUMN)
+        df = df[~unreadable]
+        if df.empty:
+            return errors
+
+    # Rows without any title are skipped before validation; a blank one would still be sent
+    _report(errors, df, ~_present(df, "title"), "title is missing")
+    _report(errors, df, ~_present(df, "description"), "description is missing")
+
+    if "accessRights" in df.columns:
+        invalid = _unresolved(df, "accessRights", ACCESS_RIGHTS_INDEX)
+        _report(errors, df, invalid, "unknown access rights '{value}'", "accessRights")
+
+    for col, name, label in [("themes_label", "themes", "theme")] + [
+        (col, "licenses", "license") for col in LICENSE_COLUMNS
+    ]:
+        if col not in df.columns:
+            continue
+        index = _label_index(name)
+        if index is None:
+            continue
+        invalid = _unresolved(df, col, index)
+        _report(errors, df, invalid, f"unknown {label} '{{value}}' in {{col}}", col)
+
+    for col in DATE_COLUMNS:
+        if col not in df.columns or pd.api.types.is_datetime64_dtype(df[col]):
+            continue
+        # Only cells the payload builder can call .isoformat() on are accepted
+        is_date = df[col].map(lambda value: hasattr(value, "isoformat")).to_numpy(dtype=bool)
+        _report(errors, df, df[col].notna().to_numpy() & ~is_date, "{col} is not a date ('{value}')", col)
+
+    for i in DISTRIBUTION_INDICES:
+        access_col, download_col = f"distribution_accessUrl_{i}", f"distribution_downloadUrl_{i}"
+        # The access URL is used for both links when it is given, so the download URL is only sent without it
+        has_access_url = df[access_col].notna().to_numpy() if access_col in df.columns else np.zeros(len(df), dtype=bool)
+        for col, used in ((access_col, has_access_url), (download_col, ~has_access_url)):
+            if col not in df.columns:
+                continue
+            series = df[col]
+            urls = [value for value in series.dropna().unique() if _is_url(value)]
+            is_url = series.isin(urls).to_numpy()
+            _report(errors, df, used & series.notna().to_numpy() & ~is_url, "{col} is not a valid URL ('{value}')", col)
+
+    return errors
+
+
+def label_warnings(df):
+    """Cells whose label was only resolved as a near match, as ``{index: [message, ...]}``.
+
+    The payload keeps the matched code; the messages let the user see which value was taken
+    for which label. Exact matches (also up to case, accents and spacing) are not reported.
+    """
+    warnings = {}
+    if df.empty:
+        return warnings
+
+    columns = [("accessRights", ACCESS_RIGHTS_MAPPING, ACCESS_RIGHTS_INDEX)]
+    if "themes_label" in df.columns:
+        columns.append(("themes_label", get_cached_codelist("themes"), get_label_index("themes")))
+    for col, mapping, index in columns:
+        if col not in df.columns:
+            continue
+        series = df[col]
+        present = _present(df, col)
+        near = {}
+        for value in series[present].unique():
+            if value in mapping:
+                continue
+            code, label = index.match(value)
+            if label is not None:
+                near[value] = (code, label)
+        if not near:
+            continue
+        matched = present & series.isin(list(near)).to_numpy()
+        for i in np.flatnonzero(matched):
+            value = series.iat[i]
+            code, label = near[value]
+            warnings.setdefault(df.index[i], []).append(f"{col} '{value}' was taken as '{label}' ({code})")
+    return warnings
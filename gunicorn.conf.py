@@ -0,0 +1,71 @@
+"""Gunicorn settings for the import service; gunicorn picks this file up from the working directory.
+
+Imports are I/O bound: a request only validates the upload and hands it to the import thread pool
+(IMPORT_WORKERS per process), while status pages and SSE streams hold a request thread each. The
+default profile is therefore a few processes with many threads. Job state, results and metrics
+are shared between the processes through files, so any worker can answer for any import.
+"""
+import os
+
+
+def _cpu_count():
+    try:
+        # CPUs this container may actually use, not the host's
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+
+# gthread is the supported class; "gevent" works only if the gevent package is installed
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", min(_cpu_count() * 2, 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", 16))
+
+# Load the app once in the master; the import modules themselves are loaded lazily (see warm_up_mode)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+
+# run.warm_up loads pandas/openpyxl and fills the codelist and JWKS caches:
+#   "worker" - in a background thread of every worker after fork, so /health answers right away
+#   "master" - once in the preloaded master before forking; workers share it but start later
+#   "off"    - on demand, the first upload pays for it
+warm_up_mode = os.environ.get("GUNICORN_WARM_UP", "worker").lower()
+
+# Worker heartbeat; gthread workers keep beating while request threads wait on I/O
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+# On deploys and restarts, running imports get this long to finish before the worker is killed
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 600))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# An empty value disables the access log
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+
+
+def when_ready(server):
+    if warm_up_mode == "master" and preload_app:
+        import run
+
+        run.warm_up()
+
+
+def post_fork(server, worker):
+    # Sessions, pools, the rate limiter and the codelist scheduler are created per process on first use
+    server.log.info("Worker %s started (%s, %s threads)", worker.pid, worker_class, threads)
+
+
+def child_exit(server, worker):
+    # Fold the exited worker's counters into one file so restarts do not pile up metric files
+    from core import metrics
+
+    metrics.retire(worker.pid)
+
+
+def post_worker_init(worker):
+    if warm_up_mode == "worker" or (warm_up_mode == "master" and not preload_app):
+        import threading
+
+        import run
+
+        threading.Thread(target=run.warm_up, name="warm-up", daemon=True).start()
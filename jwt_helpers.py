@@ -1,9 +1,26 @@
-import requests
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
 from urllib.parse import urlparse
 
+from config import JWKS_CACHE_TTL, JWKS_REFETCH_COOLDOWN, VERIFIED_TOKEN_CACHE_SIZE
+from core import http_client
 
+
+logger = logging.getLogger(__name__)
+
+# url -> {"document": dict, "expires_at": float}
 _discovery_cache = {}
+# jwks_uri -> {"keys": {kid: key object}, "fetched_at": float, "expires_at": float}
 _jwks_cache = {}
+# sha256(token) -> (claims, exp); least recently used first
+_verified_tokens = OrderedDict()
+_cache_lock = threading.Lock()
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
 
 
 def _assert_same_origin(url: str, issuer: str, label: str) -> None:
@@ -16,19 +33,34 @@ def _assert_same_origin(url: str, issuer: str, label: str) -> None:
         )
 
 
+def _cache_ttl(response) -> float:
+    """Lifetime from the Cache-Control header, falling back to JWKS_CACHE_TTL."""
+    cache_control = response.headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    return int(match.group(1)) if match else JWKS_CACHE_TTL
+
+
 def get_openid_configuration(issuer: str) -> dict:
     issuer = issuer.rstrip("/")
     url = f"{issuer}/.well-known/openid-configuration"
 
-    if url not in _discovery_cache:
-        response = requests.get(url, timeout=10, allow_redirects=False)
-        response.raise_for_status()
-        _discovery_cache[url] = response.json()
+    with _cache_lock:
+        entry = _discovery_cache.get(url)
+    if entry is not None and entry["expires_at"] > time.time():
+        return entry["document"]
 
-    return _discovery_cache[url]
+    response = http_client.get(url, endpoint="oidc.discovery", allow_redirects=False)
+    response.raise_for_status()
+    document = response.json()
 
+    with _cache_lock:
+        _discovery_cache[url] = {"document": document, "expires_at": time.time() + _cache_ttl(response)}
+    return document
 
-def get_signing_key_from_jwks(jwks_uri: str, kid: str, issuer: str):
+
+def _load_rsa_algorithm():
     # Import lazily so missing crypto extras do not crash app startup.
     try:
         from jwt.algorithms import RSAAlgorithm
@@ -36,19 +68,91 @@ def get_signing_key_from_jwks(jwks_uri: str, kid: str, issuer: str):
         raise RuntimeError(
             "PyJWT crypto backend is missing. Install with: pip install 'PyJWT[crypto]'"
         ) from exc
+    return RSAAlgorithm
+
+
+def _refresh_jwks(jwks_uri: str) -> dict:
+    """Fetch the key set and build the RSA key object of every kid once."""
+    RSAAlgorithm = _load_rsa_algorithm()
+
+    response = http_client.get(jwks_uri, endpoint="oidc.jwks", allow_redirects=False)
+    response.raise_for_status()
+
+    keys = {}
+    for jwk in response.json().get("keys", []):
+        kid = jwk.get("kid")
+        if not kid or jwk.get("kty") != "RSA" or jwk.get("use", "sig") != "sig":
+            continue
+        try:
+            keys[kid] = RSAAlgorithm.from_jwk(jwk)
+        except Exception as e:
+            logger.warning("Skipping unusable JWK kid=%s: %s", kid, e)
+
+    now = time.time()
+    entry = {"keys": keys, "fetched_at": now, "expires_at": now + _cache_ttl(response)}
+    with _cache_lock:
+        _jwks_cache[jwks_uri] = entry
+    return entry
 
+
+def get_signing_key_from_jwks(jwks_uri: str, kid: str, issuer: str):
     # Ensure jwks_uri stays on the issuer's own origin (SSRF prevention)
     _assert_same_origin(jwks_uri, issuer, "jwks_uri")
 
-    if jwks_uri not in _jwks_cache:
-        response = requests.get(jwks_uri, timeout=10, allow_redirects=False)
-        response.raise_for_status()
-        _jwks_cache[jwks_uri] = response.json()
+    with _cache_lock:
+        entry = _jwks_cache.get(jwks_uri)
+
+    now = time.time()
+    if entry is None or entry["expires_at"] <= now:
+        entry = _refresh_jwks(jwks_uri)
+    elif kid not in entry["keys"] and now - entry["fetched_at"] >= JWKS_REFETCH_COOLDOWN:
+        # Unknown kid: the issuer probably rotated its keys. The cooldown stops tokens with
+        # made-up kids from turning every request into a JWKS download.
+        entry = _refresh_jwks(jwks_uri)
+
+    key = entry["keys"].get(kid)
+    if key is None:
+        raise ValueError(f"No matching JWK found for kid={kid}")
+    return key
+
+
+def prefetch_signing_keys(issuer: str) -> int:
+    """Load the issuer's discovery document and key set into the caches; returns the number of keys."""
+    jwks_uri = get_openid_configuration(issuer).get("jwks_uri")
+    if not jwks_uri:
+        raise ValueError("OIDC discovery document does not contain jwks_uri")
+    _assert_same_origin(jwks_uri, issuer, "jwks_uri")
+    return len(_refresh_jwks(jwks_uri)["keys"])
+
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_verified_claims(token: str):
+    """Claims of a token that passed full verification earlier and has not expired, else None."""
+    digest = _token_digest(token)
+    with _cache_lock:
+        cached = _verified_tokens.get(digest)
+        if cached is None:
+            return None
+        claims, exp = cached
+        if exp <= time.time():
+            del _verified_tokens[digest]
+            return None
+        _verified_tokens.move_to_end(digest)
+        return claims
 
-    jwks = _jwks_cache[jwks_uri]
 
-    for jwk in jwks.get("keys", []):
-        if jwk.get("kid") == kid:
-            return RSAAlgorithm.from_jwk(jwk)
+def remember_verified_claims(token: str, claims: dict) -> None:
+    """Memoize the claims of a verified token until its exp, so repeat calls skip RSA verification."""
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)) or VERIFIED_TOKEN_CACHE_SIZE <= 0:
+        return
 
-    raise ValueError(f"No matching JWK found for kid={kid}")
+    digest = _token_digest(token)
+    with _cache_lock:
+        _verified_tokens[digest] = (claims, exp)
+        _verified_tokens.move_to_end(digest)
+        while len(_verified_tokens) > VERIFIED_TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
@@ -5,31 +5,65 @@ from dotenv import load_dotenv
 _env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".do", ".env")
 load_dotenv(_env_path)
 
+import logging
 from flask import Flask
-from config import SECRET_KEY, MAX_CONTENT_LENGTH
-import tempfile
+from config import SECRET_KEY, MAX_CONTENT_LENGTH, check_web_settings
+
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+check_web_settings()
 
 # Define the necessary folders
 template_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "templates")
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app", "static")
 
-# Define upload folder using environment variable or temp directory
-upload_folder = os.environ.get("UPLOAD_FOLDER", os.path.join(tempfile.gettempdir(), "i14y_uploads"))
-os.makedirs(upload_folder, exist_ok=True)
-
 # Create the Flask app
 app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
 
 # Configure the app
 app.config["SECRET_KEY"] = SECRET_KEY
 app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
-app.config["UPLOAD_FOLDER"] = upload_folder
 
 # Register routes
 from app.routes import register_routes
 
 register_routes(app)
 
+
+def warm_up():
+    """Load the import modules and fill the codelist, signing key and template caches before the first request needs them.
+
+    Started by gunicorn.conf.py, by default in the background of each worker after fork.
+    """
+    import time
+
+    start = time.perf_counter()
+    import core.import_datasets  # noqa: F401 - pandas, numpy and openpyxl
+    from config import JWT_EXPECTED_ISSUER
+    from core.codelist_utils import CODELISTS, get_cached_codelist
+    from jwt_helpers import prefetch_signing_keys
+
+    logger = logging.getLogger(__name__)
+    logger.info("Warm-up: import modules loaded in %.2fs", time.perf_counter() - start)
+    for name in CODELISTS:
+        try:
+            logger.info("Warm-up: %s codelist has %s entries", name, len(get_cached_codelist(name)))
+        except Exception as e:
+            logger.warning("Warm-up: %s codelist unavailable: %s", name, e)
+    try:
+        logger.info("Warm-up: %s signing keys from %s", prefetch_signing_keys(JWT_EXPECTED_ISSUER), JWT_EXPECTED_ISSUER)
+    except Exception as e:
+        logger.warning("Warm-up: signing keys unavailable: %s", e)
+    try:
+        from core.inventory_template import get_template
+
+        logger.info("Warm-up: inventory template is %s bytes", len(get_template()[0]))
+    except Exception as e:
+        logger.warning("Warm-up: inventory template unavailable: %s", e)
+
+
 if __name__ == "__main__":
     # Use PORT environment variable if available (for Digital Ocean)
     port = int(os.environ.get("PORT", 5000))
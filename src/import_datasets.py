@@ -0,0 +1,391 @@
+"""Import many inventory workbooks without the web interface, e.g. for nightly bulk syncs.
+
+Usage: python -m src.import_datasets INPUT [INPUT ...] [--token TOKEN] [--processes N]
+                                     [--report-dir DIR] [--organization ID] [--publisher NAME]
+                                     [--update] [--no-skip-unchanged]
+                                     [--dry-run | --replay [--retry-failed REPORT]]
+
+INPUT is an inventory file (xlsx, CSV or NDJSON), a directory (its *.xlsx, *.csv, *.ndjson and
+*.jsonl files) or a glob pattern. The token is read from --token or I14Y_API_TOKEN. Without
+--organization and --publisher, rows are imported for the agencies in the token as in the web
+interface: a publisher column picks the agency per row, empty cells go to the first one. With
+--update, rows whose identificator already exists as a dataset of the publisher update that
+dataset when a field changed instead of creating a new one. Workbooks are imported by a pool of
+processes that share the codelists fetched once by the parent and split the submission rate limit
+between them. A JSON and a CSV report (<stem>.report.json/.csv) are written per workbook; the exit
+code is 1 if any workbook had errors.
+
+--dry-run only builds the payloads and writes them to <report>.payloads.ndjson without contacting
+the dataset API. --replay submits such files instead of inventories; --retry-failed limits the
+replay to the rows a JSON or CSV report of an earlier run lists as failed.
+"""
+import argparse
+import csv
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import jwt
+from dotenv import load_dotenv
+
+# Same .do/.env as the web app, so the CLI talks to the API it is configured for
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".do", ".env"))
+
+from config import SUBMIT_CONCURRENCY, SUBMIT_MAX_IN_FLIGHT, SUBMIT_RATE_BURST, SUBMIT_RATE_LIMIT
+
+logger = logging.getLogger("import_datasets")
+
+WORKBOOK_PATTERNS = ("*.xlsx", "*.csv", "*.ndjson", "*.jsonl")
+PAYLOAD_PATTERNS = ("*.payloads.ndjson",)
+# Reports are <report-dir>/<stem>.report.json and .csv, so they never replace an input of the same name
+REPORT_SUFFIX = ".report"
+REPORT_COLUMNS = ["row", "identifier", "publisher", "outcome", "dataset_id", "changed_fields", "error", "warnings"]
+COUNTS = ("success_count", "updated_count", "error_count", "skipped_count", "total_count")
+# Row outcomes reported by import_datasets.main
+ROW_EVENTS = ("submitted", "skipped", "failed")
+
+
+def _configure_logging():
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(processName)s %(name)s: %(message)s",
+    )
+
+
+def is_report(path):
+    """Whether a file is a CSV or JSON report written by an earlier run"""
+    stem, extension = os.path.splitext(path)
+    return extension in (".csv", ".json") and stem.endswith(REPORT_SUFFIX)
+
+
+def find_workbooks(inputs, patterns=WORKBOOK_PATTERNS):
+    """Workbook paths from files, directories and glob patterns, without duplicates, Excel lock files or reports"""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(path for pattern in patterns for path in glob.glob(os.path.join(item, pattern)))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = sorted(glob.glob(item))
+        # Reports of an earlier run into the same directory are not inventories
+        if not os.path.isfile(item):
+            matches = [path for path in matches if not is_report(path)]
+        if not matches:
+            logger.warning("No workbooks found for %s", item)
+        paths.extend(path for path in matches if not os.path.basename(path).startswith("~$"))
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths))
+
+
+def token_agencies(token):
+    """Agency entries ("ORG\\Publisher") of the token.
+
+    The signature is not checked here; the I14Y API verifies the token on every submission.
+    """
+    claims = jwt.decode(token, options={"verify_signature": False})  # nosemgrep: python.jwt.security.unverified-jwt-decode.unverified-jwt-decode
+    agencies = claims.get("agencies", [])
+    if not agencies:
+        raise ValueError("Token does not contain any agencies")
+    return agencies
+
+
+def token_agency(token):
+    """Organization id and publisher name of the first agency in the token"""
+    from core.agencies import split_agency
+
+    return split_agency(token_agencies(token)[0])
+
+
+def report_files(prefix):
+    """The JSON report, CSV report and payload export written for a report prefix"""
+    return f"{prefix}{REPORT_SUFFIX}.json", f"{prefix}{REPORT_SUFFIX}.csv", f"{prefix}.payloads.ndjson"
+
+
+def report_paths(workbooks, report_dir):
+    """Report path prefix per workbook; equal file names in different directories get a suffix.
+
+    Raises ValueError when a report or payload file would overwrite one of the inputs.
+    """
+    prefixes = {}
+    used = set()
+    for path in workbooks:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = f"{stem}-{n}"
+        used.add(name)
+        prefixes[path] = os.path.join(report_dir, name)
+
+    inputs = {os.path.abspath(path) for path in workbooks}
+    for prefix in prefixes.values():
+        for output in report_files(prefix):
+            if os.path.abspath(output) in inputs:
+                raise ValueError(f"{output} is an input and would be overwritten by a report")
+    return prefixes
+
+
+def failed_rows(report):
+    """Row numbers a JSON or CSV report of an earlier run lists as failed"""
+    with open(report, encoding="utf-8", newline="") as f:
+        rows = json.load(f)["rows"] if report.endswith(".json") else list(csv.DictReader(f))
+    return {int(row["row"]) for row in rows if row["outcome"] == "failed"}
+
+
+def limiter_share(processes):
+    """Submission limiter settings for one of ``processes`` pool processes, so their sum stays within the configured limits"""
+    return {
+        "rate": SUBMIT_RATE_LIMIT / processes,
+        "burst": max(1.0, SUBMIT_RATE_BURST / processes),
+        "initial": max(1, SUBMIT_CONCURRENCY // processes),
+        "maximum": max(1, SUBMIT_MAX_IN_FLIGHT // processes),
+    }
+
+
+def _init_worker(codelists, limiter_options):
+    from core.codelist_utils import seed_codelists
+    from core.rate_limit import configure_submission_limiter
+
+    _configure_logging()
+    seed_codelists(codelists)
+    configure_submission_limiter(**limiter_options)
+
+
+def _write_reports(prefix, summary, rows):
+    json_path, csv_path, _ = report_files(prefix)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(dict(summary, rows=rows), f, ensure_ascii=False, indent=2)
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def import_workbook(
+    path,
+    api_token,
+    organization_id,
+    publisher,
+    report_prefix,
+    skip_unchanged=True,
+    update_existing=False,
+    replay=False,
+    rows=None,
+    agencies=None,
+):
+    """Import one workbook (or replay a payload export) in a pool process and write its reports; returns the summary.
+
+    With ``agencies``, rows are routed to them by their publisher column (import_by_publisher) and
+    replayed payloads by the publisher they name; without, everything goes to ``publisher``.
+    """
+    from core import import_datasets
+
+    report_rows = []
+
+    def on_event(event):
+        if event["type"] in ROW_EVENTS:
+            report_rows.append(
+                {
+                    "row": event["row"],
+                    "identifier": event["identifier"],
+                    "publisher": event.get("publisher", publisher),
+                    "outcome": "updated" if event.get("action") == "updated" else event["type"],
+                    "dataset_id": event.get("dataset_id"),
+                    "changed_fields": ";".join(event.get("changed_fields", [])),
+                    "error": event.get("error"),
+                    "warnings": ";".join(event.get("warnings", [])),
+                }
+            )
+
+    start = time.perf_counter()
+    summary = {"file": path, "organization_id": organization_id, "publisher": publisher}
+    options = {"on_event": on_event, "skip_unchanged": skip_unchanged, "update_existing": update_existing}
+    try:
+        if replay:
+            targets = agencies or [f"{organization_id}\\{publisher}"]
+            result = import_datasets.replay_payloads(path, api_token, targets, rows=rows, **options)
+        elif agencies:
+            result = import_datasets.import_by_publisher(path, api_token, agencies, **options)
+        else:
+            result = import_datasets.main(path, api_token, organization_id, publisher, **options)
+    except Exception as e:
+        logger.error("%s: %s", path, e)
+        summary.update(status="error", error=str(e), **dict.fromkeys(COUNTS, 0))
+    else:
+        counts = {key: result.get(key, 0) for key in COUNTS}
+        failed = counts["error_count"] or "aborted" in result
+        if failed and (counts["success_count"] or counts["skipped_count"]):
+            status = "completed_with_errors"
+        elif failed:
+            status = "error"
+        else:
+            status = "completed"
+        summary.update(counts, status=status)
+        if "aborted" in result:
+            summary.update(aborted_after_row=result["aborted"]["after_row"], error=result["aborted"]["error"])
+        if len(result.get("partitions", [])) > 1:
+            summary["partitions"] = result["partitions"]
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    report_rows.sort(key=lambda row: row["row"])
+    _write_reports(report_prefix, summary, report_rows)
+    return summary
+
+
+def export_workbook(path, agencies, report_prefix):
+    """Build the payloads of one workbook into ``<report_prefix>.payloads.ndjson`` without contacting the dataset API.
+
+    Rows are assigned to ``agencies`` by their publisher column as in import_by_publisher.
+    """
+    from core import import_datasets
+    from core.agencies import split_agency
+
+    report_rows = []
+    start = time.perf_counter()
+    summary = {"file": path, "publisher": split_agency(agencies[0])[1], "payloads": report_files(report_prefix)[2]}
+    try:
+        with open(summary["payloads"], "w", encoding="utf-8") as f:
+            for record in import_datasets.iter_payload_records(path, agencies):
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                report_rows.append(
+                    {
+                        "row": record["row"],
+                        "identifier": record["identifier"],
+                        "publisher": record.get("publisher"),
+                        "outcome": "built" if "payload" in record else "failed",
+                        "error": record.get("error"),
+                        "warnings": ";".join(record.get("warnings", [])),
+                    }
+                )
+    except Exception as e:
+        logger.error("%s: %s", path, e)
+        summary.update(status="error", error=str(e), **dict.fromkeys(COUNTS, 0))
+    else:
+        error_count = sum(row["outcome"] == "failed" for row in report_rows)
+        summary.update(dict.fromkeys(COUNTS, 0), success_count=len(report_rows) - error_count, error_count=error_count)
+        summary.update(total_count=len(report_rows), status="completed_with_errors" if error_count else "completed")
+
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    _write_reports(report_prefix, summary, report_rows)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="inventory files, directories or glob patterns")
+    parser.add_argument("--token", default=os.environ.get("I14Y_API_TOKEN"), help="access token (default: $I14Y_API_TOKEN)")
+    parser.add_argument("--organization", help="organization id (default: from the token)")
+    parser.add_argument("--publisher", help="publisher identifier (default: from the token)")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="workbooks imported in parallel")
+    parser.add_argument("--report-dir", default="import-reports", help="directory for the per-workbook reports")
+    parser.add_argument(
+        "--update", action="store_true", help="update existing datasets with the same identificator instead of creating new ones"
+    )
+    parser.add_argument(
+        "--no-skip-unchanged", dest="skip_unchanged", action="store_false", help="submit rows already in the import ledger again"
+    )
+    stage = parser.add_mutually_exclusive_group()
+    stage.add_argument("--dry-run", action="store_true", help="only build the payloads into <report>.payloads.ndjson")
+    stage.add_argument("--replay", action="store_true", help="submit payload files written by --dry-run")
+    parser.add_argument("--retry-failed", metavar="REPORT", help="with --replay: only the rows this report lists as failed")
+    args = parser.parse_args(argv)
+
+    _configure_logging()
+
+    if args.retry_failed and not args.replay:
+        parser.error("--retry-failed requires --replay")
+    if args.retry_failed and len(args.inputs) != 1:
+        parser.error("--retry-failed takes the one payload file the report belongs to")
+    # A dry run does not contact the dataset API; the token only supplies the default publisher
+    if not args.token and not (args.dry_run and args.publisher):
+        parser.error("an access token is required (--token or I14Y_API_TOKEN)")
+    token = (args.token[7:] if args.token.startswith("Bearer ") else args.token) if args.token else None
+
+    organization_id, publisher = args.organization, args.publisher
+    agencies = None
+    if not (organization_id and publisher) and token:
+        try:
+            token_organization, token_publisher = token_agency(token)
+            if not (organization_id or publisher):
+                agencies = token_agencies(token)
+        except (jwt.InvalidTokenError, ValueError) as e:
+            parser.error(f"cannot read the agency from the token ({e}); pass --organization and --publisher")
+        organization_id = organization_id or token_organization
+        publisher = publisher or token_publisher
+
+    workbooks = find_workbooks(args.inputs, PAYLOAD_PATTERNS if args.replay else WORKBOOK_PATTERNS)
+    if not workbooks:
+        logger.error("No workbooks to import")
+        return 1
+
+    try:
+        prefixes = report_paths(workbooks, args.report_dir)
+    except ValueError as e:
+        parser.error(f"{e}; choose another --report-dir")
+    os.makedirs(args.report_dir, exist_ok=True)
+    processes = max(1, min(args.processes, len(workbooks)))
+
+    rows = failed_rows(args.retry_failed) if args.retry_failed else None
+
+    # Fetched once here and handed to every pool process; replayed payloads already carry the codes
+    from core.codelist_utils import CODELISTS, export_codelists, get_cached_codelist
+
+    codelists = {}
+    if not args.replay:
+        for name in CODELISTS:
+            get_cached_codelist(name)
+        codelists = export_codelists()
+
+    logger.info(
+        "Importing %s workbooks with %s processes for %s", len(workbooks), processes, ", ".join(agencies or [publisher])
+    )
+    start = time.perf_counter()
+    summaries = []
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(codelists, limiter_share(processes)),
+    ) as executor:
+        if args.dry_run:
+            targets = agencies or [f"{organization_id or publisher}\\{publisher}"]
+            futures = [executor.submit(export_workbook, path, targets, prefixes[path]) for path in workbooks]
+        else:
+            futures = [
+                executor.submit(
+                    import_workbook,
+                    path,
+                    f"Bearer {token}",
+                    organization_id,
+                    publisher,
+                    prefixes[path],
+                    args.skip_unchanged,
+                    args.update,
+                    args.replay,
+                    rows,
+                    agencies,
+                )
+                for path in workbooks
+            ]
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries.append(summary)
+            print(
+                f"{summary['status']:<22} {summary['success_count']:>6} ok {summary['updated_count']:>6} updated "
+                f"{summary['error_count']:>6} failed "
+                f"{summary['skipped_count']:>6} unchanged {summary['seconds']:>8.1f}s  {summary['file']}"
+            )
+
+    wall = time.perf_counter() - start
+    rows = sum(summary["total_count"] for summary in summaries)
+    print(f"{len(summaries)} workbooks, {rows} rows in {wall:.1f}s; reports in {os.path.abspath(args.report_dir)}")
+    return 1 if any(summary["status"] != "completed" for summary in summaries) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
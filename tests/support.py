@@ -0,0 +1,117 @@
+"""Fixtures shared by the test modules: the benchmark mock of the I14Y API and small inventories"""
+import csv
+import json
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+from flask import Flask
+
+import config
+from benchmarks.mock_api import MockApi
+from core import codelist_utils, import_datasets, remote_datasets
+from core.rate_limit import configure_submission_limiter
+
+TOKEN = "Bearer test"
+PUBLISHER = "Test Office"
+INVENTORY_COLUMNS = ["title", "description", "identificator", "accessRights", "issued", "modified"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def payload(i, publisher=PUBLISHER):
+    return {"data": {"title": {"de": f"Datensatz {i}"}, "publisher": {"identifier": publisher}}}
+
+
+def inventory_row(i, **cells):
+    row = {
+        "title": f"Datensatz {i}",
+        "description": "Beschreibung",
+        "identificator": f"ID_{i}",
+        "accessRights": "Öffentlich",
+        "issued": "2024-01-01",
+        "modified": "2024-01-02",
+    }
+    row.update(cells)
+    return row
+
+
+def web_app():
+    """The Flask app as run.py builds it, whatever SECRET_KEY and JWT_EXPECTED_ISSUER the environment has"""
+    from app.routes import register_routes
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    app = Flask(__name__, template_folder=os.path.join(root, "app", "templates"), static_folder=os.path.join(root, "app", "static"))
+    app.config["SECRET_KEY"] = "test-" * 8
+    with mock.patch.object(config, "SECRET_KEY", app.config["SECRET_KEY"]), mock.patch.object(
+        config, "JWT_EXPECTED_ISSUER", "https://login.example.admin.ch/realms/test"
+    ):
+        register_routes(app)
+    return app
+
+
+class MockApiTestCase(unittest.TestCase):
+    """Runs the benchmark mock of the I14Y API with ``api_options`` for the tests of one class"""
+
+    api_options = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.api = MockApi(port=free_port(), **cls.api_options)
+        cls.api.__enter__()
+        cls.addClassCleanup(cls.api.__exit__, None, None, None)
+        for module, name, url in (
+            (import_datasets, "API_BASE_URL", cls.api.partner_url),
+            (remote_datasets, "API_BASE_URL", cls.api.partner_url),
+            (codelist_utils, "I14Y_PUBLIC_API_BASE_URL", cls.api.public_url),
+        ):
+            patcher = mock.patch.object(module, name, url)
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+
+    def setUp(self):
+        self.api.reset()
+        # The limiter is shared by the process; a throttled test must not slow down the next one
+        self.limiter = configure_submission_limiter()
+        remote_datasets.clear_remote_datasets_cache()
+
+    def posts(self):
+        return self.api.stats()["requests"].get("POST datasets", 0)
+
+    def statuses(self):
+        return self.api.stats()["statuses"]
+
+    def datasets(self):
+        """Datasets stored by the mock, with their id"""
+        response = requests.get(f"{self.api.partner_url}/datasets", params={"pageSize": 10000}, timeout=10)
+        return response.json()["data"]
+
+    def titles_by_id(self):
+        return {dataset["id"]: dataset["title"]["de"] for dataset in self.datasets()}
+
+    def temp_dir(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return directory.name
+
+    def inventory(self, rows, name="inventory.csv"):
+        """Write inventory rows (dicts, see inventory_row) as a CSV file and return its path"""
+        path = os.path.join(self.temp_dir(), name)
+        columns = list(dict.fromkeys(INVENTORY_COLUMNS + [col for row in rows for col in row]))
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+
+def read_ndjson(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
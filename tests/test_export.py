@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import sqlite3
+import unittest
+from unittest import mock
+
+from benchmarks.payload_build import load_template_codelists
+from core import import_datasets, ledger
+from support import TOKEN, MockApiTestCase, inventory_row, read_ndjson
+
+AGENCIES = ["ORG1\\Office One", "ORG2\\Office Two"]
+
+
+class MixedPublisherExportTest(MockApiTestCase):
+    def setUp(self):
+        super().setUp()
+        load_template_codelists()
+        self.ledger_path = os.path.join(self.temp_dir(), "ledger.sqlite3")
+        patcher = mock.patch.object(ledger, "IMPORT_LEDGER_PATH", self.ledger_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        rows = [
+            inventory_row(0, publisher=""),
+            inventory_row(1, publisher="ORG2"),
+            inventory_row(2, publisher="office one"),
+            inventory_row(3, publisher="ORG3"),
+            inventory_row(4, publisher="Office Two", accessRights="Geheim"),
+        ]
+        self.path = self.inventory(rows)
+
+    def export(self):
+        output = io.StringIO()
+        counts = import_datasets.export_payloads(self.path, output, AGENCIES)
+        path = os.path.join(self.temp_dir(), "inventory.payloads.ndjson")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output.getvalue())
+        return counts, path
+
+    def stored_publishers(self, result):
+        """Publishers the mock stored for the datasets an import created"""
+        created = {dataset["id"] for dataset in result["successful_datasets"]}
+        return sorted(dataset["publisher"]["identifier"] for dataset in self.datasets() if dataset["id"] in created)
+
+    def test_export_builds_each_row_for_its_agency(self):
+        counts, path = self.export()
+        records = read_ndjson(path)
+
+        self.assertEqual((counts["payload_count"], counts["error_count"]), (3, 2))
+        self.assertEqual([record["row"] for record in records], [1, 2, 3, 4, 5])
+        self.assertEqual(
+            [record["publisher"] for record in records], ["Office One", "Office Two", "Office One", "ORG3", "Office Two"]
+        )
+        self.assertEqual(
+            [record["payload"]["data"]["publisher"]["identifier"] for record in records if "payload" in record],
+            ["Office One", "Office Two", "Office One"],
+        )
+        self.assertEqual(records[3]["error"], "publisher 'ORG3' is not one of the agencies in the token")
+        self.assertNotIn("payload", records[3])
+        self.assertIn("unknown access rights", records[4]["error"])
+
+    def test_replay_submits_each_payload_for_the_agency_it_names(self):
+        _, path = self.export()
+        events = []
+
+        with self.assertLogs(import_datasets.logger, "WARNING"):
+            result = import_datasets.replay_payloads(path, TOKEN, AGENCIES, on_event=events.append)
+
+        self.assertEqual((result["success_count"], result["error_count"]), (3, 2))
+        self.assertEqual(
+            {partition["publisher"]: partition["success_count"] for partition in result["partitions"]},
+            {"Office One": 2, "Office Two": 1},
+        )
+        self.assertEqual(self.stored_publishers(result), ["Office One", "Office One", "Office Two"])
+        submitted = {event["row"]: event["publisher"] for event in events if event["type"] == "submitted"}
+        self.assertEqual(submitted, {1: "Office One", 2: "Office Two", 3: "Office One"})
+        with sqlite3.connect(self.ledger_path) as conn:
+            organizations = dict(conn.execute("SELECT identifier, organization FROM imported_datasets"))
+        self.assertEqual(organizations, {"ID_0": "ORG1", "ID_1": "ORG2", "ID_2": "ORG1"})
+
+    def test_replay_rejects_payloads_for_agencies_not_in_the_token(self):
+        _, path = self.export()
+        records = read_ndjson(path)
+        records[1]["payload"]["data"]["publisher"]["identifier"] = "Office Three"
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+        with self.assertLogs(import_datasets.logger, "WARNING"):
+            result = import_datasets.replay_payloads(path, TOKEN, AGENCIES)
+
+        self.assertEqual((result["success_count"], result["error_count"]), (2, 3))
+        self.assertIn("publisher 'Office Three' is not one of the agencies in the token", result["errors"])
+        self.assertEqual(self.posts(), 2)
+
+    def test_replay_with_a_single_agency_rejects_the_other_agencies(self):
+        _, path = self.export()
+
+        result = import_datasets.replay_payloads(path, TOKEN, AGENCIES[:1])
+
+        self.assertEqual((result["success_count"], result["error_count"]), (2, 3))
+        self.assertEqual(result["errors"].count("publisher 'Office Two' is not one of the agencies in the token"), 2)
+        self.assertEqual(self.stored_publishers(result), ["Office One", "Office One"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import io
+import json
+import os
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from benchmarks.payload_build import load_template_codelists
+from core import import_datasets, ledger
+from core.input_formats import SNIFF_SIZE, sniff_csv_encoding, sniff_format
+from core.inventory_reader import READ_ERROR_COLUMN, iter_inventory_chunks
+from core.validation import validate_rows
+from support import PUBLISHER, TOKEN, MockApiTestCase, inventory_row
+
+
+def read(content):
+    """All chunks of an inventory given as bytes, as one DataFrame"""
+    return pd.concat(list(iter_inventory_chunks(io.BytesIO(content))))
+
+
+def ndjson(*lines):
+    return "\n".join(line if isinstance(line, str) else json.dumps(line, ensure_ascii=False) for line in lines).encode()
+
+
+class CsvReaderTest(unittest.TestCase):
+    def test_semicolon_separated_utf8_with_bom(self):
+        content = "\ufefftitle;description;keywords_1\r\nÄmter;Beschreibung, mit Komma;Straße\r\nZweiter;Text;\r\n"
+        df = read(content.encode("utf-8"))
+
+        self.assertEqual(sniff_format(io.BytesIO(content.encode("utf-8"))), "csv")
+        self.assertEqual(list(df.columns), ["title", "description", "keywords_1"])
+        self.assertEqual(df["title"].tolist(), ["Ämter", "Zweiter"])
+        self.assertEqual(df["description"].tolist(), ["Beschreibung, mit Komma", "Text"])
+        self.assertEqual(df["keywords_1"].tolist()[0], "Straße")
+        self.assertTrue(pd.isna(df["keywords_1"].tolist()[1]))
+
+    def test_latin1_file(self):
+        content = "title,description,spatial\nGebäude,Größe in m²,Zürich\n".encode("latin-1")
+        df = read(content)
+
+        self.assertEqual(sniff_csv_encoding(io.BytesIO(content)), "cp1252")
+        self.assertEqual(df.iloc[0].tolist(), ["Gebäude", "Größe in m²", "Zürich"])
+
+    def test_utf8_cut_off_by_the_sample_stays_utf8(self):
+        head = b"title,description\n"
+        content = head + b"a" * (SNIFF_SIZE - len(head) - 1) + "ä,b\n".encode("utf-8")
+        stream = io.BytesIO(content)
+
+        self.assertEqual(sniff_csv_encoding(stream), "utf-8-sig")
+        self.assertEqual(stream.tell(), 0)
+        self.assertTrue(read(content)["title"].iloc[0].endswith("aä"))
+
+
+class NdjsonReaderTest(unittest.TestCase):
+    def test_blank_trailing_lines_are_ignored(self):
+        content = ndjson({"title": "Eins", "description": "A"}, {"title": "Zwei", "description": "B"}, "", "  ", "") + b"\n\n"
+        df = read(content)
+
+        self.assertEqual(df["title"].tolist(), ["Eins", "Zwei"])
+        self.assertEqual(list(df.index), [0, 1])
+        self.assertNotIn(READ_ERROR_COLUMN, df.columns)
+
+    def test_malformed_line_becomes_a_row_error(self):
+        content = ndjson(
+            {"title": "Eins", "description": "A"},
+            '{"title": "Kaputt", "description": ',
+            '["keine", "Zeile"]',
+            {"title": "Vier", "description": "D", "spatial": "CH"},
+        )
+        df = read(content)
+
+        self.assertEqual(list(df.index), [0, 1, 2, 3])
+        self.assertEqual(df.loc[3, "title"], "Vier")
+        self.assertEqual(df.loc[3, "spatial"], "CH")
+        self.assertTrue(df.loc[1, READ_ERROR_COLUMN].startswith("Line 2: invalid JSON"))
+        self.assertEqual(df.loc[2, READ_ERROR_COLUMN], "Line 3: expected a JSON object")
+
+        errors = validate_rows(df)
+        self.assertEqual(sorted(errors), [1, 2])
+        self.assertEqual(errors[2], ["Line 3: expected a JSON object"])
+
+
+class MalformedNdjsonImportTest(MockApiTestCase):
+    def setUp(self):
+        super().setUp()
+        load_template_codelists()
+        patcher = mock.patch.object(ledger, "IMPORT_LEDGER_PATH", "")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_malformed_line_fails_only_its_row(self):
+        path = os.path.join(self.temp_dir(), "inventory.ndjson")
+        with open(path, "wb") as f:
+            f.write(ndjson(inventory_row(0), "{not json", inventory_row(2), "") + b"\n")
+
+        with self.assertLogs(import_datasets.logger, "WARNING"):
+            result = import_datasets.main(path, TOKEN, "TEST", PUBLISHER)
+
+        self.assertEqual((result["success_count"], result["error_count"], result["total_count"]), (2, 1, 3))
+        self.assertNotIn("aborted", result)
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertIn("Line 2: invalid JSON", result["errors"][0])
+        self.assertEqual(sorted(dataset["identifier"] for dataset in result["successful_datasets"]), ["ID_0", "ID_2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import io
+import tempfile
+import unittest
+from unittest import mock
+
+from app import routes
+from core import jobs
+from support import web_app
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Jobs are only queued, never started, so they stay waiting
+        self.executor = mock.Mock()
+        for patcher in (
+            mock.patch.object(jobs, "JOB_STORE_DIR", directory.name),
+            mock.patch.object(jobs, "JOB_QUEUE_MAX_SIZE", 2),
+            mock.patch.object(jobs, "_jobs", {}),
+            mock.patch.object(jobs, "_get_executor", return_value=self.executor),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_full_queue_refuses_new_jobs(self):
+        first, second = jobs.submit_job(print), jobs.submit_job(print)
+
+        with self.assertRaises(jobs.JobQueueFull):
+            jobs.submit_job(print)
+        self.assertEqual(self.executor.submit.call_count, 2)
+        self.assertEqual(len(jobs._jobs), 2)
+
+        # A job taken up by a worker thread frees its place
+        jobs._run_job(first, lambda on_event: {"status": "completed"}, (), {})
+        third = jobs.submit_job(print)
+        self.assertEqual([jobs.get_job(job_id)["status"] for job_id in (first, second, third)], ["completed", "queued", "queued"])
+
+    def test_failed_job_is_recorded(self):
+        def fail(on_event):
+            raise ValueError("Kaputt")
+
+        job_id = jobs.submit_job(fail)
+        with self.assertLogs(jobs.logger, "ERROR"):
+            jobs._run_job(job_id, fail, (), {})
+
+        job = jobs.get_job(job_id)
+        self.assertEqual((job["status"], job["error"]), ("error", "Kaputt"))
+        self.assertIsNotNone(job["finished_at"])
+
+    def test_interpreter_exit_is_not_swallowed(self):
+        def interrupted(on_event):
+            raise KeyboardInterrupt
+
+        job_id = jobs.submit_job(interrupted)
+        with self.assertRaises(KeyboardInterrupt):
+            jobs._run_job(job_id, interrupted, (), {})
+
+
+class UploadQueueFullTest(unittest.TestCase):
+    def test_upload_is_refused_with_503_when_the_queue_is_full(self):
+        client = web_app().test_client()
+        org_info = {"organization_id": "ORG", "publisher_name": "Office", "agencies": ["ORG\\Office"]}
+        uploads = []
+
+        def submit_job(func, upload, *args, **kwargs):
+            uploads.append(upload)
+            raise jobs.JobQueueFull()
+
+        with mock.patch.object(routes, "parse_jwt_token", return_value=org_info), mock.patch.object(
+            jobs, "submit_job", side_effect=submit_job
+        ), self.assertLogs(routes.logger, "WARNING"):
+            response = client.post(
+                "/upload",
+                data={"access_token": "token", "file": (io.BytesIO(b"title,description\nA,B\n"), "inventory.csv")},
+                content_type="multipart/form-data",
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "60")
+        self.assertIn("Es warten bereits zu viele Importe", response.get_data(as_text=True))
+        self.assertTrue(uploads[0].closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import time
+import unittest
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+import jwt_helpers
+
+ISSUER = "https://login.example.admin.ch/realms/test"
+JWKS_URI = f"{ISSUER}/protocol/openid-connect/certs"
+
+
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def jwk(key, kid, **fields):
+    return {**json.loads(RSAAlgorithm.to_jwk(key.public_key())), "kid": kid, "use": "sig", **fields}
+
+
+class FakeResponse:
+    def __init__(self, document, cache_control="max-age=300"):
+        self.document = document
+        self.headers = {"Cache-Control": cache_control}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.document
+
+
+class JwksTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.old_key, cls.new_key = private_key(), private_key()
+
+    def setUp(self):
+        for cache in (jwt_helpers._discovery_cache, jwt_helpers._jwks_cache, jwt_helpers._verified_tokens):
+            cache.clear()
+        self.key_sets = []
+        patcher = mock.patch.object(jwt_helpers.http_client, "get", side_effect=self.fetch)
+        self.fetches = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, url, **kwargs):
+        self.assertEqual(url, JWKS_URI)
+        return FakeResponse({"keys": self.key_sets.pop(0)})
+
+    def age_cache(self, seconds):
+        """Pretend the cached key set was fetched ``seconds`` ago"""
+        jwt_helpers._jwks_cache[JWKS_URI]["fetched_at"] -= seconds
+
+    def test_cached_keys_are_reused(self):
+        self.key_sets = [[jwk(self.old_key, "old")]]
+        first = jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "old", ISSUER)
+        second = jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "old", ISSUER)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.fetches.call_count, 1)
+
+    def test_unknown_kid_refetches_once_after_rotation(self):
+        self.key_sets = [[jwk(self.old_key, "old")], [jwk(self.old_key, "old"), jwk(self.new_key, "new")]]
+        jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "old", ISSUER)
+        self.age_cache(jwt_helpers.JWKS_REFETCH_COOLDOWN)
+
+        key = jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "new", ISSUER)
+
+        self.assertEqual(self.fetches.call_count, 2)
+        token = jwt.encode({"sub": "user"}, self.new_key, algorithm="RS256", headers={"kid": "new"})
+        self.assertEqual(jwt.decode(token, key, algorithms=["RS256"]), {"sub": "user"})
+
+    def test_unknown_kid_after_refetch_is_rejected(self):
+        self.key_sets = [[jwk(self.old_key, "old")], [jwk(self.old_key, "old")]]
+        jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "old", ISSUER)
+        self.age_cache(jwt_helpers.JWKS_REFETCH_COOLDOWN)
+
+        with self.assertRaisesRegex(ValueError, "No matching JWK found for kid=made-up"):
+            jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "made-up", ISSUER)
+        # The refetch just happened, so the next unknown kid waits for the cooldown
+        with self.assertRaisesRegex(ValueError, "kid=made-up"):
+            jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "made-up", ISSUER)
+        self.assertEqual(self.fetches.call_count, 2)
+
+    def test_unknown_kid_within_the_cooldown_does_not_refetch(self):
+        self.key_sets = [[jwk(self.old_key, "old")]]
+        jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "old", ISSUER)
+
+        with self.assertRaises(ValueError):
+            jwt_helpers.get_signing_key_from_jwks(JWKS_URI, "new", ISSUER)
+        self.assertEqual(self.fetches.call_count, 1)
+
+    def test_jwks_of_another_origin_is_refused(self):
+        with self.assertRaisesRegex(ValueError, "does not match issuer host"):
+            jwt_helpers.get_signing_key_from_jwks("https://attacker.example/certs", "old", ISSUER)
+        self.fetches.assert_not_called()
+
+    def test_unusable_keys_are_logged_and_skipped(self):
+        broken = jwk(self.old_key, "broken")
+        del broken["n"]
+        self.key_sets = [
+            [
+                broken,
+                jwk(self.old_key, "encryption", use="enc"),
+                {"kty": "EC", "kid": "ec", "crv": "P-256", "x": "", "y": ""},
+                jwk(self.new_key, "new"),
+            ]
+        ]
+
+        with self.assertLogs(jwt_helpers.logger, "WARNING") as logs:
+            keys = jwt_helpers._refresh_jwks(JWKS_URI)["keys"]
+
+        self.assertEqual(list(keys), ["new"])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Skipping unusable JWK kid=broken", logs.output[0])
+
+
+class VerifiedClaimsTest(unittest.TestCase):
+    def setUp(self):
+        jwt_helpers._verified_tokens.clear()
+
+    def test_claims_are_remembered_until_exp(self):
+        now = time.time()
+        claims = {"sub": "user", "exp": now + 60}
+        jwt_helpers.remember_verified_claims("token", claims)
+
+        self.assertEqual(jwt_helpers.get_verified_claims("token"), claims)
+        with mock.patch.object(jwt_helpers.time, "time", return_value=now + 60):
+            self.assertIsNone(jwt_helpers.get_verified_claims("token"))
+        # The expired entry is dropped, not kept until it is pushed out
+        self.assertEqual(len(jwt_helpers._verified_tokens), 0)
+        self.assertIsNone(jwt_helpers.get_verified_claims("token"))
+
+    def test_claims_without_exp_are_not_remembered(self):
+        jwt_helpers.remember_verified_claims("token", {"sub": "user"})
+        self.assertIsNone(jwt_helpers.get_verified_claims("token"))
+
+    def test_least_recently_used_claims_are_evicted(self):
+        exp = time.time() + 60
+        with mock.patch.object(jwt_helpers, "VERIFIED_TOKEN_CACHE_SIZE", 2):
+            jwt_helpers.remember_verified_claims("a", {"exp": exp})
+            jwt_helpers.remember_verified_claims("b", {"exp": exp})
+            jwt_helpers.get_verified_claims("a")
+            jwt_helpers.remember_verified_claims("c", {"exp": exp})
+
+        self.assertIsNone(jwt_helpers.get_verified_claims("b"))
+        self.assertIsNotNone(jwt_helpers.get_verified_claims("a"))
+        self.assertIsNotNone(jwt_helpers.get_verified_claims("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
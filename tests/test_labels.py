@@ -0,0 +1,127 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from benchmarks.payload_build import load_template_codelists
+from core import codelist_utils, import_datasets, ledger
+from core.codelist_utils import ACCESS_RIGHTS_INDEX, LabelIndex, get_label_index
+from core.validation import label_warnings
+from support import PUBLISHER, TOKEN, MockApiTestCase, inventory_row
+
+MAPPING = {"Vertraulich": "CONFIDENTIAL", "Öffentlich": "PUBLIC", "CONFIDENTIAL": "CONFIDENTIAL", "PUBLIC": "PUBLIC"}
+
+
+class LabelIndexTest(unittest.TestCase):
+    def test_exact_match_ignores_case_accents_and_punctuation(self):
+        index = LabelIndex(MAPPING)
+        for value in ("Vertraulich", "vertraulich", " VERTRAULICH ", "confidential"):
+            with self.subTest(value):
+                self.assertEqual(index.match(value), ("CONFIDENTIAL", None))
+        self.assertEqual(index.match("Offentlich"), ("PUBLIC", None))
+
+    def test_near_match_names_the_label_it_was_taken_for(self):
+        index = LabelIndex(MAPPING)
+        self.assertEqual(index.match("Vertraulihc"), ("CONFIDENTIAL", "Vertraulich"))
+        # Served from the memo the second time
+        self.assertEqual(index.match("Vertraulihc"), ("CONFIDENTIAL", "Vertraulich"))
+        self.assertEqual(index.lookup("Öffentlch"), "PUBLIC")
+
+    def test_values_below_the_cutoff_are_not_matched(self):
+        index = LabelIndex(MAPPING)
+        for value in ("Vertr", "Geheim", "Publik", ""):
+            with self.subTest(value):
+                self.assertEqual(index.match(value), (None, None))
+
+    def test_codes_are_never_near_matched(self):
+        self.assertEqual(LabelIndex({"CONFIDENTIAL": "CONFIDENTIAL"}).match("CONFIDENTAL"), (None, None))
+
+    def test_ambiguous_near_matches_are_not_matched(self):
+        index = LabelIndex({"Statistik": "A", "Statistiken": "B"})
+        self.assertEqual(index.match("Statistike"), (None, None))
+
+    def test_cutoff_zero_disables_near_matches(self):
+        with mock.patch.object(codelist_utils, "LABEL_MATCH_CUTOFF", 0):
+            index = LabelIndex(MAPPING)
+        self.assertEqual(index.match("Vertraulihc"), (None, None))
+        self.assertEqual(index.match("vertraulich"), ("CONFIDENTIAL", None))
+
+
+class CodelistIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.theme_labels, cls.license_labels = load_template_codelists()
+
+    def test_licenses_are_matched_exactly_only(self):
+        label = "Opendata BY: Freie Nutzung. Quellenangabe ist Pflicht."
+        misspelled = label.replace("Pflicht", "Pflict")
+        licenses = get_label_index("licenses")
+
+        self.assertIsNotNone(licenses.lookup(label.upper()))
+        self.assertEqual(licenses.match(misspelled), (None, None))
+        # The same listing would match it approximately; licenses opt out on purpose
+        self.assertEqual(LabelIndex(codelist_utils.get_cached_codelist("licenses")).match(misspelled)[1], label)
+
+    def test_themes_are_matched_approximately(self):
+        code, label = get_label_index("themes").match("Gesellschat")
+        self.assertEqual(label, "Gesellschaft")
+        self.assertEqual(code, get_label_index("themes").lookup("Gesellschaft"))
+
+    def test_label_warnings_name_value_label_and_code(self):
+        df = pd.DataFrame(
+            {
+                "accessRights": ["Vertraulihc", "Öffentlich", "Geheim", "Vertraulihc"],
+                "themes_label": ["Arbeit", "Gesellschat", None, ""],
+            },
+            index=[3, 4, 5, 6],
+        )
+        theme_code = get_label_index("themes").lookup("Gesellschaft")
+
+        self.assertEqual(
+            label_warnings(df),
+            {
+                3: ["accessRights 'Vertraulihc' was taken as 'Vertraulich' (CONFIDENTIAL)"],
+                4: [f"themes_label 'Gesellschat' was taken as 'Gesellschaft' ({theme_code})"],
+                6: ["accessRights 'Vertraulihc' was taken as 'Vertraulich' (CONFIDENTIAL)"],
+            },
+        )
+
+    def test_label_warnings_follow_the_access_rights_index(self):
+        df = pd.DataFrame({"accessRights": ["Restricte", "Restricted", "RESTRICTED"]})
+        self.assertEqual(ACCESS_RIGHTS_INDEX.match("Restricte"), ("RESTRICTED", "Restricted"))
+        self.assertEqual(list(label_warnings(df)), [0])
+
+
+class NearMatchReportTest(MockApiTestCase):
+    def setUp(self):
+        super().setUp()
+        load_template_codelists()
+        patcher = mock.patch.object(ledger, "IMPORT_LEDGER_PATH", "")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_each_substitution_is_reported_on_its_row(self):
+        rows = [
+            inventory_row(0, accessRights="Vertraulihc"),
+            inventory_row(1),
+            inventory_row(2, accessRights="Vertraulihc", description=""),
+        ]
+        events = []
+
+        with self.assertLogs(import_datasets.logger, "WARNING"):
+            result = import_datasets.main(self.inventory(rows), TOKEN, "TEST", PUBLISHER, on_event=events.append)
+
+        warning = "accessRights 'Vertraulihc' was taken as 'Vertraulich' (CONFIDENTIAL)"
+        self.assertEqual(result["warnings"], [f"Row 1 (ID_0): {warning}", f"Row 3 (ID_2): {warning}"])
+        outcomes = {event["row"]: event for event in events if event["type"] in ("submitted", "failed")}
+        self.assertEqual(
+            {row: (event["type"], event.get("warnings")) for row, event in outcomes.items()},
+            {1: ("submitted", [warning]), 2: ("submitted", None), 3: ("failed", [warning])},
+        )
+        created = {dataset["identifier"]: dataset for dataset in result["successful_datasets"]}
+        stored = {dataset["id"]: dataset for dataset in self.datasets()}
+        self.assertEqual(stored[created["ID_0"]["id"]]["accessRights"]["code"], "CONFIDENTIAL")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.payload_build import load_template_codelists
+from core import import_datasets, ledger
+from core.ledger import ImportLedger, payload_hash
+from support import PUBLISHER, TOKEN, MockApiTestCase, inventory_row
+
+
+class ImportLedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "ledger.sqlite3")
+
+    def open(self, organization="ORG"):
+        opened = ImportLedger(self.path, organization)
+        self.addCleanup(opened.close)
+        return opened
+
+    def test_payload_hash_ignores_key_order(self):
+        self.assertEqual(payload_hash({"a": 1, "b": [1, 2]}), payload_hash({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(payload_hash({"a": 1}), payload_hash({"a": 2}))
+
+    def test_recorded_datasets_are_known_after_reopening(self):
+        first = self.open()
+        first.record("hash-1", "ID_1", "dataset-1")
+        first.close()
+
+        self.assertEqual(self.open().known(["hash-1", "hash-2", None]), {"hash-1": "dataset-1"})
+        self.assertEqual(self.open("OTHER").known(["hash-1"]), {})
+
+    def test_lookup_is_split_below_the_sqlite_variable_limit(self):
+        opened = self.open()
+        hashes = [f"hash-{i}" for i in range(1200)]
+        for i, content_hash in enumerate(hashes):
+            opened.record(content_hash, f"ID_{i}", f"dataset-{i}")
+        opened.flush()
+
+        statements = []
+        opened._conn.set_trace_callback(statements.append)
+        found = opened.known(hashes + ["unknown"])
+
+        self.assertEqual(len(found), 1200)
+        self.assertEqual(found["hash-1199"], "dataset-1199")
+        selects = [statement for statement in statements if statement.startswith("SELECT")]
+        self.assertEqual(len(selects), -(-1201 // ledger.LOOKUP_BATCH_SIZE))
+        self.assertLess(ledger.LOOKUP_BATCH_SIZE + 2, 999)
+
+    def test_entries_expire_after_the_ttl(self):
+        opened = self.open()
+        opened.record("hash-1", "ID_1", "dataset-1")
+        opened.flush()
+
+        with mock.patch.object(ledger, "IMPORT_LEDGER_TTL", -1):
+            self.assertEqual(opened.known(["hash-1"]), {})
+
+
+class LedgerImportTest(MockApiTestCase):
+    def setUp(self):
+        super().setUp()
+        load_template_codelists()
+        self.path = os.path.join(self.temp_dir(), "ledger.sqlite3")
+        for patcher in (
+            mock.patch.object(ledger, "IMPORT_LEDGER_PATH", self.path),
+            mock.patch.object(import_datasets, "SUBMIT_RETRY_BACKOFF", 0.01),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def recorded(self):
+        with sqlite3.connect(self.path) as conn:
+            return dict(conn.execute("SELECT identifier, dataset_id FROM imported_datasets"))
+
+    def test_reupload_skips_rows_already_created(self):
+        path = self.inventory([inventory_row(i) for i in range(3)])
+        first = import_datasets.main(path, TOKEN, "TEST", PUBLISHER)
+        self.api.reset()
+
+        second = import_datasets.main(path, TOKEN, "TEST", PUBLISHER)
+
+        self.assertEqual(first["success_count"], 3)
+        self.assertEqual((second["success_count"], second["skipped_count"], second["error_count"]), (0, 3, 0))
+        self.assertEqual(self.posts(), 0)
+        self.assertEqual(
+            sorted(dataset["id"] for dataset in second["skipped_datasets"]),
+            sorted(dataset["id"] for dataset in first["successful_datasets"]),
+        )
+
+    def test_edited_rows_are_submitted_again(self):
+        import_datasets.main(self.inventory([inventory_row(i) for i in range(2)]), TOKEN, "TEST", PUBLISHER)
+        self.api.reset()
+
+        rows = [inventory_row(0), inventory_row(1, description="Geändert")]
+        result = import_datasets.main(self.inventory(rows), TOKEN, "TEST", PUBLISHER)
+
+        self.assertEqual((result["success_count"], result["skipped_count"]), (1, 1))
+        self.assertEqual(self.posts(), 1)
+
+    def test_only_successful_rows_are_recorded(self):
+        rows = [inventory_row(0), inventory_row(1, accessRights="Geheim")]
+        with mock.patch.object(import_datasets, "submit_to_api", side_effect=[import_datasets.SubmissionError(400, "Bad")]):
+            with self.assertLogs(import_datasets.logger, "WARNING"):
+                failed = import_datasets.main(self.inventory(rows), TOKEN, "TEST", PUBLISHER)
+        self.assertEqual(failed["error_count"], 2)
+        self.assertEqual(self.recorded(), {})
+
+        with self.assertLogs(import_datasets.logger, "WARNING"):
+            result = import_datasets.main(self.inventory(rows), TOKEN, "TEST", PUBLISHER)
+
+        self.assertEqual((result["success_count"], result["error_count"]), (1, 1))
+        self.assertEqual(list(self.recorded()), ["ID_0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import routes
+from core import metrics
+from support import web_app
+
+DEAD_PID = 999999999
+
+
+class MetricFilesTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        # collect() also writes this process's own values; start them empty
+        for patcher in (mock.patch.object(metrics, "METRICS_DIR", self.dir), mock.patch.object(metrics, "_values", {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_worker(self, pid, rows=1, seconds=0.02, in_flight=1):
+        """Metric file of a worker as flush() writes it"""
+        histogram = {"buckets": [0] * (len(metrics.DURATION_BUCKETS) + 1), "count": 1, "sum": seconds}
+        histogram["buckets"][4] = 1
+        values = [
+            ["i14y_import_rows_total", [["outcome", "submitted"]], rows],
+            ["i14y_import_stage_seconds", [["stage", "validation"]], histogram],
+            ["i14y_imports_in_flight", [], in_flight],
+        ]
+        with open(os.path.join(self.dir, f"{pid}.json"), "w", encoding="utf-8") as f:
+            json.dump(values, f)
+
+    def test_flush_writes_nothing_when_disabled(self):
+        with mock.patch.object(metrics, "METRICS_ENABLED", False):
+            metrics.inc("i14y_imports_total", status="done")
+            metrics.flush()
+        self.assertEqual(os.listdir(self.dir), [])
+
+        metrics.flush()
+        self.assertEqual(os.listdir(self.dir), [f"{os.getpid()}.json"])
+
+    def test_retire_keeps_counters_of_exited_workers_in_one_file(self):
+        self.write_worker(DEAD_PID, rows=3)
+        self.write_worker(DEAD_PID - 1, rows=4, seconds=0.03)
+
+        metrics.retire(DEAD_PID)
+        metrics.retire(DEAD_PID - 1)
+        metrics.retire(DEAD_PID - 2)  # never wrote a file
+
+        self.assertEqual(sorted(os.listdir(self.dir)), [metrics.RETIRED_FILE])
+        totals = metrics.collect()
+        self.assertEqual(totals[("i14y_import_rows_total", (("outcome", "submitted"),))], 7)
+        stage = totals[("i14y_import_stage_seconds", (("stage", "validation"),))]
+        self.assertEqual((stage["count"], round(stage["sum"], 6)), (2, 0.05))
+        self.assertEqual(stage["buckets"][4], 2)
+        self.assertNotIn(("i14y_imports_in_flight", ()), totals)
+
+    def test_gauges_of_live_workers_are_summed(self):
+        self.write_worker(os.getppid(), in_flight=2)
+        self.write_worker(DEAD_PID, in_flight=5)
+
+        self.assertEqual(metrics.collect()[("i14y_imports_in_flight", ())], 2)
+
+
+class MetricsEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = web_app().test_client()
+
+    def get(self, token=None, metrics_token="scrape-secret"):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        with mock.patch.object(routes, "METRICS_TOKEN", metrics_token), mock.patch.object(metrics, "METRICS_DIR", tempfile.gettempdir()):
+            return self.client.get("/metrics", headers=headers)
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get("wrong").status_code, 401)
+        self.assertEqual(self.get("ünicode").status_code, 401)
+
+        response = self.get("scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("# TYPE i14y_imports_total counter", response.get_data(as_text=True))
+
+    def test_metrics_are_not_served_without_a_token_configured(self):
+        self.assertEqual(self.get("", metrics_token="").status_code, 404)
+        with mock.patch.object(routes, "METRICS_ENABLED", False):
+            self.assertEqual(self.get("scrape-secret").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
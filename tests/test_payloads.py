@@ -0,0 +1,99 @@
+import json
+import os
+import unittest
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.payload_build import load_template_codelists, synthetic_inventory
+from core.import_datasets import build_payloads, create_dataset_payload
+from core.inventory_reader import iter_inventory_chunks
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "static", "inventory.xlsx")
+PUBLISHER = "Test Office"
+
+
+def edge_case_inventory(theme_labels, license_labels):
+    """Rows with empty, date and multi-value cells the per-row builder treats in its own way"""
+    empty = {"title": "Nur Pflichtfelder", "description": "Alle anderen Zellen sind leer"}
+    dates = {
+        "title": "Daten",
+        "description": "Zeitstempel mit Bruchteilen und Zeitzonen",
+        "identificator": 4711,
+        "issued": pd.Timestamp("2024-03-01 08:00:00.123456"),
+        "modified": pd.Timestamp("2024-03-02"),
+        "temporalCoverage_start": datetime(1999, 12, 31, 23, 59, 59),
+        "temporalCoverage_end": pd.Timestamp("2030-01-01"),
+    }
+    multi = {
+        "title": "Mehrfachwerte",
+        "description": "Alle Stichworte und Distributionen",
+        "identificator": "MULTI",
+        "accessRights": "eingeschränkt",
+        "keywords_1": "Eins",
+        "keywords_2": "Zwei, Drei",
+        "keywords_3": "Vier",
+        "contactPoints_hasEmail": "info@example.admin.ch",
+        "contactPoints_hasTelephone": "+41 58 000 00 00",
+        "themes_label": theme_labels[0].upper(),
+        "spatial": "CH",
+    }
+    for i in range(1, 4):
+        multi[f"distribution_accessUrl_{i}"] = f"https://example.admin.ch/{i}" if i != 2 else np.nan
+        multi[f"distribution_downloadUrl_{i}"] = f"https://example.admin.ch/{i}.csv"
+        multi[f"distribution_license_label_{i}"] = license_labels[i % len(license_labels)]
+    unknown = {
+        "title": "Unbekannte Werte",
+        "description": "Codes, die in keiner Codeliste stehen",
+        "accessRights": "Geheim",
+        "themes_label": "Kein Thema",
+        "distribution_downloadUrl_1": "https://example.admin.ch/unknown.csv",
+        "distribution_license_label_1": "Keine Lizenz",
+        "contactPoints_fn": "Nur Adresse",
+    }
+    df = pd.DataFrame.from_records([empty, dates, multi, unknown])
+    # Dates of one column share a dtype in a workbook; keep the tz-aware one separate
+    tz_row = pd.DataFrame.from_records(
+        [{"title": "Zeitzone", "description": "Mit UTC-Offset", "issued": datetime(2024, 1, 1, tzinfo=timezone.utc)}]
+    )
+    return pd.concat([df, tz_row], ignore_index=True)
+
+
+class PayloadEquivalenceTest(unittest.TestCase):
+    """The columnar build_payloads must send exactly what create_dataset_payload builds per row"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.theme_labels, cls.license_labels = load_template_codelists()
+
+    def assertSamePayloads(self, df):
+        built = list(build_payloads(df, PUBLISHER))
+        self.assertEqual([idx for idx, _, _ in built], list(df.index))
+        for idx, payload, error in built:
+            with self.subTest(row=idx):
+                try:
+                    expected, expected_error = create_dataset_payload(df.loc[idx], PUBLISHER), None
+                except Exception as e:
+                    expected, expected_error = None, e
+                self.assertEqual(type(error), type(expected_error))
+                self.assertEqual(str(error), str(expected_error))
+                self.assertEqual(
+                    json.dumps(payload, ensure_ascii=False).encode(), json.dumps(expected, ensure_ascii=False).encode()
+                )
+
+    def test_template_read_with_pandas(self):
+        self.assertSamePayloads(pd.read_excel(TEMPLATE_PATH))
+
+    def test_template_read_as_stream(self):
+        self.assertSamePayloads(pd.concat(list(iter_inventory_chunks(TEMPLATE_PATH))))
+
+    def test_synthetic_inventory(self):
+        self.assertSamePayloads(synthetic_inventory(500, self.theme_labels, self.license_labels))
+
+    def test_empty_date_and_multi_value_cells(self):
+        self.assertSamePayloads(edge_case_inventory(self.theme_labels, self.license_labels))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import unittest
+from unittest import mock
+
+import requests
+
+from benchmarks.payload_build import load_template_codelists
+from core import import_datasets, ledger, remote_datasets
+from core.remote_datasets import changed_fields, fetch_remote_datasets
+from support import TOKEN, MockApiTestCase, inventory_row
+
+DATA = {
+    "title": {"de": "Datensatz"},
+    "identifiers": ["ID_1"],
+    "accessRights": {"code": "PUBLIC"},
+    "keywords": [{"de": "Eins"}, {"de": "Zwei"}],
+}
+
+# (case, local changes, remote changes, expected fields)
+DIFFS = [
+    ("identical", {}, {}, []),
+    ("changed title", {"title": {"de": "Neu"}}, {}, ["title"]),
+    ("field only on I14Y", {}, {"description": {"de": "Dort ergänzt"}}, ["description"]),
+    ("empty and missing", {"spatial": "", "themes": []}, {"temporalCoverage": {}}, []),
+    ("keys the API adds", {}, {"title": {"de": "Datensatz", "fr": "Jeu de données"}}, []),
+    ("whole number read as int", {"identifiers": [4711]}, {"identifiers": ["4711"]}, []),
+    ("keyword dropped", {"keywords": [{"de": "Eins"}]}, {}, ["keywords"]),
+    ("keywords reordered", {"keywords": [{"de": "Zwei"}, {"de": "Eins"}]}, {}, ["keywords"]),
+    ("nested code", {"accessRights": {"code": "RESTRICTED"}}, {}, ["accessRights"]),
+    ("two fields", {"title": {"de": "Neu"}, "accessRights": {"code": "RESTRICTED"}}, {}, ["title", "accessRights"]),
+    ("unmanaged field", {}, {"version": "2"}, []),
+]
+
+
+class ChangedFieldsTest(unittest.TestCase):
+    def test_changed_fields(self):
+        for case, local, remote, expected in DIFFS:
+            with self.subTest(case):
+                self.assertEqual(changed_fields({**DATA, **local}, {**DATA, **remote}), expected)
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def dataset(i):
+    return {"id": f"dataset-{i}", "identifiers": [f"ID_{i}"]}
+
+
+class FetchRemoteDatasetsTest(unittest.TestCase):
+    def fetch(self, respond, page_size=2):
+        """fetch_remote_datasets against ``respond(page, page_size)``; returns the index and the pages requested"""
+        pages = []
+
+        def get(url, params, **kwargs):
+            self.assertEqual(params["publisherIdentifier"], "Office")
+            pages.append(params["page"])
+            return FakeResponse(respond(params["page"], params["pageSize"]))
+
+        with mock.patch.object(remote_datasets, "REMOTE_DATASETS_PAGE_SIZE", page_size), mock.patch.object(
+            remote_datasets.http_client, "get", side_effect=get
+        ):
+            index = fetch_remote_datasets(TOKEN, "Office")
+        return index, pages
+
+    def test_stops_at_total_count(self):
+        def respond(page, page_size):
+            items = [dataset(i) for i in range(5)][(page - 1) * page_size : page * page_size]
+            return {"data": items, "page": page, "pageSize": page_size, "totalCount": 5}
+
+        index, pages = self.fetch(respond)
+
+        self.assertEqual(pages, [1, 2, 3])
+        self.assertEqual(sorted(index), [f"ID_{i}" for i in range(5)])
+        self.assertEqual(index["ID_3"]["id"], "dataset-3")
+
+    def test_short_pages_are_not_taken_as_the_last_one(self):
+        # The API caps pageSize at 1, below the 2 asked for, and sends no totalCount
+        def respond(page, page_size):
+            return {"items": [dataset(i) for i in range(3)][page - 1 : page]}
+
+        index, pages = self.fetch(respond)
+
+        self.assertEqual(pages, [1, 2, 3, 4])
+        self.assertEqual(len(index), 3)
+
+    def test_stops_when_a_page_repeats(self):
+        # An API ignoring ``page`` answers every request with the first page
+        index, pages = self.fetch(lambda page, page_size: [dataset(0), dataset(1)])
+
+        self.assertEqual(pages, [1, 2])
+        self.assertEqual(sorted(index), ["ID_0", "ID_1"])
+
+    def test_datasets_are_indexed_by_every_identifier(self):
+        def respond(page, page_size):
+            items = [{"id": "dataset-1", "data": {"identifiers": ["ID_1", 4711]}}, {"id": "no-identifier", "data": {}}]
+            return {"data": items if page == 1 else [], "totalCount": 2}
+
+        index, _ = self.fetch(respond)
+
+        self.assertEqual(sorted(index), ["4711", "ID_1"])
+        self.assertEqual(index["4711"]["id"], "dataset-1")
+
+
+class UpdateModeTest(MockApiTestCase):
+    publisher = "Reconcile Office"
+
+    def setUp(self):
+        super().setUp()
+        load_template_codelists()
+        patcher = mock.patch.object(ledger, "IMPORT_LEDGER_PATH", os.path.join(self.temp_dir(), "ledger.sqlite3"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_import(self, path):
+        remote_datasets.clear_remote_datasets_cache()
+        events = []
+        result = import_datasets.main(path, TOKEN, "TEST", self.publisher, on_event=events.append, update_existing=True)
+        return result, events
+
+    def test_edits_on_i14y_are_reconciled_for_rows_the_ledger_knows(self):
+        path = self.inventory([inventory_row(i) for i in range(2)])
+        first, _ = self.run_import(path)
+        edited = first["successful_datasets"][0]["id"]
+        stored = {dataset["id"]: dataset for dataset in self.datasets()}[edited]
+        stored["title"] = {"de": "Auf I14Y geändert"}
+        requests.put(f"{self.api.partner_url}/datasets/{edited}", json={"data": stored}, timeout=10).raise_for_status()
+
+        result, events = self.run_import(path)
+
+        self.assertEqual((result["updated_count"], result["skipped_count"]), (1, 1))
+        updated = [event for event in events if event["type"] == "submitted"]
+        self.assertEqual([(event["dataset_id"], event["changed_fields"]) for event in updated], [(edited, ["title"])])
+        self.assertEqual({dataset["id"]: dataset for dataset in self.datasets()}[edited]["title"], {"de": "Datensatz 0"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from benchmarks.payload_build import load_template_codelists
+import config
+from core import import_datasets, ledger
+from core.rate_limit import configure_submission_limiter
+from support import PUBLISHER, TOKEN, MockApiTestCase, inventory_row, payload
+
+
+class SubmitDatasetsTest(MockApiTestCase):
+    api_options = {"latency": 0.01}
+
+    def test_results_keep_input_order(self):
+        items = [(i, payload(i) if i != 7 else None) for i in range(40)]
+        results = list(import_datasets.submit_datasets(items, TOKEN, max_workers=8))
+
+        self.assertEqual([key for key, _, _ in results], list(range(40)))
+        self.assertEqual(results[7], (7, None, None))
+        self.assertEqual(self.posts(), 39)
+        titles = self.titles_by_id()
+        for key, dataset_id, error in results:
+            if key != 7:
+                self.assertIsNone(error)
+                self.assertEqual(titles[dataset_id], f"Datensatz {key}")
+
+    def test_single_worker_submits_in_order(self):
+        results = list(import_datasets.submit_datasets(((i, payload(i)) for i in range(5)), TOKEN, max_workers=1))
+
+        titles = self.titles_by_id()
+        self.assertEqual([titles[dataset_id] for _, dataset_id, _ in results], [f"Datensatz {i}" for i in range(5)])
+
+
+class ConnectionPoolTest(MockApiTestCase):
+    api_options = {"latency": 0.05}
+
+    def test_default_pool_holds_every_concurrent_submission(self):
+        # Every background import submits with its own workers while the shared window is fully open
+        configure_submission_limiter(initial=config.SUBMIT_MAX_IN_FLIGHT)
+        results = {}
+
+        def run(worker):
+            items = ((i, payload(f"{worker}-{i}")) for i in range(3 * config.SUBMIT_CONCURRENCY))
+            results[worker] = list(import_datasets.submit_datasets(items, TOKEN))
+
+        imports = [threading.Thread(target=run, args=(worker,)) for worker in range(config.IMPORT_WORKERS)]
+        with self.assertNoLogs("urllib3.connectionpool", "WARNING"):
+            for thread in imports:
+                thread.start()
+            for thread in imports:
+                thread.join()
+
+        self.assertEqual(len(results), config.IMPORT_WORKERS)
+        self.assertEqual([error for result in results.values() for _, _, error in result if error], [])
+
+
+class BatchSubmissionTest(MockApiTestCase):
+    def test_failed_items_do_not_fail_their_batch(self):
+        # Updates of unknown datasets are answered with 404, which is not retried
+        missing = {2, 9}
+        items = [
+            (i, import_datasets.DatasetUpdate(f"missing-{i}", payload(i)) if i in missing else payload(i))
+            for i in range(10)
+        ]
+        results = list(import_datasets.submit_datasets(items, TOKEN, max_workers=2, batch_size=4))
+
+        self.assertEqual([key for key, _, _ in results], list(range(10)))
+        for key, dataset_id, error in results:
+            if key in missing:
+                self.assertIsNone(dataset_id)
+                self.assertIsInstance(error, import_datasets.SubmissionError)
+                self.assertEqual(error.status_code, 404)
+            else:
+                self.assertIsNone(error)
+                self.assertIsNotNone(dataset_id)
+        self.assertEqual(self.api.stats()["requests"], {"POST datasets": 8, "PUT datasets": 2})
+
+    def test_batch_sends_one_request_per_dataset(self):
+        results = list(import_datasets.submit_datasets(((i, payload(i)) for i in range(9)), TOKEN, max_workers=2, batch_size=5))
+
+        self.assertEqual(len({dataset_id for _, dataset_id, _ in results}), 9)
+        self.assertEqual(self.posts(), 9)
+
+
+class ServiceUnavailableTest(MockApiTestCase):
+    # One worker draws the mock's seeded errors in a fixed order, so the outcome is repeatable
+    api_options = {"error_rate": 0.3, "seed": 1}
+
+    @mock.patch.object(import_datasets, "SUBMIT_RETRY_BACKOFF", 0.01)
+    def test_503_is_retried_until_the_dataset_is_created(self):
+        results = list(import_datasets.submit_datasets(((i, payload(i)) for i in range(20)), TOKEN, max_workers=1))
+
+        self.assertEqual([error for _, _, error in results], [None] * 20)
+        unavailable = self.statuses().get("503", 0)
+        self.assertGreater(unavailable, 0)
+        self.assertEqual(self.posts(), 20 + unavailable)
+        self.assertEqual(self.limiter.snapshot()["throttled"], unavailable)
+
+
+class TooManyRequestsTest(MockApiTestCase):
+    api_options = {"capacity": 1, "retry_after": 1, "latency": 0.1}
+
+    def test_429_waits_for_retry_after(self):
+        started = time.monotonic()
+        results = list(import_datasets.submit_datasets(((i, payload(i)) for i in range(4)), TOKEN, max_workers=4))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual([error for _, _, error in results], [None] * 4)
+        self.assertGreater(self.statuses().get("429", 0), 0)
+        self.assertGreaterEqual(elapsed, 1.0)
+        stats = self.limiter.snapshot()
+        self.assertGreater(stats["throttled"], 0)
+        self.assertGreaterEqual(stats["paused_seconds"], 1.0)
+
+    def test_retry_delay_is_never_shorter_than_retry_after(self):
+        error = import_datasets.SubmissionError(429, "Too Many Requests", retry_after=5.0)
+        self.assertGreaterEqual(min(import_datasets.retry_delay(0, error) for _ in range(20)), 5.0)
+
+
+class FailedImportTest(MockApiTestCase):
+    api_options = {"error_rate": 1.0}
+
+    def setUp(self):
+        super().setUp()
+        load_template_codelists()
+        for patcher in (
+            mock.patch.object(import_datasets, "SUBMIT_RETRY_BACKOFF", 0.01),
+            mock.patch.object(ledger, "IMPORT_LEDGER_PATH", ""),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_every_failed_row_is_counted(self):
+        rows = [inventory_row(i) for i in range(3)] + [inventory_row("X", accessRights="Geheim")]
+
+        with self.assertLogs(import_datasets.logger, "WARNING") as logs:
+            result = import_datasets.main(self.inventory(rows), TOKEN, "TEST", PUBLISHER)
+
+        self.assertEqual(result["success_count"], 0)
+        self.assertEqual(result["error_count"], 4)
+        self.assertEqual(result["total_count"], 4)
+        self.assertEqual(len(result["errors"]), 4)
+        self.assertEqual(result["successful_datasets"], [])
+        self.assertEqual(len([line for line in logs.output if "failed" in line]), 4)
+        # The invalid row is never sent; the others use up all their retries
+        self.assertEqual(self.posts(), 3 * (import_datasets.SUBMIT_RETRIES + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.payload_build import load_template_codelists
+from core.validation import validate_rows
+
+VALID_ROW = {
+    "title": "Datensatz",
+    "description": "Beschreibung",
+    "accessRights": "Öffentlich",
+    "issued": datetime(2024, 1, 1),
+    "distribution_downloadUrl_1": "https://example.admin.ch/data.csv",
+}
+
+# (case, cells replacing those of VALID_ROW, expected messages)
+INVALID_ROWS = [
+    ("blank title", {"title": "  "}, ["title is missing"]),
+    ("missing description", {"description": None}, ["description is missing"]),
+    ("date as text", {"issued": "1. Januar 2024"}, ["issued is not a date ('1. Januar 2024')"]),
+    ("unknown access rights", {"accessRights": "Geheim"}, ["unknown access rights 'Geheim'"]),
+    ("unknown theme", {"themes_label": "Kein Thema"}, ["unknown theme 'Kein Thema' in themes_label"]),
+    (
+        "unknown license",
+        {"distribution_license_label_1": "Keine Lizenz"},
+        ["unknown license 'Keine Lizenz' in distribution_license_label_1"],
+    ),
+    (
+        "relative URL",
+        {"distribution_downloadUrl_1": "/data.csv"},
+        ["distribution_downloadUrl_1 is not a valid URL ('/data.csv')"],
+    ),
+    (
+        "URL without scheme",
+        {"distribution_downloadUrl_1": "example.admin.ch/data.csv"},
+        ["distribution_downloadUrl_1 is not a valid URL ('example.admin.ch/data.csv')"],
+    ),
+    (
+        "FTP URL",
+        {"distribution_downloadUrl_1": "ftp://example.admin.ch/data.csv"},
+        ["distribution_downloadUrl_1 is not a valid URL ('ftp://example.admin.ch/data.csv')"],
+    ),
+    (
+        "URL with a space",
+        {"distribution_downloadUrl_1": "https://example.admin.ch/my data.csv"},
+        ["distribution_downloadUrl_1 is not a valid URL ('https://example.admin.ch/my data.csv')"],
+    ),
+    (
+        "URL with a bad port",
+        {"distribution_downloadUrl_1": "https://example.admin.ch:port/data.csv"},
+        ["distribution_downloadUrl_1 is not a valid URL ('https://example.admin.ch:port/data.csv')"],
+    ),
+    (
+        "title and URL",
+        {"title": "", "distribution_accessUrl_1": "https://"},
+        ["title is missing", "distribution_accessUrl_1 is not a valid URL ('https://')"],
+    ),
+]
+
+VALID_URLS = [
+    "https://example.admin.ch/data.csv",
+    "http://localhost:8080/data.csv",
+    "http://intranet/datasets?id=1#top",
+    "https://[::1]/data.csv",
+    "http://10.0.0.1:8443",
+    "  https://example.admin.ch/padded  ",
+]
+
+
+class ValidateRowsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        load_template_codelists()
+
+    def validate(self, **cells):
+        return validate_rows(pd.DataFrame.from_records([{**VALID_ROW, **cells}]))
+
+    def test_valid_row(self):
+        self.assertEqual(self.validate(), {})
+
+    def test_invalid_rows(self):
+        for case, cells, messages in INVALID_ROWS:
+            with self.subTest(case):
+                self.assertEqual(self.validate(**cells), {0: messages})
+
+    def test_urls_without_a_dotted_host(self):
+        for url in VALID_URLS:
+            with self.subTest(url):
+                self.assertEqual(self.validate(distribution_downloadUrl_1=url), {})
+
+    def test_download_url_is_not_checked_next_to_an_access_url(self):
+        errors = self.validate(distribution_accessUrl_1="https://example.admin.ch", distribution_downloadUrl_1="data.csv")
+        self.assertEqual(errors, {})
+
+    def test_errors_are_keyed_by_row_index(self):
+        df = pd.DataFrame.from_records([VALID_ROW, {**VALID_ROW, "accessRights": "Geheim"}, VALID_ROW], index=[10, 11, 12])
+        self.assertEqual(validate_rows(df), {11: ["unknown access rights 'Geheim'"]})
+
+
+if __name__ == "__main__":
+    unittest.main()